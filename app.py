@@ -1,8 +1,12 @@
 import os
+import time
 from flask import Flask, render_template,redirect, url_for, request, flash
 from flask_login import LoginManager, login_required, current_user 
 from models import db, User, Insumo, TanqueInsumo, TanqueFabricado
 from routes import register_blueprints  # Se registra api_user y demás blueprints
+from commands import register_commands
+from services.pool import opciones_engine
+from services import metricas, concurrencia
 
 
 from datetime import datetime
@@ -11,6 +15,7 @@ from decimal import Decimal
 # FACTORY PATTERN: función que crea y configura la app
 # ------------------------------------------------------------
 def create_app():
+    inicio = time.perf_counter()
     app = Flask(__name__, static_folder='static', template_folder='templates')
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
     
@@ -21,6 +26,7 @@ def create_app():
 )
 
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opciones_engine(app.config['SQLALCHEMY_DATABASE_URI'])
 
     # Inicializar extensiones
     db.init_app(app)
@@ -35,16 +41,12 @@ def create_app():
 
     # Registrar blueprints
     register_blueprints(app)
+    metricas.instalar(app)
+    concurrencia.instalar(app)
+    register_commands(app)
 
-    # Crear DB y admin si no existe
-    with app.app_context():
-        db.create_all()
-        if not User.query.filter_by(username='admin').first():
-            admin = User(username='admin', role='administrador')
-            admin.set_password('admin123')
-            db.session.add(admin)
-            db.session.commit()
-            print("🟢 Admin creado: usuario='admin', pass='admin123'")
+    # La base NO se toca acá (corre en cada worker): el esquema, los agregados
+    # y el admin se preparan una vez con `flask --app app init-db`
 
     # ------------------- RUTAS PROTEGIDAS -------------------
     @app.route('/')
@@ -91,6 +93,7 @@ def create_app():
         is_admin = getattr(current_user, 'role', 'user') == 'administrador'
         return render_template('insumos_salida.html', current_user_is_admin=is_admin)
 
+    app.logger.info("create_app en %.0f ms (pid %s)", (time.perf_counter() - inicio) * 1000, os.getpid())
     return app
 
 
@@ -100,4 +103,7 @@ app = create_app()
 # EJECUCIÓN
 # ------------------------------------------------------------
 if __name__ == '__main__':
+    from commands import inicializar_base
+    with app.app_context():
+        inicializar_base()
     app.run(host='127.0.0.1', port=5000, debug=True)
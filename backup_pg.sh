@@ -1,55 +1,31 @@
 #!/bin/bash
+# Respaldo de la base con services/respaldos.py (ver `flask --app app respaldos --help`):
+# pg_dump en formato directorio, en paralelo y comprimido, con manifiesto de
+# sumas sha256 y filas por tabla. Corre contra DATABASE_URL (Postgres local o
+# el del contenedor si se publica el puerto); necesita el cliente de PostgreSQL.
 
 # -------------------------------
 # Configuración
 # -------------------------------
-# Carpeta donde se guardarán los backups
-BACKUP_DIR="./backups"
-
-# Número de backups a conservar
-MAX_BACKUPS=7
-
-# Usuario de Postgres (de tu .env)
-POSTGRES_USER=${POSTGRES_USER:-inventario_user}
-
-# Contenedor de Postgres (de tu docker-compose)
-DB_CONTAINER=${DB_CONTAINER:-inventario_db}
-
-# -------------------------------
-# Crear carpeta de backups si no existe
-# -------------------------------
-mkdir -p "$BACKUP_DIR"
+export BACKUP_DIR=${BACKUP_DIR:-./backups}          # carpeta de respaldos
+MAX_BACKUPS=${MAX_BACKUPS:-7}                       # respaldos a conservar
+export BACKUP_JOBS=${BACKUP_JOBS:-4}                # procesos de pg_dump/pg_restore
+VERIFICAR=${VERIFICAR:-1}                           # 1 = restaurar en una base temporal y contar filas
 
 # -------------------------------
-# Nombre del backup con timestamp
+# Crear, verificar y podar
 # -------------------------------
-TIMESTAMP=$(date +"%F_%H-%M-%S")
-FILENAME="backup_$TIMESTAMP.sql"
-FULL_PATH="$BACKUP_DIR/$FILENAME"
-
-echo "🟢 Iniciando backup: $FULL_PATH"
-
-# -------------------------------
-# Ejecutar backup
-# -------------------------------
-if docker exec -t "$DB_CONTAINER" pg_dumpall -c -U "$POSTGRES_USER" > "$FULL_PATH"; then
-    echo "✅ Backup completado correctamente: $FILENAME"
-else
+echo "🟢 Iniciando backup en $BACKUP_DIR"
+if ! flask --app app respaldos crear --conservar "$MAX_BACKUPS"; then
     echo "❌ Error: no se pudo generar el backup"
     exit 1
 fi
 
-# -------------------------------
-# Limitar número de backups
-# -------------------------------
-echo "🟢 Eliminando backups antiguos, manteniendo los últimos $MAX_BACKUPS..."
-cd "$BACKUP_DIR" || exit
-BACKUPS_TO_DELETE=$(ls -1t | tail -n +$((MAX_BACKUPS + 1)))
-if [ ! -z "$BACKUPS_TO_DELETE" ]; then
-    echo "$BACKUPS_TO_DELETE" | xargs rm -f
-    echo "✅ Backups antiguos eliminados"
-else
-    echo "⚡ No hay backups antiguos para eliminar"
+if [ "$VERIFICAR" = "1" ]; then
+    if ! flask --app app respaldos verificar; then
+        echo "❌ Error: el backup no pasó la verificación"
+        exit 1
+    fi
 fi
 
 echo "🟢 Backup finalizado correctamente"
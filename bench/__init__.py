@@ -0,0 +1,8 @@
+# bench/__init__.py
+# Datos sintéticos y benchmark de las rutas:
+#   DATABASE_URL=sqlite:////tmp/bench.db python -m bench.generar --escala media
+#   DATABASE_URL=sqlite:////tmp/bench.db python -m bench.correr --guardar bench/baseline.json
+#   DATABASE_URL=sqlite:////tmp/bench.db python -m bench.generar --escala media --vaciar
+#   DATABASE_URL=sqlite:////tmp/bench.db python -m bench.correr --comparar bench/baseline.json
+# La línea base se graba en la máquina donde se compara; no se versiona
+# una genérica porque los tiempos dependen del hardware y de la base.
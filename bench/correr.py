@@ -0,0 +1,390 @@
+# bench/correr.py
+"""
+Mide cada ruta de la API contra la base de DATABASE_URL (generada con
+bench.generar) y la generación de PDF de finalizar_tanque.
+Reporta p50/p95 de latencia, consultas SQL por request y pico de memoria.
+
+    python -m bench.correr                                  # solo mide
+    python -m bench.correr --guardar bench/baseline.json    # graba la línea base
+    python -m bench.correr --comparar bench/baseline.json --umbral 0.25
+      -> sale con código 1 si el p50 y el p95 de alguna ruta empeoran más
+         que el umbral o si aumenta la cantidad de consultas de alguna ruta
+
+Los escenarios de escritura modifican la base (stock, alertas, tanques):
+para comparar, regenerar los datos con la misma escala y semilla antes de
+cada corrida, igual que al grabar la línea base.
+
+Corre en el mismo proceso con el cliente de pruebas de Flask: mide la
+app y la base, no gunicorn ni nginx. La caché de respuestas se vacía
+antes de cada request salvo con --con-cache.
+"""
+import argparse
+import gc
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Engine
+
+RUIDO_MS = 2.0  # diferencias menores a esto no cuentan como regresión
+
+_consultas = [0]
+_cubiertas = set()  # endpoints que se llamaron
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _contar(conn, cursor, statement, parameters, context, executemany):
+    _consultas[0] += 1
+
+
+def _ids():
+    """Ids reales de la base para armar las URLs."""
+    from models import db, Insumo, Proveedor, Compra, TanqueFabricado, TanqueInsumo, HistorialPrecio
+    primero = lambda consulta: db.session.execute(consulta.limit(1)).scalar()
+    activos = db.session.execute(
+        select(TanqueFabricado.id_tanque).where(TanqueFabricado.finalizado.is_(False))
+        .where(TanqueFabricado.tanque_insumo.any()).order_by(TanqueFabricado.id_tanque).limit(200)
+    ).scalars().all()
+    ids = {
+        'insumo': primero(select(Insumo.id_insumo).order_by(Insumo.id_insumo)),
+        'insumo_nombre': primero(select(Insumo.nombre).order_by(Insumo.id_insumo)),
+        'proveedor': primero(select(Proveedor.id_proveedor).order_by(Proveedor.id_proveedor)),
+        'proveedor_nombre': primero(select(Proveedor.nombre).order_by(Proveedor.id_proveedor)),
+        # las escrituras usan otras filas, así las lecturas no cambian entre corridas
+        'insumo_escritura': primero(select(Insumo.id_insumo).order_by(Insumo.id_insumo.desc())),
+        'insumo_alertas': primero(select(Insumo.id_insumo).order_by(Insumo.id_insumo.desc()).offset(1)),
+        'proveedor_escritura': primero(select(Proveedor.id_proveedor).order_by(Proveedor.id_proveedor.desc())),
+        # la asociación con más historial (el gráfico más pesado)
+        'proveedor_insumo': primero(
+            select(HistorialPrecio.id_proveedor_insumo).group_by(HistorialPrecio.id_proveedor_insumo)
+            .order_by(func.count().desc())
+        ),
+        'compra': primero(select(Compra.id_compra).order_by(Compra.id_compra.desc())),
+        'tanque': primero(select(TanqueFabricado.id_tanque).where(TanqueFabricado.finalizado.is_(True))),
+        'salida': primero(select(TanqueInsumo.id_tanque_insumo).order_by(TanqueInsumo.id_tanque_insumo.desc())),
+        'activos': activos,
+    }
+    if None in ids.values() or len(activos) < 3:
+        sys.exit("La base no tiene datos suficientes: corra primero python -m bench.generar")
+    return ids
+
+
+def _salida_nueva(activo, id_insumo):
+    """Prepara (fuera de la medición) una salida para editar o borrar."""
+    def preparar(cliente):
+        from models import db, TanqueInsumo
+        cliente.post('/api/v1/insumos_salida/', json={
+            'id_tanque': activo, 'id_insumo': id_insumo, 'cantidad_usada': 0.01, 'operario': 'bench'
+        })
+        with cliente.application.app_context():  # la respuesta no trae el id de la línea
+            return db.session.execute(select(func.max(TanqueInsumo.id_tanque_insumo))).scalar()
+    return preparar
+
+
+def _alerta_abierta(id_insumo):
+    """Deja una alerta Pendiente para el insumo (subiendo su mínimo) y devuelve su id."""
+    vuelta = [0]
+
+    def abierta(cliente):
+        pendientes = cliente.get('/api/alertas/pendientes').get_json()
+        return next((a for a in pendientes if a['id_insumo'] == id_insumo), None)
+
+    def preparar(cliente):
+        actual = abierta(cliente)
+        if actual and actual['estado'] == 'Pendiente':
+            return actual['id_alerta']
+        if actual:  # reconocida en la vuelta anterior: se cierra para que se abra otra
+            cliente.put(f"/api/alertas/{actual['id_alerta']}/resolver")
+        vuelta[0] += 1
+        cliente.put(f'/api/v1/insumos/{id_insumo}', json={'stock_minimo': 10 ** 7 + vuelta[0]})
+        return abierta(cliente)['id_alerta']
+    return preparar
+
+
+def _csv_compras(ids, filas=20):
+    lineas = ['fecha,proveedor,id_insumo,cantidad,precio_unitario']
+    lineas += [f"2024-01-{k % 28 + 1:02d},{ids['proveedor_nombre']},{ids['insumo']},{k + 1},10.5" for k in range(filas)]
+    return '\n'.join(lineas).encode()
+
+
+def escenarios(ids):
+    """
+    (nombre, método, url, cuerpo) de cada ruta medida. url puede ser una
+    función (cliente) -> url que se llama antes de cada repetición, fuera
+    de la medición, para rutas que necesitan un objeto nuevo cada vez.
+    cuerpo es el JSON, o un dict con los argumentos de client.open.
+    """
+    i, p, t, activo = ids['insumo'], ids['proveedor'], ids['tanque'], ids['activos'][-1]
+    ie, pe, ae = ids['insumo_escritura'], ids['proveedor_escritura'], ids['activos'][-2]
+    prefijo = ids['insumo_nombre'][:4]
+    salida = _salida_nueva(ae, ie)
+    alerta = _alerta_abierta(ids['insumo_alertas'])
+    return [
+        # páginas
+        ('pagina_index', 'GET', '/', None),
+        ('pagina_insumos', 'GET', '/insumos', None),
+        ('pagina_proveedores', 'GET', '/proveedores', None),
+        ('pagina_compras', 'GET', '/compras', None),
+        ('pagina_tanques', 'GET', '/tanques', None),
+        ('pagina_alertas', 'GET', '/alertas', None),
+        ('pagina_reportes', 'GET', '/reportes', None),
+        ('pagina_salidas', 'GET', '/insumos_salida', None),
+        # insumos
+        ('insumos_listar', 'GET', '/api/v1/insumos/', None),
+        ('insumos_listar_pagina', 'GET', '/api/v1/insumos/?limit=50', None),
+        ('insumos_obtener', 'GET', f'/api/v1/insumos/{i}', None),
+        ('insumos_costo', 'GET', f'/api/v1/insumos/{i}/costo', None),
+        ('insumos_buscar', 'GET', f'/api/v1/insumos/buscar?q={prefijo}', None),
+        ('insumos_alertas', 'GET', '/api/v1/insumos/alertas', None),
+        ('insumos_actualizar', 'PUT', f'/api/v1/insumos/{ie}', {'stock_minimo': 15}),
+        ('insumos_crear', 'POST', '/api/v1/insumos/', {'nombre': 'Insumo bench', 'unidad_medida': 'u', 'cantidad': 10}),
+        # proveedores
+        ('proveedores_listar', 'GET', '/api/v1/proveedores/', None),
+        ('proveedores_buscar', 'GET', f"/api/v1/proveedores/buscar?q={ids['proveedor_nombre'][:6]}", None),
+        ('proveedores_insumos', 'GET', f'/api/v1/proveedores/{p}/insumos', None),
+        ('proveedores_crear', 'POST', '/api/v1/proveedores/', {'nombre': 'Proveedor bench', 'razon_social': 'Bench SA', 'cuit': '30-1-1'}),
+        ('proveedores_actualizar', 'PUT', f'/api/v1/proveedores/{pe}', {'telefono': '0000'}),
+        ('proveedores_asociar', 'POST', f'/api/v1/proveedores/{pe}/insumos', {'id_insumo': ie, 'precio_actual': 10}),
+        # compras
+        ('compras_listar', 'GET', '/api/v1/compras/?limit=50', None),
+        ('compras_insumos', 'GET', '/api/v1/compras/insumos', None),
+        ('compras_buscar', 'GET', f'/api/v1/compras/buscar?q={prefijo}', None),
+        ('compras_por_insumo', 'GET', f'/api/v1/compras/insumo/{i}', None),
+        ('compras_por_proveedor', 'GET', f"/api/v1/compras/proveedor/{ids['proveedor_nombre']}", None),
+        ('compras_crear', 'POST', '/api/v1/compras/', {'id_proveedor': pe, 'id_insumo': ie, 'cantidad': 1, 'precio_unitario': 10}),
+        ('compras_revisar', 'PUT', f"/api/v1/compras/{ids['compra']}/revisar", None),
+        ('compras_confirmar', 'PUT', f"/api/v1/compras/{ids['compra']}/confirmar", None),
+        ('compras_actualizar', 'PUT', f"/api/v1/compras/{ids['compra']}", {'precio_unitario': 11}),
+        ('compras_importar_dry_run', 'POST', '/api/v1/compras/importar?dry_run=1',
+         {'data': {'archivo': (_csv_compras(ids), 'compras.csv')}, 'content_type': 'multipart/form-data'}),
+        # salidas
+        ('salidas_listar', 'GET', '/api/v1/insumos_salida/?limit=50', None),
+        ('salidas_obtener', 'GET', f"/api/v1/insumos_salida/{ids['salida']}", None),
+        ('salidas_por_tanque', 'GET', f'/api/v1/insumos_salida/tanque/{activo}', None),
+        ('salidas_registrar', 'POST', '/api/v1/insumos_salida/',
+         {'id_tanque': ae, 'id_insumo': ie, 'cantidad_usada': 0.01, 'operario': 'bench'}),
+        ('salidas_lote', 'POST', '/api/v1/insumos_salida/lote',
+         [{'id_tanque': ae, 'id_insumo': ie, 'cantidad_usada': 0.01, 'operario': 'bench'}] * 10),
+        ('salidas_actualizar', 'PUT', lambda c: f'/api/v1/insumos_salida/{salida(c)}', {'cantidad_usada': 0.02}),
+        ('salidas_eliminar', 'DELETE', lambda c: f'/api/v1/insumos_salida/{salida(c)}', None),
+        # tanques
+        ('tanques_listar', 'GET', '/api/v1/tanques/?limit=50', None),
+        ('tanques_crear', 'POST', '/api/v1/tanques/', {'modelo': 'TQ-BENCH', 'cliente': 'Bench', 'fecha': '2024-01-01'}),
+        ('tanques_activos', 'GET', '/api/v1/tanques/activos', None),
+        ('tanques_obtener', 'GET', f'/api/v1/tanques/{t}', None),
+        ('tanques_insumos', 'GET', f'/api/v1/tanques/{t}/insumos', None),
+        ('tanques_clientes', 'GET', '/api/v1/tanques/clientes?q=Cli', None),
+        ('tanques_conciliacion', 'GET', '/api/v1/tanques/conciliacion', None),
+        # alertas y reportes
+        ('alertas_listar', 'GET', '/api/alertas/?limit=50', None),
+        ('alertas_pendientes', 'GET', '/api/alertas/pendientes', None),
+        ('alertas_reconocer', 'PUT', lambda c: f'/api/alertas/{alerta(c)}/reconocer', None),
+        ('alertas_resolver', 'PUT', lambda c: f'/api/alertas/{alerta(c)}/resolver', None),
+        ('reportes_resumen', 'GET', '/api/reportes/resumen', None),
+        ('reportes_series', 'GET', '/api/reportes/series?periodo=mes&dimension=global', None),
+        ('reportes_bajo_stock', 'GET', '/api/reportes/bajo_stock', None),
+        # exportaciones (se consume todo el stream)
+        # historial de precios
+        ('precios_puntos', 'GET', f"/api/v1/precios/{ids['proveedor_insumo']}", None),
+        ('precios_velas_semana', 'GET', f"/api/v1/precios/{ids['proveedor_insumo']}?intervalo=semana", None),
+        ('precios_velas_mes', 'GET', f"/api/v1/precios/{ids['proveedor_insumo']}?intervalo=mes", None),
+        ('precios_mejores', 'GET', '/api/v1/precios/mejores', None),
+        ('exportar_compras', 'GET', '/api/v1/exportar/compras?formato=csv', None),
+        ('exportar_salidas', 'GET', '/api/v1/exportar/salidas?formato=ndjson', None),
+        # sistema
+        ('sistema_cache', 'GET', '/api/sistema/cache', None),
+        ('sistema_vaciar_cache', 'DELETE', '/api/sistema/cache', None),
+        ('sistema_pool', 'GET', '/api/sistema/pool', None),
+    ]
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p
+    bajo = int(k)
+    alto = min(bajo + 1, len(ordenados) - 1)
+    return ordenados[bajo] + (ordenados[alto] - ordenados[bajo]) * (k - bajo)
+
+
+def _resumen(tiempos, consultas, memoria):
+    return {
+        'p50_ms': round(_percentil(tiempos, 0.5) * 1000, 3),
+        'p95_ms': round(_percentil(tiempos, 0.95) * 1000, 3),
+        'consultas': int(statistics.median(consultas)),
+        'memoria_pico_kb': round(memoria / 1024, 1),
+    }
+
+
+def _cubrir(cliente, metodo, url):
+    adaptador = cliente.application.url_map.bind('localhost')
+    _cubiertas.add(adaptador.match(url.split('?')[0], method=metodo)[0])
+
+
+def medir_ruta(cliente, metodo, url, cuerpo, repeticiones, con_cache):
+    from services import cache
+
+    def una():
+        gc.collect()  # fuera de la medición; adentro el GC queda apagado (como timeit)
+        destino = url(cliente) if callable(url) else url
+        argumentos = cuerpo if isinstance(cuerpo, dict) and ('data' in cuerpo) else {'json': cuerpo}
+        if 'data' in argumentos:  # los archivos se consumen en cada envío
+            argumentos = dict(argumentos, data={k: (io.BytesIO(v[0]), v[1]) for k, v in argumentos['data'].items()})
+        if not con_cache:
+            cache.vaciar()
+        _consultas[0] = 0
+        gc.disable()
+        try:
+            inicio = time.perf_counter()
+            respuesta = cliente.open(destino, method=metodo, **argumentos)
+            respuesta.get_data()  # consume streams
+            segundos = time.perf_counter() - inicio
+        finally:
+            gc.enable()
+        _cubrir(cliente, metodo, destino)
+        return segundos, _consultas[0], respuesta
+
+    for _ in range(2):  # calentamiento
+        una()
+    tiempos, consultas = [], []
+    for _ in range(repeticiones):
+        segundos, n, respuesta = una()
+        if respuesta.status_code >= 400:
+            estado = respuesta.status_code
+            raise RuntimeError(f"{metodo} {url} respondió {estado}: {respuesta.get_data(as_text=True)[:200]}")
+        tiempos.append(segundos)
+        consultas.append(n)
+
+    tracemalloc.start()
+    una()
+    memoria = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return _resumen(tiempos, consultas, memoria)
+
+
+def medir_pdf(cliente, tanques, repeticiones):
+    """
+    finalizar_tanque + espera hasta que el PDF se puede descargar (render en
+    el pool de hilos). Las consultas cuentan el PUT y la descarga final, no
+    los sondeos intermedios, cuya cantidad depende de la velocidad del render.
+    """
+    tiempos, consultas = [], []
+    usados = tanques[:repeticiones]
+    tracemalloc.start()
+    for id_tanque in usados:
+        _consultas[0] = 0
+        inicio = time.perf_counter()
+        respuesta = cliente.put(f'/api/v1/tanques/{id_tanque}/finalizar')
+        n = _consultas[0]
+        _cubrir(cliente, 'PUT', f'/api/v1/tanques/{id_tanque}/finalizar')
+        if respuesta.status_code != 202:
+            raise RuntimeError(f"finalizar {id_tanque} respondió {respuesta.status_code}")
+        while True:
+            _consultas[0] = 0
+            respuesta = cliente.get(f'/api/v1/tanques/{id_tanque}/pdf')
+            if respuesta.status_code == 200:
+                n += _consultas[0]
+                respuesta.get_data()
+                _cubrir(cliente, 'GET', f'/api/v1/tanques/{id_tanque}/pdf')
+                break
+            if respuesta.status_code != 202:
+                raise RuntimeError(f"pdf {id_tanque} respondió {respuesta.status_code}")
+            time.sleep(0.005)
+        tiempos.append(time.perf_counter() - inicio)
+        consultas.append(n)
+    memoria = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    for id_tanque in usados:  # deja la base como estaba
+        cliente.put(f'/api/v1/tanques/{id_tanque}/desfinalizar')
+        _cubrir(cliente, 'PUT', f'/api/v1/tanques/{id_tanque}/desfinalizar')
+    return _resumen(tiempos, consultas, memoria)
+
+
+def rutas_sin_escenario(app):
+    ignoradas = {'static', 'metricas_bp.metrics', 'eventos_bp.stream', 'api_user.login', 'api_user.logout', 'api_user.user_new'}
+    return sorted(r.endpoint for r in app.url_map.iter_rules() if r.endpoint not in _cubiertas | ignoradas)
+
+
+def comparar(resultados, base, umbral):
+    regresiones = []
+    for nombre, actual in resultados.items():
+        anterior = base.get(nombre)
+        if anterior is None:
+            continue
+        # el p95 solo es ruidoso (GC, otro proceso); tiene que empeorar también la mediana
+        if all(actual[k] > anterior[k] * (1 + umbral) and actual[k] - anterior[k] > RUIDO_MS
+               for k in ('p50_ms', 'p95_ms')):
+            regresiones.append(f"{nombre}: p50 {anterior['p50_ms']} -> {actual['p50_ms']} ms,"
+                               f" p95 {anterior['p95_ms']} -> {actual['p95_ms']} ms")
+        if actual['consultas'] > anterior['consultas']:
+            regresiones.append(f"{nombre}: consultas {anterior['consultas']} -> {actual['consultas']}")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    parser.add_argument('--solo', help='solo los escenarios que contienen este texto')
+    parser.add_argument('--con-cache', action='store_true', help='no vaciar la caché de respuestas entre requests')
+    parser.add_argument('--guardar', metavar='JSON', help='grabar los resultados como línea base')
+    parser.add_argument('--comparar', metavar='JSON', help='comparar contra una línea base')
+    parser.add_argument('--umbral', type=float, default=0.25, help='empeoramiento tolerado de p50 y p95 (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    import logging
+    from app import app
+    from models import db
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        ids = _ids()
+        dialecto = db.engine.dialect.name
+    cliente = app.test_client()
+    if cliente.post('/user/login', data={'username': 'admin', 'password': 'admin123'}).status_code >= 400:
+        sys.exit("No se pudo iniciar sesión como admin")
+
+    medidas = escenarios(ids)
+    resultados = {}
+    print(f"{'escenario':28} {'p50 ms':>9} {'p95 ms':>9} {'consultas':>9} {'mem KB':>9}")
+    for nombre, metodo, url, cuerpo in medidas:
+        if args.solo and args.solo not in nombre:
+            continue
+        resultados[nombre] = medir_ruta(cliente, metodo, url, cuerpo, args.repeticiones, args.con_cache)
+        r = resultados[nombre]
+        print(f"{nombre:28} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['consultas']:9d} {r['memoria_pico_kb']:9.0f}")
+    if not args.solo or args.solo in 'finalizar_pdf':
+        tanques = ids['activos'][:-2]  # los dos últimos los usan las otras rutas
+        resultados['finalizar_pdf'] = r = medir_pdf(cliente, tanques, min(args.repeticiones, len(tanques)))
+        print(f"{'finalizar_pdf':28} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['consultas']:9d} {r['memoria_pico_kb']:9.0f}")
+
+    faltan = rutas_sin_escenario(app)
+    if faltan:
+        print(f"\nRutas sin escenario: {', '.join(faltan)}")
+
+    if args.guardar:
+        with open(args.guardar, 'w') as f:
+            json.dump({
+                'meta': {'fecha': datetime.now().isoformat(timespec='seconds'), 'base': dialecto,
+                         'python': platform.python_version(), 'repeticiones': args.repeticiones},
+                'resultados': resultados
+            }, f, indent=2, sort_keys=True)
+        print(f"\nLínea base guardada en {args.guardar}")
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            base = json.load(f)['resultados']
+        regresiones = comparar(resultados, base, args.umbral)
+        if regresiones:
+            print("\n🔴 Regresiones:\n  " + "\n  ".join(regresiones))
+            sys.exit(1)
+        print("\n🟢 Sin regresiones contra la línea base")
+
+
+if __name__ == '__main__':
+    main()
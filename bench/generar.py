@@ -0,0 +1,194 @@
+# bench/generar.py
+"""
+Llena las tablas de models.py con datos sintéticos reproducibles (misma
+semilla y escala -> mismos datos) en la base de DATABASE_URL.
+
+    python -m bench.generar --escala grande
+    python -m bench.generar --escala chica --compras 5000 --semilla 7 --vaciar
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, insert, select
+
+ESCALAS = {
+    #          insumos  proveedores  compras  tanques  lineas (tanque_insumo)
+    'chica':  (200,     20,          2000,    500,     10000),
+    'media':  (2000,    100,         20000,   5000,    100000),
+    'grande': (10000,   500,         200000,  50000,   1000000),
+}
+LOTE = 10000
+DIAS = 730  # historial de dos años hacia atrás
+
+UNIDADES = ('u', 'kg', 'm', 'l', 'm2')
+FAMILIAS = ('Chapa', 'Tornillo', 'Bulón', 'Electrodo', 'Pintura', 'Brida', 'Válvula', 'Caño', 'Junta', 'Disco')
+MODELOS = ('TQ-1000', 'TQ-2500', 'TQ-5000', 'CIS-10', 'CIS-20', 'SILO-30')
+
+
+def _dinero(valor):
+    return Decimal(str(round(valor, 2)))
+
+
+def _insertar(tabla, filas):
+    from models import db
+    for i in range(0, len(filas), LOTE):
+        db.session.execute(insert(tabla), filas[i:i + LOTE])
+    db.session.commit()
+
+
+def _en_lotes(tabla, generador):
+    """Inserta lo que produce generador de a LOTE filas, sin tenerlo todo en memoria."""
+    from models import db
+    lote = []
+    for fila in generador:
+        lote.append(fila)
+        if len(lote) == LOTE:
+            db.session.execute(insert(tabla), lote)
+            lote = []
+    if lote:
+        db.session.execute(insert(tabla), lote)
+    db.session.commit()
+
+
+def generar(insumos, proveedores, compras, tanques, lineas, semilla=1, log=print):
+    from models import (db, Insumo, Proveedor, ProveedorInsumo, HistorialPrecio, Compra,
+                        TanqueFabricado, TanqueInsumo)
+    from services.stock import reconstruir_saldos
+    from services.tanques import recalcular_costos
+    from services.alertas import evaluar
+    from services.reportes import reconstruir_rollups
+    from services.costos import reconstruir as reconstruir_costos
+    from services.precios import reconstruir_mejores
+
+    azar = random.Random(semilla)
+    hoy = date.today()
+    inicio = time.perf_counter()
+
+    def paso(texto):
+        log(f"  {texto} ({time.perf_counter() - inicio:.1f} s)")
+
+    _insertar(Insumo.__table__, [{
+        'id_insumo': i,
+        'nombre': f"{azar.choice(FAMILIAS)} {i:05d}",
+        'cantidad': _dinero(azar.uniform(0, 2000)),
+        'unidad_medida': azar.choice(UNIDADES),
+        'stock_minimo': _dinero(azar.uniform(10, 200)),
+    } for i in range(1, insumos + 1)])
+    paso(f"{insumos} insumos")
+
+    _insertar(Proveedor.__table__, [{
+        'id_proveedor': p,
+        'nombre': f"Proveedor {p:04d} SA",
+        'razon_social': f"Proveedor {p:04d} Sociedad Anónima",
+        'cuit': f"30-{10000000 + p}-{p % 10}",
+        'email': f"ventas{p}@proveedor.test",
+    } for p in range(1, proveedores + 1)])
+    paso(f"{proveedores} proveedores")
+
+    # cada insumo se compra a 1-3 proveedores
+    pares, precios = [], {}
+    for i in range(1, insumos + 1):
+        for p in azar.sample(range(1, proveedores + 1), min(proveedores, azar.randint(1, 3))):
+            precios[(p, i)] = azar.uniform(1, 500)
+            pares.append({'id_proveedor_insumo': len(pares) + 1, 'id_proveedor': p, 'id_insumo': i,
+                          'precio_actual': _dinero(precios[(p, i)])})
+    _insertar(ProveedorInsumo.__table__, pares)
+    paso(f"{len(pares)} proveedor_insumo")
+
+    def filas_compras():
+        for c in range(1, compras + 1):
+            par = azar.choice(pares)
+            precio = precios[(par['id_proveedor'], par['id_insumo'])] * azar.uniform(0.8, 1.2)
+            cantidad = azar.randint(1, 200)
+            yield {
+                'id_compra': c, 'id_proveedor': par['id_proveedor'], 'id_insumo': par['id_insumo'],
+                'fecha': hoy - timedelta(days=azar.randrange(DIAS)),
+                'cantidad': Decimal(cantidad), 'precio_unitario': _dinero(precio), 'total': _dinero(precio * cantidad),
+                'revisado': azar.random() < 0.7, 'confirmado': azar.random() < 0.5,
+            }
+    _en_lotes(Compra.__table__, filas_compras())
+    paso(f"{compras} compras")
+
+    def filas_historial():
+        n = 0
+        for par in pares:
+            for _ in range(azar.randint(1, 5)):
+                n += 1
+                yield {
+                    'id_historial': n, 'id_proveedor_insumo': par['id_proveedor_insumo'],
+                    'fecha': datetime.combine(hoy - timedelta(days=azar.randrange(DIAS)), datetime.min.time()),
+                    'precio': _dinero(float(par['precio_actual']) * azar.uniform(0.7, 1.1)),
+                }
+    _en_lotes(HistorialPrecio.__table__, filas_historial())
+    paso("historial_precios")
+
+    _insertar(TanqueFabricado.__table__, [{
+        'id_tanque': t, 'modelo': azar.choice(MODELOS),
+        'fecha': hoy - timedelta(days=azar.randrange(DIAS)),
+        'cliente': f"Cliente {azar.randint(1, max(1, tanques // 10)):05d}",
+        'costo_total': Decimal('0'),
+        'finalizado': azar.random() < 0.9,
+    } for t in range(1, tanques + 1)])
+    paso(f"{tanques} tanques")
+
+    lista_pares = list(precios)
+
+    def filas_lineas():
+        for n in range(1, lineas + 1):
+            p, i = azar.choice(lista_pares)
+            yield {
+                'id_tanque_insumo': n, 'id_tanque': azar.randint(1, tanques), 'id_insumo': i,
+                'cantidad_usada': _dinero(azar.uniform(0.5, 10)), 'costo_unitario': _dinero(precios[(p, i)]),
+                'operario': f"Operario {azar.randint(1, 40)}",
+                'fecha_registro': datetime.combine(hoy - timedelta(days=azar.randrange(DIAS)), datetime.min.time()),
+            }
+    _en_lotes(TanqueInsumo.__table__, filas_lineas())
+    paso(f"{lineas} tanque_insumo")
+
+    # invariantes que mantiene la app: costo de tanques, libro de stock, costeo, alertas, agregados y mejores precios
+    recalcular_costos()
+    db.session.commit()
+    reconstruir_saldos()
+    reconstruir_costos()
+    evaluar(db.session.execute(select(Insumo.id_insumo)).scalars().all())
+    db.session.commit()
+    reconstruir_rollups()
+    reconstruir_mejores()
+    paso("costos, saldos, costeo, alertas, agregados y mejores precios")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', choices=ESCALAS, default='chica')
+    for nombre in ('insumos', 'proveedores', 'compras', 'tanques', 'lineas'):
+        parser.add_argument(f'--{nombre}', type=int, help='pisa el valor de la escala')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--vaciar', action='store_true', help='borra los datos existentes antes de generar')
+    args = parser.parse_args(argv)
+
+    from app import app
+    from commands import inicializar_base
+    from models import db, Insumo
+
+    cantidades = dict(zip(('insumos', 'proveedores', 'compras', 'tanques', 'lineas'), ESCALAS[args.escala]))
+    cantidades.update({k: v for k, v in vars(args).items() if k in cantidades and v is not None})
+
+    with app.app_context():
+        inicializar_base()
+        if db.session.execute(select(func.count()).select_from(Insumo)).scalar():
+            if not args.vaciar:
+                sys.exit("La base ya tiene datos; use --vaciar para reemplazarlos")
+            for tabla in reversed(db.metadata.sorted_tables):
+                if tabla.name not in ('users', 'schema_version'):
+                    db.session.execute(tabla.delete())
+            db.session.commit()
+        print(f"Generando {cantidades} (semilla {args.semilla})")
+        generar(semilla=args.semilla, **cantidades)
+
+
+if __name__ == '__main__':
+    main()
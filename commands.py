@@ -0,0 +1,250 @@
+# commands.py
+# Comandos de consola: `flask --app app <grupo> <comando>`
+import click
+from flask.cli import AppGroup
+
+
+stock_cli = AppGroup('stock', help='Libro de movimientos de stock')
+
+
+@stock_cli.command('reconstruir')
+def reconstruir_stock():
+    """Recalcula el stock de todos los insumos desde movimientos_stock."""
+    from services.stock import reconstruir_saldos
+    aperturas, corregidos = reconstruir_saldos()
+    click.echo(f"🟢 Aperturas registradas: {aperturas} | Insumos corregidos: {corregidos}")
+
+
+compras_cli = AppGroup('compras', help='Compras')
+
+
+@compras_cli.command('importar')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Valida y muestra el resultado sin guardar nada')
+def importar_compras_cmd(archivo, dry_run):
+    """Importa compras desde un CSV (fecha, proveedor|cuit, insumo|id_insumo, cantidad, precio_unitario)."""
+    from services.importacion import importar_compras
+    with open(archivo, encoding='utf-8-sig', newline='') as f:
+        resumen = importar_compras(f, dry_run=dry_run)
+    click.echo(f"🟢 Filas: {resumen['filas']} | Importadas: {resumen['importadas']} | Con error: {resumen['con_error']}"
+               + (" (dry-run, no se guardó nada)" if dry_run else ""))
+    for e in resumen['errores']:
+        click.echo(f"  línea {e['linea']}: {e['error']}")
+
+
+tanques_cli = AppGroup('tanques', help='Tanques fabricados')
+
+
+@tanques_cli.command('conciliar')
+@click.option('--reparar', is_flag=True, help='Corrige costo_total de los tanques con diferencias')
+def conciliar_tanques(reparar):
+    """Compara costo_total de cada tanque con la suma de sus líneas."""
+    from services.tanques import conciliar_costos
+    diferencias = conciliar_costos(reparar=reparar)
+    for d in diferencias:
+        click.echo(f"  tanque {d['id_tanque']}: costo_total {d['costo_total']} | calculado {d['calculado']} | diferencia {d['diferencia']}")
+    click.echo(f"🟢 Discrepancias: {len(diferencias)}" + (" (corregidas)" if reparar and diferencias else ""))
+
+
+reportes_cli = AppGroup('reportes', help='Agregados de reportes')
+
+
+@reportes_cli.command('reconstruir')
+def reconstruir_reportes():
+    """Recalcula reportes_rollup desde compras, salidas, tanques y alertas."""
+    from services.reportes import reconstruir_rollups
+    filas = reconstruir_rollups()
+    click.echo(f"🟢 Filas de agregados escritas: {filas}")
+
+
+alertas_cli = AppGroup('alertas', help='Alertas de stock')
+
+
+@alertas_cli.command('deduplicar')
+def deduplicar_alertas():
+    """Deja una alerta abierta por insumo y crea el índice que lo garantiza."""
+    from services.alertas import deduplicar
+    borradas = deduplicar()
+    click.echo(f"🟢 Alertas duplicadas eliminadas: {borradas}")
+
+
+costos_cli = AppGroup('costos', help='Costeo de inventario')
+
+
+@costos_cli.command('reconstruir')
+@click.option('--metodo', type=click.Choice(['promedio', 'fifo']), help='Método de costeo (por defecto COSTEO_METODO)')
+def reconstruir_costos(metodo):
+    """Recalcula el costeo de todos los insumos desde movimientos_stock."""
+    from services.costos import reconstruir
+    insumos = reconstruir(metodo=metodo)
+    click.echo(f"🟢 Insumos costeados: {insumos}")
+
+
+precios_cli = AppGroup('precios', help='Historial de precios')
+
+
+@precios_cli.command('compactar')
+def compactar_precios():
+    """Pliega las corridas de precios repetidos en historial_precios."""
+    from services.precios import compactar
+    borradas = compactar()
+    click.echo(f"🟢 Filas redundantes eliminadas: {borradas}")
+
+
+@precios_cli.command('mejores')
+def reconstruir_mejores_precios():
+    """Rearma mejores_precios (proveedor más barato por insumo) desde cero."""
+    from services.precios import reconstruir_mejores
+    filas = reconstruir_mejores()
+    click.echo(f"🟢 Insumos con precio: {filas}")
+
+
+archivo_cli = AppGroup('archivo', help='Archivo de líneas de tanques y alertas viejas')
+
+
+@archivo_cli.command('mover')
+@click.option('--meses', type=int, default=None, help='Antigüedad mínima en meses (por defecto ARCHIVO_MESES)')
+def archivar_cmd(meses):
+    """Mueve las líneas de tanques finalizados y las alertas resueltas anteriores al límite."""
+    from services import archivo
+    movidos = archivo.archivar(archivo.MESES if meses is None else meses)
+    click.echo(f"🟢 Tanques archivados: {movidos['tanques']} ({movidos['lineas']} líneas) | Alertas: {movidos['alertas']}")
+
+
+@archivo_cli.command('estado')
+def estado_archivo():
+    """Filas vigentes y archivadas."""
+    from services.archivo import estado
+    for tabla, (vigentes, archivadas) in estado().items():
+        click.echo(f"  {tabla}: {vigentes} vigentes | {archivadas} archivadas")
+
+
+respaldos_cli = AppGroup('respaldos', help='Respaldos de la base (PostgreSQL)')
+
+
+@respaldos_cli.command('crear')
+@click.option('--directorio', default=None, help='Carpeta de respaldos (por defecto BACKUP_DIR)')
+@click.option('--jobs', type=int, default=None, help='Procesos de pg_dump en paralelo (por defecto BACKUP_JOBS)')
+@click.option('--compresion', type=click.IntRange(0, 9), default=None, help='Nivel gzip (por defecto BACKUP_COMPRESION)')
+@click.option('--conservar', type=int, default=None, help='Después de crear, dejar solo los N más nuevos')
+def crear_respaldo(directorio, jobs, compresion, conservar):
+    """Vuelca la base (formato directorio, en paralelo y comprimido) con su manifiesto."""
+    from services import respaldos
+    try:
+        ruta, manifiesto = respaldos.crear(directorio or respaldos.DIRECTORIO, jobs or respaldos.JOBS,
+                                           respaldos.COMPRESION if compresion is None else compresion)
+    except respaldos.ErrorRespaldo as e:
+        raise click.ClickException(str(e))
+    tamano = sum(a['bytes'] for a in manifiesto['archivos'].values())
+    click.echo(f"🟢 Respaldo {ruta}: {len(manifiesto['tablas'])} tablas, {tamano / 1024 / 1024:.1f} MB en {manifiesto['duracion_s']} s")
+    if conservar is not None:
+        for borrado in respaldos.podar(directorio or respaldos.DIRECTORIO, conservar):
+            click.echo(f"  eliminado {borrado}")
+
+
+@respaldos_cli.command('verificar')
+@click.argument('ruta', required=False, type=click.Path(exists=True, file_okay=False))
+@click.option('--jobs', type=int, default=None, help='Procesos de pg_restore en paralelo')
+@click.option('--sin-restaurar', is_flag=True, help='Solo comprobar las sumas, sin restaurar en una base temporal')
+def verificar_respaldo(ruta, jobs, sin_restaurar):
+    """Comprueba sumas y filas por tabla restaurando en una base temporal (por defecto, el último respaldo)."""
+    from services import respaldos
+    if ruta is None:
+        existentes = respaldos.listar()
+        if not existentes:
+            raise click.ClickException(f"No hay respaldos en {respaldos.DIRECTORIO}")
+        ruta = existentes[0][0]
+    try:
+        resultado = respaldos.verificar(ruta, jobs or respaldos.JOBS, restaurar=not sin_restaurar)
+    except respaldos.ErrorRespaldo as e:
+        raise click.ClickException(str(e))
+    for problema in resultado['archivos']:
+        click.echo(f"  ❌ {problema}")
+    for t in resultado['tablas']:
+        marca = '✅' if t['esperado'] == t['restaurado'] else '❌'
+        click.echo(f"  {marca} {t['tabla']}: {t['restaurado']} filas (esperadas {t['esperado']})")
+    if not resultado['ok']:
+        raise click.ClickException(f"Respaldo {ruta} con errores")
+    click.echo(f"🟢 Respaldo {ruta} verificado en {resultado['duracion_s']} s")
+
+
+@respaldos_cli.command('listar')
+def listar_respaldos():
+    """Respaldos completos (con manifiesto), del más nuevo al más viejo."""
+    from services.respaldos import listar
+    for ruta, manifiesto in listar():
+        tamano = sum(a['bytes'] for a in manifiesto['archivos'].values())
+        click.echo(f"  {manifiesto['fecha']}  {ruta}  {tamano / 1024 / 1024:.1f} MB  {sum(manifiesto['tablas'].values())} filas")
+
+
+@respaldos_cli.command('podar')
+@click.option('--conservar', type=int, default=None, help='Cuántos dejar (por defecto BACKUP_CONSERVAR)')
+def podar_respaldos(conservar):
+    """Borra los respaldos más viejos (solo carpetas con manifiesto)."""
+    from services import respaldos
+    borrados = respaldos.podar(conservar=respaldos.CONSERVAR if conservar is None else conservar)
+    for ruta in borrados:
+        click.echo(f"  eliminado {ruta}")
+    click.echo(f"🟢 Respaldos eliminados: {len(borrados)}")
+
+
+migraciones_cli = AppGroup('migraciones', help='Migraciones del esquema')
+
+
+@migraciones_cli.command('aplicar')
+@click.option('--hasta', type=int, help='Aplicar solo hasta esta versión')
+def aplicar_migraciones_cmd(hasta):
+    """Aplica las migraciones pendientes (índices con CONCURRENTLY en PostgreSQL)."""
+    from migraciones import aplicar_migraciones
+    hechas = aplicar_migraciones(hasta=hasta, log=click.echo)
+    click.echo(f"🟢 Migraciones aplicadas: {len(hechas)}")
+
+
+@migraciones_cli.command('estado')
+def estado_migraciones():
+    """Lista las migraciones y si ya están aplicadas."""
+    from migraciones import estado
+    for version, descripcion, aplicada_en in estado():
+        marca = f"aplicada {aplicada_en:%Y-%m-%d %H:%M}" if aplicada_en else 'PENDIENTE'
+        click.echo(f"  {version:03d}  {descripcion}  [{marca}]")
+
+
+def inicializar_base(log=print):
+    """Migra el esquema, arma los agregados, el costeo y los mejores precios si faltan y crea el admin. Idempotente."""
+    from migraciones import aplicar_migraciones
+    from services.reportes import inicializar_rollups
+    from services.costos import inicializar_costos
+    from services.precios import inicializar_mejores_precios
+    from models import db, User
+
+    aplicar_migraciones(log=log)
+    inicializar_rollups()
+    inicializar_costos()
+    inicializar_mejores_precios()
+    if not User.query.filter_by(username='admin').first():
+        admin = User(username='admin', role='administrador')
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.commit()
+        log("🟢 Admin creado: usuario='admin', pass='admin123'")
+
+
+@click.command('init-db')
+def init_db():
+    """Prepara la base (una vez por despliegue, antes de arrancar gunicorn)."""
+    inicializar_base(log=click.echo)
+    click.echo("🟢 Base lista")
+
+
+def register_commands(app):
+    app.cli.add_command(init_db)
+    app.cli.add_command(stock_cli)
+    app.cli.add_command(compras_cli)
+    app.cli.add_command(tanques_cli)
+    app.cli.add_command(reportes_cli)
+    app.cli.add_command(alertas_cli)
+    app.cli.add_command(costos_cli)
+    app.cli.add_command(precios_cli)
+    app.cli.add_command(archivo_cli)
+    app.cli.add_command(respaldos_cli)
+    app.cli.add_command(migraciones_cli)
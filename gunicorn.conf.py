@@ -0,0 +1,65 @@
+# gunicorn.conf.py
+# gunicorn -c gunicorn.conf.py app:app
+import os
+import time
+
+_inicio_master = time.perf_counter()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', '4'))
+# gthread: cada worker atiende varias conexiones, así los streams SSE
+# (/api/eventos/stream) no bloquean un worker entero. Cada stream sí ocupa
+# un hilo: services/eventos.py admite hasta la mitad de los hilos por worker
+# (SSE_MAX_CLIENTES) y responde 503 al resto
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+# La app se importa una vez en el master y los workers la heredan por fork
+# (copy-on-write): arrancan sin volver a importar Flask, SQLAlchemy ni los
+# blueprints. create_app no abre conexiones, así que no hay sockets para
+# compartir por error; igual se descarta el pool heredado por las dudas.
+preload_app = True
+
+# Métricas de Prometheus sumadas entre workers: cada uno escribe en este
+# directorio (tiene que estar definido antes de importar la app)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+
+
+def _preparar_metricas(directorio):
+    # archivos de una corrida anterior darían contadores mezclados
+    os.makedirs(directorio, exist_ok=True)
+    for archivo in os.listdir(directorio):
+        os.unlink(os.path.join(directorio, archivo))
+
+
+# Al leer este archivo y no en on_starting: con preload_app gunicorn importa
+# la app antes de llamar a on_starting, y services/metricas abre sus
+# archivos mmap al importarse. Solo la primera vez en el master: un HUP
+# vuelve a leer la configuración con los workers todavía escribiendo.
+if os.environ.get('_PROMETHEUS_MULTIPROC_MASTER') != str(os.getpid()):
+    os.environ['_PROMETHEUS_MULTIPROC_MASTER'] = str(os.getpid())
+    _preparar_metricas(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+
+def post_fork(server, worker):
+    worker.inicio_arranque = time.perf_counter()
+    from app import app
+    from models import db
+    with app.app_context():
+        db.engine.dispose(close=False)  # conexiones del padre: no cerrarlas, solo olvidarlas
+
+
+def post_worker_init(worker):
+    # tiempo desde el fork hasta que el worker queda listo para atender
+    ms = (time.perf_counter() - worker.inicio_arranque) * 1000
+    worker.log.info("Worker %s listo en %.0f ms", worker.pid, ms)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    server.log.info("Master listo (preload) en %.0f ms", (time.perf_counter() - _inicio_master) * 1000)
+
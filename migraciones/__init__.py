@@ -0,0 +1,128 @@
+# migraciones/__init__.py
+import importlib
+import pkgutil
+import re
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, insert, select, text
+from models import db
+
+
+# ------------------------------------------------------------
+# Migraciones versionadas del esquema
+#
+# Cada módulo vNNN_descripcion.py de este paquete define DESCRIPCION y
+# aplicar(m), donde m es un Migrador. Las versiones aplicadas quedan en
+# schema_version. Las migraciones usan los ayudantes del Migrador, que son
+# idempotentes (IF NOT EXISTS / se fijan en el catálogo): si una corrida se
+# corta a la mitad se puede repetir sin tocar nada a mano.
+#
+# La conexión está en autocommit para poder usar CREATE INDEX CONCURRENTLY
+# en PostgreSQL (no bloquea escrituras de la tabla mientras se construye).
+# ------------------------------------------------------------
+_CANDADO = 74310015  # pg_advisory_lock: un solo proceso migra a la vez
+
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('descripcion', String(200), nullable=False),
+    Column('aplicada_en', DateTime, nullable=False),
+)
+
+
+class Migrador:
+    """Ayudantes que reciben las migraciones."""
+
+    def __init__(self, conexion, log=print):
+        self.conexion = conexion
+        self.dialecto = conexion.dialect.name
+        self.log = log  # el mismo destino que los mensajes de aplicar_migraciones
+
+    @property
+    def postgres(self):
+        return self.dialecto == 'postgresql'
+
+    def ejecutar(self, sql, **parametros):
+        return self.conexion.execute(text(sql), parametros)
+
+    def crear_tablas(self, *modelos):
+        """CREATE TABLE de los modelos que falten (todos si no se indica ninguno)."""
+        tablas = [m.__table__ for m in modelos] or None
+        db.metadata.create_all(bind=self.conexion, tables=tablas, checkfirst=True)
+
+    def columnas(self, tabla):
+        return {c['name'] for c in inspect(self.conexion).get_columns(tabla)}
+
+    def agregar_columna(self, tabla, columna, definicion):
+        if columna not in self.columnas(tabla):
+            self.ejecutar(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+
+    def _indice_invalido(self, nombre):
+        # un CREATE INDEX CONCURRENTLY que falló deja el índice marcado inválido
+        return self.ejecutar(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :nombre AND NOT i.indisvalid", nombre=nombre
+        ).first() is not None
+
+    def crear_indice(self, nombre, tabla, columnas, where=None, unico=False, metodo=None):
+        """CREATE [UNIQUE] INDEX [CONCURRENTLY] IF NOT EXISTS, rehaciéndolo si quedó inválido."""
+        concurrente = ''
+        if self.postgres:
+            concurrente = 'CONCURRENTLY '
+            if self._indice_invalido(nombre):
+                self.ejecutar(f"DROP INDEX CONCURRENTLY IF EXISTS {nombre}")
+        sql = (
+            f"CREATE {'UNIQUE ' if unico else ''}INDEX {concurrente}IF NOT EXISTS {nombre} "
+            f"ON {tabla} {'USING ' + metodo + ' ' if metodo else ''}({columnas})"
+        )
+        if where:
+            sql += f" WHERE {where}"
+        self.ejecutar(sql)
+
+
+def _modulos():
+    """[(version, modulo)] en orden."""
+    import migraciones
+    encontrados = []
+    for info in pkgutil.iter_modules(migraciones.__path__):
+        coincide = re.match(r'v(\d+)_', info.name)
+        if coincide:
+            encontrados.append((int(coincide.group(1)), importlib.import_module(f'migraciones.{info.name}')))
+    return sorted(encontrados, key=lambda par: par[0])
+
+
+def _aplicadas(conexion):
+    schema_version.create(conexion, checkfirst=True)
+    return set(conexion.execute(select(schema_version.c.version)).scalars())
+
+
+def estado():
+    """[(version, descripcion, aplicada_en o None)]."""
+    with db.engine.begin() as conexion:
+        schema_version.create(conexion, checkfirst=True)
+        aplicadas = dict(conexion.execute(select(schema_version.c.version, schema_version.c.aplicada_en)).all())
+    return [(v, m.DESCRIPCION, aplicadas.get(v)) for v, m in _modulos()]
+
+
+def aplicar_migraciones(hasta=None, log=print):
+    """Aplica en orden las migraciones pendientes. Devuelve las versiones aplicadas."""
+    hechas = []
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conexion:
+        m = Migrador(conexion, log=log)
+        if m.postgres:
+            m.ejecutar("SELECT pg_advisory_lock(:k)", k=_CANDADO)
+        try:
+            aplicadas = _aplicadas(conexion)  # se relee con el candado tomado
+            for version, modulo in _modulos():
+                if version in aplicadas or (hasta is not None and version > hasta):
+                    continue
+                log(f"🔧 Migración {version:03d}: {modulo.DESCRIPCION}")
+                modulo.aplicar(m)
+                conexion.execute(insert(schema_version).values(
+                    version=version, descripcion=modulo.DESCRIPCION, aplicada_en=datetime.utcnow()
+                ))
+                hechas.append(version)
+        finally:
+            if m.postgres:
+                m.ejecutar("SELECT pg_advisory_unlock(:k)", k=_CANDADO)
+    return hechas
@@ -0,0 +1,6 @@
+# migraciones/v001_esquema_base.py
+DESCRIPCION = 'Tablas de los modelos (equivalente al db.create_all anterior)'
+
+
+def aplicar(m):
+    m.crear_tablas()
@@ -0,0 +1,16 @@
+# migraciones/v002_columnas_agregadas_a_mano.py
+DESCRIPCION = 'Columnas que se venían agregando a mano en bases existentes'
+
+COLUMNAS = [
+    ('compras', 'revisado', 'BOOLEAN DEFAULT FALSE'),
+    ('compras', 'confirmado', 'BOOLEAN DEFAULT FALSE'),
+    ('historial_precios', 'revisado', 'BOOLEAN DEFAULT FALSE'),
+    ('historial_precios', 'confirmado', 'BOOLEAN DEFAULT FALSE'),
+    ('tanques_fabricados', 'finalizado', 'BOOLEAN DEFAULT FALSE'),
+    ('tanque_insumo', 'operario', 'VARCHAR(100)'),
+]
+
+
+def aplicar(m):
+    for tabla, columna, definicion in COLUMNAS:
+        m.agregar_columna(tabla, columna, definicion)
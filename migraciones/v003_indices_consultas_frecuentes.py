@@ -0,0 +1,41 @@
+# migraciones/v003_indices_consultas_frecuentes.py
+DESCRIPCION = 'Índices de claves foráneas y filtros frecuentes'
+
+ABIERTAS = "estado IN ('Pendiente', 'Reconocida')"
+
+# (nombre, tabla, columnas, where)
+INDICES = [
+    # claves foráneas (joins de salidas, compras y precios)
+    ('ix_tanque_insumo_id_tanque', 'tanque_insumo', 'id_tanque', None),
+    ('ix_tanque_insumo_id_insumo', 'tanque_insumo', 'id_insumo', None),
+    ('ix_compras_id_insumo', 'compras', 'id_insumo', None),
+    ('ix_compras_id_proveedor', 'compras', 'id_proveedor', None),
+    ('ix_proveedor_insumo_proveedor_insumo', 'proveedor_insumo', 'id_proveedor, id_insumo', None),
+    ('ix_proveedor_insumo_id_insumo', 'proveedor_insumo', 'id_insumo', None),
+    ('ix_historial_precios_id_proveedor_insumo', 'historial_precios', 'id_proveedor_insumo, fecha', None),
+    ('ix_movimientos_stock_insumo', 'movimientos_stock', 'id_insumo, id_movimiento', None),
+    # listados
+    ('ix_alertas_stock_estado_fecha', 'alertas_stock', 'estado, fecha', None),
+    ('ix_tanques_fabricados_fecha', 'tanques_fabricados', 'fecha, id_tanque', None),
+    # parciales: solo las filas que se consultan seguido
+    ('ix_alertas_stock_abiertas', 'alertas_stock', 'fecha', ABIERTAS),
+    ('ix_insumos_bajo_stock', 'insumos', 'id_insumo', 'cantidad <= stock_minimo'),  # el del tablero (app.py)
+    ('ix_tanques_fabricados_activos', 'tanques_fabricados', 'id_tanque', 'NOT finalizado'),
+]
+
+
+def aplicar(m):
+    for nombre, tabla, columnas, where in INDICES:
+        m.crear_indice(nombre, tabla, columnas, where=where)
+
+    # el índice único de alertas abiertas no se puede crear si hay duplicados
+    # viejos: queda la más reciente de cada insumo. Con SQL directo y no con
+    # services.alertas.deduplicar, que usa el ORM y crea los índices sin
+    # CONCURRENTLY; los agregados de reportes se arman después de migrar.
+    borradas = m.ejecutar(
+        f"DELETE FROM alertas_stock WHERE {ABIERTAS} AND id_alerta NOT IN ("
+        f"SELECT max(id_alerta) FROM alertas_stock WHERE {ABIERTAS} GROUP BY id_insumo)"
+    ).rowcount
+    if borradas:
+        m.log(f"🟡 {borradas} alertas abiertas duplicadas borradas")
+    m.crear_indice('ux_alertas_stock_abierta', 'alertas_stock', 'id_insumo', where=ABIERTAS, unico=True)
@@ -0,0 +1,31 @@
+# migraciones/v004_busqueda_trigramas.py
+DESCRIPCION = 'Extensiones e índices de trigramas para la búsqueda (solo PostgreSQL)'
+
+EXTENSIONES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() no es IMMUTABLE; el envoltorio permite usarlo en un índice
+    """CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+       $$ SELECT public.unaccent('public.unaccent', $1) $$
+       LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT""",
+]
+
+INDICES = [
+    ('ix_insumos_nombre_trgm', 'insumos', 'nombre'),
+    ('ix_proveedores_nombre_trgm', 'proveedores', 'nombre'),
+    ('ix_tanques_cliente_trgm', 'tanques_fabricados', 'cliente'),
+]
+
+
+def aplicar(m):
+    if not m.postgres:
+        return
+    try:
+        for sentencia in EXTENSIONES:
+            m.ejecutar(sentencia)
+    except Exception as e:
+        # sin permisos para crear extensiones la búsqueda usa el índice en memoria
+        m.log(f"🟡 Búsqueda por trigramas no disponible, se usa el índice en memoria: {e}")
+        return
+    for nombre, tabla, columna in INDICES:
+        m.crear_indice(nombre, tabla, f"f_unaccent(lower({columna})) gin_trgm_ops", metodo='gin')
@@ -0,0 +1,8 @@
+# migraciones/v005_costeo_inventario.py
+DESCRIPCION = 'Costeo de inventario: estado por insumo y capas FIFO'
+
+
+def aplicar(m):
+    from models import CostoInsumo, CapaCosto
+    m.crear_tablas(CostoInsumo, CapaCosto)
+    # el estado inicial se arma desde el libro en init-db (services.costos.inicializar_costos)
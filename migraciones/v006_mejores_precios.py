@@ -0,0 +1,10 @@
+# migraciones/v006_mejores_precios.py
+DESCRIPCION = 'Tabla mejores_precios e índice de la última compra por insumo'
+
+
+def aplicar(m):
+    from models import MejorPrecio
+    m.crear_tablas(MejorPrecio)
+    # MAX(fecha) de las compras de un insumo sale del índice, sin leer la tabla
+    m.crear_indice('ix_compras_insumo_fecha', 'compras', 'id_insumo, fecha')
+    # el contenido se arma en init-db (services.precios.inicializar_mejores_precios)
@@ -0,0 +1,10 @@
+# migraciones/v007_versiones_de_fila.py
+DESCRIPCION = 'Columna version (control de concurrencia optimista) en registros editables'
+
+# ADD COLUMN con DEFAULT constante no reescribe la tabla en PostgreSQL 11+
+TABLAS = ['insumos', 'proveedores', 'compras', 'tanques_fabricados', 'tanque_insumo']
+
+
+def aplicar(m):
+    for tabla in TABLAS:
+        m.agregar_columna(tabla, 'version', 'INTEGER NOT NULL DEFAULT 1')
@@ -0,0 +1,27 @@
+# migraciones/v008_archivo.py
+DESCRIPCION = 'Tablas de archivo de líneas de tanques y alertas, y vistas históricas (vigentes + archivo)'
+
+COLUMNAS = [
+    ('tanques_fabricados', 'finalizado_en', 'TIMESTAMP'),
+    ('tanques_fabricados', 'archivado', 'BOOLEAN NOT NULL DEFAULT FALSE'),
+]
+
+LINEAS = 'id_tanque_insumo, id_tanque, id_insumo, cantidad_usada, costo_unitario, operario, fecha_registro'
+ALERTAS = 'id_alerta, id_insumo, fecha, cantidad_actual, stock_minimo, estado'
+
+VISTAS = {
+    'tanque_insumo_historico':
+        f"SELECT {LINEAS} FROM tanque_insumo UNION ALL SELECT {LINEAS} FROM tanque_insumo_archivo",
+    'alertas_stock_historico':
+        f"SELECT {ALERTAS} FROM alertas_stock UNION ALL SELECT {ALERTAS} FROM alertas_stock_archivo",
+}
+
+
+def aplicar(m):
+    from models import TanqueInsumoArchivo, AlertaStockArchivo
+    for tabla, columna, definicion in COLUMNAS:
+        m.agregar_columna(tabla, columna, definicion)
+    m.crear_tablas(TanqueInsumoArchivo, AlertaStockArchivo)
+    for nombre, consulta in VISTAS.items():
+        crear = 'CREATE OR REPLACE VIEW' if m.postgres else 'CREATE VIEW IF NOT EXISTS'
+        m.ejecutar(f"{crear} {nombre} AS {consulta}")
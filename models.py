@@ -15,6 +15,8 @@ class Insumo(db.Model):
     cantidad = db.Column(db.Numeric(10,2), default=0)
     unidad_medida = db.Column(db.String(20), nullable=False)
     stock_minimo = db.Column(db.Numeric(10,2), default=0)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # control optimista
+    __mapper_args__ = {'version_id_col': version}
 
     compras = db.relationship('Compra', back_populates='insumo', lazy=True)
     proveedor_insumo = db.relationship('ProveedorInsumo', backref='insumo', lazy=True)
@@ -27,7 +29,8 @@ class Insumo(db.Model):
             'nombre': self.nombre,
             'cantidad': float(self.cantidad),
             'unidad_medida': self.unidad_medida,
-            'stock_minimo': float(self.stock_minimo)
+            'stock_minimo': float(self.stock_minimo),
+            'version': self.version
         }
 
 # ---------- Proveedores ----------
@@ -41,6 +44,8 @@ class Proveedor(db.Model):
     direccion = db.Column(db.String(150))
     telefono = db.Column(db.String(20))
     email = db.Column(db.String(100))
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # control optimista
+    __mapper_args__ = {'version_id_col': version}
     compras = db.relationship('Compra', back_populates='proveedor', lazy=True)
     proveedor_insumo = db.relationship('ProveedorInsumo', backref='proveedor', lazy=True)
 
@@ -52,7 +57,8 @@ class Proveedor(db.Model):
             'cuit': self.cuit,
             'direccion': self.direccion,
             'telefono': self.telefono,
-            'email': self.email
+            'email': self.email,
+            'version': self.version
         }
 
     def insumos_detalle(self):
@@ -108,6 +114,8 @@ class Compra(db.Model):
     total = db.Column(db.Numeric(12,2), nullable=False)
     revisado = db.Column(db.Boolean, default=False)  # <-- Nueva columna
     confirmado = db.Column(db.Boolean, default=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # control optimista
+    __mapper_args__ = {'version_id_col': version}
 
 
     proveedor = db.relationship('Proveedor', back_populates='compras')
@@ -125,8 +133,8 @@ class Compra(db.Model):
             'precio_unitario': float(self.precio_unitario),
             'total': float(self.total),
             'revisado': self.revisado,  # <-- Se agrega para el front
-            'confirmado': self.confirmado 
-
+            'confirmado': self.confirmado,
+            'version': self.version
         }
 
 # ---------- Tanques_Fabricados ----------
@@ -138,9 +146,16 @@ class TanqueFabricado(db.Model):
     cliente = db.Column(db.String(100))
     costo_total = db.Column(db.Numeric(12,2), default=0)
     finalizado = db.Column(db.Boolean, default=False)  # <- nuevo campo
+    finalizado_en = db.Column(db.DateTime)
+    archivado = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # líneas en tanque_insumo_archivo
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # control optimista
+    __mapper_args__ = {'version_id_col': version}
     tanque_insumo = db.relationship('TanqueInsumo', backref='tanque', lazy=True)
+    lineas_archivadas = db.relationship('TanqueInsumoArchivo', back_populates='tanque', lazy=True)
 
-    
+    def lineas(self):
+        """Líneas del tanque: las vigentes o, si ya se archivó, las del archivo."""
+        return self.lineas_archivadas if self.archivado else self.tanque_insumo
 
     def to_dict(self):
         return {
@@ -150,6 +165,8 @@ class TanqueFabricado(db.Model):
             'cliente': self.cliente,
             'costo_total': float(self.costo_total),
             'finalizado': self.finalizado,
+            'archivado': self.archivado,
+            'version': self.version,
             'insumos_utilizados': [
                 {
                     'id_tanque_insumo': ti.id_tanque_insumo,
@@ -157,7 +174,7 @@ class TanqueFabricado(db.Model):
                     'nombre_insumo': ti.insumo.nombre,
                     'cantidad_usada': float(ti.cantidad_usada),
                     'costo_unitario': float(ti.costo_unitario)
-                } for ti in self.tanque_insumo
+                } for ti in self.lineas()
             ]
         }
 
@@ -171,6 +188,8 @@ class TanqueInsumo(db.Model):
     costo_unitario = db.Column(db.Numeric(10,2), nullable=False)
     operario = db.Column(db.String(100))  # 👈 NUEVO
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)  
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # control optimista
+    __mapper_args__ = {'version_id_col': version}
     
 
 
@@ -183,18 +202,27 @@ class TanqueInsumo(db.Model):
             'costo_unitario': float(self.costo_unitario),
             'operario': self.operario,
             'fecha_registro': self.fecha_registro.isoformat() if self.fecha_registro else None,
-            'editable': not self.tanque.finalizado  # <- indicamos si se puede modificar
+            'editable': not self.tanque.finalizado,  # <- indicamos si se puede modificar
+            'version': self.version
         }
 
 # ---------- Alertas_Stock ----------
 class AlertaStock(db.Model):
     __tablename__ = 'alertas_stock'
+    __table_args__ = (
+        # como mucho una alerta abierta (Pendiente o Reconocida) por insumo
+        db.Index(
+            'ux_alertas_stock_abierta', 'id_insumo', unique=True,
+            postgresql_where=db.text("estado IN ('Pendiente', 'Reconocida')"),
+            sqlite_where=db.text("estado IN ('Pendiente', 'Reconocida')")
+        ),
+    )
     id_alerta = db.Column(db.Integer, primary_key=True)
     id_insumo = db.Column(db.Integer, db.ForeignKey('insumos.id_insumo'), nullable=False)
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
     cantidad_actual = db.Column(db.Numeric(10,2), nullable=False)
     stock_minimo = db.Column(db.Numeric(10,2), nullable=False)
-    estado = db.Column(db.String(20), default='Pendiente')
+    estado = db.Column(db.String(20), default='Pendiente')  # Pendiente, Reconocida, Resuelta
 
     def to_dict(self):
         return {
@@ -208,6 +236,187 @@ class AlertaStock(db.Model):
         }
 
 
+# ---------- Archivo (filas frías fuera del conjunto de trabajo) ----------
+# Mismas columnas que tanque_insumo / alertas_stock (con los mismos ids) más
+# la fecha en que se archivaron. services/archivo.py las mueve y las vistas
+# *_historico las unen con las vigentes para los reportes.
+class TanqueInsumoArchivo(db.Model):
+    __tablename__ = 'tanque_insumo_archivo'
+    __table_args__ = (
+        db.Index('ix_tanque_insumo_archivo_id_tanque', 'id_tanque'),
+    )
+    id_tanque_insumo = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    id_tanque = db.Column(db.Integer, db.ForeignKey('tanques_fabricados.id_tanque'), nullable=False)
+    id_insumo = db.Column(db.Integer, db.ForeignKey('insumos.id_insumo'), nullable=False)
+    cantidad_usada = db.Column(db.Numeric(10,2), nullable=False)
+    costo_unitario = db.Column(db.Numeric(10,2), nullable=False)
+    operario = db.Column(db.String(100))
+    fecha_registro = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    archivado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    tanque = db.relationship('TanqueFabricado', back_populates='lineas_archivadas')
+    insumo = db.relationship('Insumo')
+
+    def to_dict(self):
+        return {
+            'id_tanque_insumo': self.id_tanque_insumo,
+            'id_tanque': self.id_tanque,
+            'id_insumo': self.id_insumo,
+            'cantidad_usada': float(self.cantidad_usada),
+            'costo_unitario': float(self.costo_unitario),
+            'operario': self.operario,
+            'fecha_registro': self.fecha_registro.isoformat() if self.fecha_registro else None,
+            'editable': False,
+            'version': self.version
+        }
+
+
+class AlertaStockArchivo(db.Model):
+    __tablename__ = 'alertas_stock_archivo'
+    __table_args__ = (
+        db.Index('ix_alertas_stock_archivo_id_insumo', 'id_insumo'),
+    )
+    id_alerta = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    id_insumo = db.Column(db.Integer, db.ForeignKey('insumos.id_insumo'), nullable=False)
+    fecha = db.Column(db.DateTime)
+    cantidad_actual = db.Column(db.Numeric(10,2), nullable=False)
+    stock_minimo = db.Column(db.Numeric(10,2), nullable=False)
+    estado = db.Column(db.String(20))
+    archivado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# ---------- Movimientos_Stock (libro de movimientos) ----------
+class MovimientoStock(db.Model):
+    __tablename__ = 'movimientos_stock'
+    id_movimiento = db.Column(db.Integer, primary_key=True)
+    id_insumo = db.Column(db.Integer, db.ForeignKey('insumos.id_insumo'), nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)  # compra, salida, ajuste, reversion
+    cantidad = db.Column(db.Numeric(12,2), nullable=False)  # con signo: + entra, - sale
+    saldo = db.Column(db.Numeric(12,2), nullable=False)  # stock del insumo luego del movimiento
+    referencia = db.Column(db.String(50))  # ej: 'compra:12', 'tanque_insumo:40'
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id_movimiento': self.id_movimiento,
+            'id_insumo': self.id_insumo,
+            'tipo': self.tipo,
+            'cantidad': float(self.cantidad),
+            'saldo': float(self.saldo),
+            'referencia': self.referencia,
+            'fecha': self.fecha.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+
+# ---------- Reportes_Rollup (agregados por día / mes) ----------
+class ReporteRollup(db.Model):
+    __tablename__ = 'reportes_rollup'
+    periodo = db.Column(db.String(3), primary_key=True)  # dia, mes
+    fecha = db.Column(db.Date, primary_key=True)  # inicio del día o del mes
+    dimension = db.Column(db.String(10), primary_key=True)  # global, insumo, proveedor, modelo
+    clave = db.Column(db.String(100), primary_key=True)  # id del insumo/proveedor, nombre del modelo o ''
+    gasto_compras = db.Column(db.Numeric(14,2), nullable=False, default=0)
+    cantidad_comprada = db.Column(db.Numeric(14,2), nullable=False, default=0)
+    cantidad_consumida = db.Column(db.Numeric(14,2), nullable=False, default=0)
+    costo_tanques = db.Column(db.Numeric(14,2), nullable=False, default=0)
+    alertas = db.Column(db.Integer, nullable=False, default=0)
+    tanques = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'periodo': self.periodo,
+            'fecha': self.fecha.strftime('%Y-%m-%d'),
+            'dimension': self.dimension,
+            'clave': self.clave,
+            'gasto_compras': float(self.gasto_compras),
+            'cantidad_comprada': float(self.cantidad_comprada),
+            'cantidad_consumida': float(self.cantidad_consumida),
+            'costo_tanques': float(self.costo_tanques),
+            'alertas': self.alertas,
+            'tanques': self.tanques
+        }
+
+
+# ---------- Versiones_Tabla (ETag de los listados) ----------
+class VersionTabla(db.Model):
+    __tablename__ = 'versiones_tabla'
+    tabla = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    actualizado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# ---------- Mejores_Precios (proveedor más barato por insumo) ----------
+class MejorPrecio(db.Model):
+    __tablename__ = 'mejores_precios'
+    id_insumo = db.Column(db.Integer, db.ForeignKey('insumos.id_insumo'), primary_key=True)
+    id_proveedor = db.Column(db.Integer, db.ForeignKey('proveedores.id_proveedor'), nullable=False)  # el más barato
+    id_proveedor_insumo = db.Column(db.Integer, db.ForeignKey('proveedor_insumo.id_proveedor_insumo'), nullable=False)
+    precio_minimo = db.Column(db.Numeric(10,2), nullable=False)
+    precio_maximo = db.Column(db.Numeric(10,2), nullable=False)
+    precio_promedio = db.Column(db.Numeric(12,4), nullable=False)
+    proveedores = db.Column(db.Integer, nullable=False)  # asociaciones proveedor-insumo con precio
+    ultima_compra = db.Column(db.Date)
+    actualizado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        minimo, maximo = float(self.precio_minimo), float(self.precio_maximo)
+        return {
+            'id_insumo': self.id_insumo,
+            'id_proveedor': self.id_proveedor,
+            'id_proveedor_insumo': self.id_proveedor_insumo,
+            'precio_minimo': minimo,
+            'precio_maximo': maximo,
+            'precio_promedio': round(float(self.precio_promedio), 2),
+            'dispersion': round(maximo - minimo, 2),
+            'dispersion_pct': round((maximo - minimo) / minimo * 100, 2) if minimo else None,
+            'proveedores': self.proveedores,
+            'ultima_compra': self.ultima_compra.strftime('%Y-%m-%d') if self.ultima_compra else None
+        }
+
+
+# ---------- Costos_Insumo (estado del costeo por insumo) ----------
+class CostoInsumo(db.Model):
+    __tablename__ = 'costos_insumo'
+    id_insumo = db.Column(db.Integer, db.ForeignKey('insumos.id_insumo'), primary_key=True)
+    metodo = db.Column(db.String(10), nullable=False)  # promedio, fifo
+    cantidad = db.Column(db.Numeric(14,4), nullable=False, default=0)  # existencia valorizada
+    valor = db.Column(db.Numeric(16,4), nullable=False, default=0)  # valor total de esa existencia
+    costo_unitario = db.Column(db.Numeric(12,4), nullable=False, default=0)  # promedio vigente / último costo FIFO
+    actualizado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id_insumo': self.id_insumo,
+            'metodo': self.metodo,
+            'cantidad': float(self.cantidad),
+            'valor': float(self.valor),
+            'costo_unitario': float(self.costo_unitario),
+            'actualizado': self.actualizado.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+
+# ---------- Capas_Costo (lotes FIFO con saldo) ----------
+class CapaCosto(db.Model):
+    __tablename__ = 'capas_costo'
+    __table_args__ = (
+        # las salidas solo recorren las capas con saldo, de la más vieja a la más nueva
+        db.Index(
+            'ix_capas_costo_abiertas', 'id_insumo', 'fecha', 'id_capa',
+            postgresql_where=db.text('restante > 0'),
+            sqlite_where=db.text('restante > 0')
+        ),
+        db.Index('ix_capas_costo_id_compra', 'id_compra'),
+    )
+    id_capa = db.Column(db.Integer, primary_key=True)
+    id_insumo = db.Column(db.Integer, db.ForeignKey('insumos.id_insumo'), nullable=False)
+    id_compra = db.Column(db.Integer, db.ForeignKey('compras.id_compra'))  # NULL: apertura, ajuste o devolución
+    fecha = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    cantidad = db.Column(db.Numeric(14,4), nullable=False)
+    restante = db.Column(db.Numeric(14,4), nullable=False)
+    costo_unitario = db.Column(db.Numeric(12,4), nullable=False)
+
+
 # ---------- Users ----------
 #class User(UserMixin, db.Model):
 #    id = db.Column(db.Integer, primary_key=True)
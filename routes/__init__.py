@@ -8,6 +8,11 @@ def register_blueprints(app):
     from routes.api_reportes import reportes_bp
     from routes.api_user import api_user
     from routes.api_insumos_salida import insumos_salida_bp
+    from routes.api_exportar import exportar_bp
+    from routes.api_eventos import eventos_bp
+    from routes.api_sistema import sistema_bp
+    from routes.api_metricas import metricas_bp
+    from routes.api_precios import precios_bp
 
 
 
@@ -19,5 +24,10 @@ def register_blueprints(app):
     app.register_blueprint(reportes_bp)
     app.register_blueprint(api_user)
     app.register_blueprint(insumos_salida_bp)
+    app.register_blueprint(exportar_bp)
+    app.register_blueprint(eventos_bp)
+    app.register_blueprint(sistema_bp)
+    app.register_blueprint(metricas_bp)
+    app.register_blueprint(precios_bp)
 
    
@@ -1,17 +1,48 @@
 # routes/api_alertas.py
 from flask import Blueprint, jsonify
+from flask_login import login_required
 from models import db, AlertaStock
+from services.serializers import con_relaciones
+from services.paginacion import paginar
+from services.alertas import ABIERTAS, RECONOCIDA, RESUELTA, cambiar_estado
 
 alertas_bp = Blueprint('alertas_bp', __name__, url_prefix='/api/alertas')
 
 # 🔹 Listar todas las alertas
 @alertas_bp.route('/', methods=['GET'])
 def get_alertas():
-    alertas = AlertaStock.query.order_by(AlertaStock.fecha.desc()).all()
-    return jsonify([a.to_dict() for a in alertas])
+    return paginar(
+        con_relaciones(AlertaStock.query, 'alerta'),
+        [(AlertaStock.fecha, 'desc'), (AlertaStock.id_alerta, 'desc')],
+        lambda a: a.to_dict()
+    )
 
-# 🔹 Listar alertas pendientes
+# 🔹 Listar alertas abiertas (Pendiente o Reconocida, una por insumo)
 @alertas_bp.route('/pendientes', methods=['GET'])
 def get_alertas_pendientes():
-    alertas = AlertaStock.query.filter_by(estado='Pendiente').order_by(AlertaStock.fecha.desc()).all()
-    return jsonify([a.to_dict() for a in alertas])
\ No newline at end of file
+    return paginar(
+        con_relaciones(AlertaStock.query, 'alerta').filter(AlertaStock.estado.in_(ABIERTAS)),
+        [(AlertaStock.fecha, 'desc'), (AlertaStock.id_alerta, 'desc')],
+        lambda a: a.to_dict()
+    )
+
+# 🔹 Reconocer una alerta (sigue abierta hasta que se repone el stock)
+@alertas_bp.route('/<int:id_alerta>/reconocer', methods=['PUT'])
+@login_required
+def reconocer_alerta(id_alerta):
+    return _cambiar_estado(id_alerta, RECONOCIDA)
+
+# 🔹 Resolver una alerta a mano
+@alertas_bp.route('/<int:id_alerta>/resolver', methods=['PUT'])
+@login_required
+def resolver_alerta(id_alerta):
+    return _cambiar_estado(id_alerta, RESUELTA)
+
+
+def _cambiar_estado(id_alerta, estado):
+    alerta = con_relaciones(AlertaStock.query, 'alerta').filter_by(id_alerta=id_alerta).first_or_404()
+    error = cambiar_estado(alerta, estado)
+    if error:
+        return jsonify({'error': error}), 400
+    db.session.commit()
+    return jsonify(alerta.to_dict()), 200
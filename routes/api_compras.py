@@ -1,23 +1,42 @@
 # routes/api_compras.py
 from flask import Blueprint, request, jsonify
-from models import db, Compra, Proveedor, Insumo, ProveedorInsumo, HistorialPrecio, AlertaStock
+from models import db, Compra, Proveedor, Insumo, ProveedorInsumo
 from datetime import datetime
 from decimal import Decimal
 from flask_login import current_user, login_required
 from flask import render_template
+from services.serializers import con_relaciones
+from services.versiones import condicional
+from services.cache import cacheada
+from services.paginacion import paginar
+from services.busqueda import buscar
+from services.stock import mover_stock
+from services import costos
+from services.precios import cambiar_precio
+from services.importacion import importar_compras
+from services.concurrencia import verificar_version
+import io
 
 compras_bp = Blueprint('compras_bp', __name__, url_prefix='/api/v1/compras')
 
 @compras_bp.route('/', methods=['GET'])
 def listar_compras():
-    compras = Compra.query.order_by(Compra.id_compra.desc()).all()
-    return jsonify([c.to_dict() for c in compras])
+    return paginar(
+        con_relaciones(Compra.query, 'compra'),
+        [(Compra.id_compra, 'desc')],
+        lambda c: c.to_dict()
+    )
 
 
 @compras_bp.route('/insumos', methods=['GET'])
+@condicional('insumos')
+@cacheada('insumos')
 def listar_insumos():
-    insumos = Insumo.query.order_by(Insumo.nombre).all()
-    return jsonify([{'id_insumo': i.id_insumo, 'nombre': i.nombre} for i in insumos])
+    return paginar(
+        Insumo.query,
+        [(Insumo.nombre, 'asc'), (Insumo.id_insumo, 'asc')],
+        lambda i: {'id_insumo': i.id_insumo, 'nombre': i.nombre}
+    )
 
 
 
@@ -28,10 +47,10 @@ def buscar_compras_por_insumo():
     if not nombre:
         return jsonify([])
 
+    ids_insumo = buscar('insumos', nombre, limite=None, solo_contiene=True)
     compras = (
-        db.session.query(Compra)
-        .join(Insumo)
-        .filter(Insumo.nombre.ilike(f"%{nombre}%"))
+        con_relaciones(db.session.query(Compra), 'compra')
+        .filter(Compra.id_insumo.in_(ids_insumo))
         .order_by(Compra.id_compra.desc())
         .all()
     )
@@ -85,38 +104,50 @@ def crear_compra():
         precio_unitario = precio_unitario,
         total = total
     )
-    # Actualizar stock del insumo (las compras incrementan stock)
-    insumo.cantidad = Decimal(insumo.cantidad) + cantidad
-
     db.session.add(compra)
+    db.session.flush()  # para tener id_compra
 
-    # Actualizar o crear registro proveedor_insumo y registrar historial de precio
-    proveedor_insumo = ProveedorInsumo.query.filter_by(id_proveedor=proveedor.id_proveedor, id_insumo=insumo.id_insumo).first()
-    if proveedor_insumo:
-        proveedor_insumo.precio_actual = precio_unitario
-    else:
-        proveedor_insumo = ProveedorInsumo(id_proveedor=proveedor.id_proveedor, id_insumo=insumo.id_insumo, precio_actual=precio_unitario)
-        db.session.add(proveedor_insumo)
-        db.session.flush()  # para tener id_proveedor_insumo
-
-    # Registrar historial de precios
-    historial = HistorialPrecio(id_proveedor_insumo=proveedor_insumo.id_proveedor_insumo, precio=precio_unitario)
-    db.session.add(historial)
+    # Costeo (antes de mover el stock) y stock del insumo (las compras incrementan stock)
+    costos.entrada(insumo.id_insumo, cantidad, precio_unitario, id_compra=compra.id_compra, fecha=compra.fecha)
+    mover_stock(insumo.id_insumo, cantidad, 'compra', f'compra:{compra.id_compra}')
 
-    # Generar alerta si quedó por debajo del mínimo
-    if float(insumo.cantidad) < float(insumo.stock_minimo):
-        alerta = AlertaStock(id_insumo=insumo.id_insumo, cantidad_actual=insumo.cantidad, stock_minimo=insumo.stock_minimo)
-        db.session.add(alerta)
+    # Actualizar o crear registro proveedor_insumo (el historial solo guarda cambios de precio)
+    proveedor_insumo = ProveedorInsumo.query.filter_by(id_proveedor=proveedor.id_proveedor, id_insumo=insumo.id_insumo).first() \
+        or ProveedorInsumo(id_proveedor=proveedor.id_proveedor, id_insumo=insumo.id_insumo, precio_actual=precio_unitario)
+    cambiar_precio(proveedor_insumo, precio_unitario, fecha=compra.fecha)
 
     db.session.commit()
     return jsonify(compra.to_dict()), 201
 
+# --------------------------------------------
+# POST /api/v1/compras/importar?dry_run=1
+# Importación masiva desde CSV (campo de archivo: "archivo")
+# --------------------------------------------
+@compras_bp.route('/importar', methods=['POST'])
+@login_required
+def importar_compras_csv():
+    if getattr(current_user, 'role', 'user') != 'administrador':
+        return jsonify({'error': 'No autorizado'}), 403
+
+    archivo = request.files.get('archivo')
+    if not archivo:
+        return jsonify({'error': 'Debe adjuntar un archivo CSV'}), 400
+
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'si')
+    texto = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+    try:
+        resumen = importar_compras(texto, dry_run=dry_run)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(resumen), 200 if dry_run else 201
+
 @compras_bp.route('/proveedor/<string:nombre>', methods=['GET'])
 def compras_por_proveedor(nombre):
+    ids_proveedor = buscar('proveedores', nombre, limite=None, solo_contiene=True)
     compras = (
-        db.session.query(Compra)
-        .join(Proveedor)
-        .filter(Proveedor.nombre.ilike(f"%{nombre}%"))
+        con_relaciones(db.session.query(Compra), 'compra')
+        .filter(Compra.id_proveedor.in_(ids_proveedor))
         .order_by(Compra.id_compra.desc())
         .all()
     )
@@ -129,7 +160,7 @@ def compras_por_proveedor(nombre):
 
 @compras_bp.route('/insumo/<int:id_insumo>', methods=['GET'])
 def compras_por_insumo(id_insumo):
-    compras = Compra.query.filter_by(id_insumo=id_insumo).all()
+    compras = con_relaciones(Compra.query, 'compra').filter_by(id_insumo=id_insumo).all()
     return jsonify([c.to_dict() for c in compras])
 
 
@@ -143,6 +174,9 @@ def actualizar_compra(id_compra):
 
     data = request.json
     compra = Compra.query.get_or_404(id_compra)
+    conflicto = verificar_version(compra)
+    if conflicto:
+        return conflicto
     insumo = Insumo.query.get_or_404(compra.id_insumo)
     proveedor = Proveedor.query.get_or_404(compra.id_proveedor)
 
@@ -155,11 +189,14 @@ def actualizar_compra(id_compra):
     nuevo_precio = Decimal(str(data.get('precio_unitario', compra.precio_unitario)))
     nueva_fecha = data.get('fecha', compra.fecha.strftime('%Y-%m-%d'))
 
+    # Costeo: la compra cambia de cantidad o de precio (antes de mover el stock)
+    costos.ajustar_compra(compra.id_compra, insumo.id_insumo, cantidad_original, precio_original, nueva_cantidad, nuevo_precio)
+
     # Ajustamos stock del insumo
-    # Primero revertimos la compra anterior
-    insumo.cantidad = Decimal(insumo.cantidad) - cantidad_original
-    # Sumamos la nueva cantidad
-    insumo.cantidad += nueva_cantidad
+    # Primero revertimos la compra anterior y después sumamos la nueva cantidad
+    referencia = f'compra:{compra.id_compra}'
+    mover_stock(insumo.id_insumo, -cantidad_original, 'reversion', referencia)
+    mover_stock(insumo.id_insumo, nueva_cantidad, 'compra', referencia)
 
     # Actualizamos campos de la compra
     compra.cantidad = nueva_cantidad
@@ -173,18 +210,8 @@ def actualizar_compra(id_compra):
         id_insumo=insumo.id_insumo
     ).first()
 
-    if proveedor_insumo and proveedor_insumo.precio_actual != nuevo_precio:
-        proveedor_insumo.precio_actual = nuevo_precio
-        historial = HistorialPrecio(id_proveedor_insumo=proveedor_insumo.id_proveedor_insumo,
-                                   precio=nuevo_precio)
-        db.session.add(historial)
-
-    # Verificar alertas de stock
-    if float(insumo.cantidad) < float(insumo.stock_minimo):
-        alerta = AlertaStock(id_insumo=insumo.id_insumo,
-                             cantidad_actual=insumo.cantidad,
-                             stock_minimo=insumo.stock_minimo)
-        db.session.add(alerta)
+    if proveedor_insumo:
+        cambiar_precio(proveedor_insumo, nuevo_precio, fecha=compra.fecha)
 
     db.session.commit()
     return jsonify(compra.to_dict())
@@ -0,0 +1,53 @@
+# routes/api_eventos.py
+import json
+import os
+import queue
+import time
+
+from flask import Blueprint, Response, jsonify
+from flask_login import login_required
+from services.eventos import broker, iniciar_escucha
+
+eventos_bp = Blueprint('eventos_bp', __name__, url_prefix='/api/eventos')
+
+LATIDO = 15  # segundos entre comentarios de keep-alive
+# el stream se cierra a los DURACION segundos y el navegador se reconecta
+# (retry): los hilos ocupados rotan entre los clientes y los workers
+DURACION = int(os.getenv('SSE_DURACION', '300'))
+
+
+# --------------------------------------------
+# GET /api/eventos/stream  (Server-Sent Events)
+# event: stock   data: {id_insumo, cantidad, stock_minimo}
+# event: alerta  data: {id_alerta, id_insumo, estado}
+# event: tanque  data: {id_tanque, finalizado, pdf_url?}
+# La conexión no usa la base: el usuario se valida al abrirla y después
+# solo se leen eventos de la cola de este cliente.
+# 503 si el worker ya tiene todos los streams que admite (MAX_CLIENTES).
+# --------------------------------------------
+@eventos_bp.route('/stream', methods=['GET'])
+@login_required
+def stream():
+    iniciar_escucha()
+    cola = broker.suscribir()
+    if cola is None:
+        return jsonify({'error': 'Demasiadas pantallas en vivo, se reintentará'}), 503, {'Retry-After': '30'}
+
+    def generar():
+        fin = time.monotonic() + DURACION
+        try:
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < fin:
+                try:
+                    evento = cola.get(timeout=LATIDO)
+                except queue.Empty:
+                    yield ': ping\n\n'
+                    continue
+                yield f"event: {evento['tipo']}\ndata: {json.dumps(evento['datos'])}\n\n"
+        finally:
+            broker.desuscribir(cola)
+
+    return Response(generar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # que nginx no acumule la respuesta
+    })
@@ -0,0 +1,168 @@
+# routes/api_exportar.py
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask_login import login_required
+from sqlalchemy import select
+from models import db, Compra, Proveedor, Insumo, TanqueFabricado, HistorialPrecio, ProveedorInsumo
+from services.pool import limite_sentencias, TIMEOUT_EXPORTAR_MS
+from services import archivo as archivo_frio
+
+exportar_bp = Blueprint('exportar_bp', __name__, url_prefix='/api/v1/exportar')
+
+FILAS_POR_LOTE = 1000  # filas que trae cada vuelta del cursor del servidor
+
+
+# --------------------------------------------
+# Consultas de cada exportación: (select, columna de fecha para filtrar)
+# Con archivo=True, salidas y alertas incluyen las filas archivadas (vista
+# *_historico); las demás no tienen archivo.
+# --------------------------------------------
+def _consulta_compras(archivo=False):
+    return select(
+        Compra.id_compra, Compra.fecha,
+        Compra.id_proveedor, Proveedor.nombre.label('proveedor'), Proveedor.cuit,
+        Compra.id_insumo, Insumo.nombre.label('insumo'),
+        Compra.cantidad, Compra.precio_unitario, Compra.total,
+        Compra.revisado, Compra.confirmado
+    ).join(Proveedor, Proveedor.id_proveedor == Compra.id_proveedor)\
+     .join(Insumo, Insumo.id_insumo == Compra.id_insumo)\
+     .order_by(Compra.id_compra), Compra.fecha
+
+
+def _consulta_salidas(archivo=False):
+    lineas = archivo_frio.lineas_tanque(archivo).c
+    return select(
+        lineas.id_tanque_insumo, lineas.fecha_registro,
+        lineas.id_tanque, TanqueFabricado.modelo, TanqueFabricado.cliente,
+        lineas.id_insumo, Insumo.nombre.label('insumo'),
+        lineas.cantidad_usada, lineas.costo_unitario,
+        (lineas.cantidad_usada * lineas.costo_unitario).label('subtotal'),
+        lineas.operario
+    ).join(TanqueFabricado, TanqueFabricado.id_tanque == lineas.id_tanque)\
+     .join(Insumo, Insumo.id_insumo == lineas.id_insumo)\
+     .order_by(lineas.id_tanque_insumo), lineas.fecha_registro
+
+
+def _consulta_alertas(archivo=False):
+    alertas = archivo_frio.alertas(archivo).c
+    return select(
+        alertas.id_alerta, alertas.fecha,
+        alertas.id_insumo, Insumo.nombre.label('insumo'),
+        alertas.cantidad_actual, alertas.stock_minimo, alertas.estado
+    ).join(Insumo, Insumo.id_insumo == alertas.id_insumo)\
+     .order_by(alertas.id_alerta), alertas.fecha
+
+
+def _consulta_historial_precios(archivo=False):
+    return select(
+        HistorialPrecio.id_historial, HistorialPrecio.fecha,
+        HistorialPrecio.id_proveedor_insumo,
+        ProveedorInsumo.id_proveedor, Proveedor.nombre.label('proveedor'),
+        ProveedorInsumo.id_insumo, Insumo.nombre.label('insumo'),
+        HistorialPrecio.precio, HistorialPrecio.revisado, HistorialPrecio.confirmado
+    ).join(ProveedorInsumo, ProveedorInsumo.id_proveedor_insumo == HistorialPrecio.id_proveedor_insumo)\
+     .join(Proveedor, Proveedor.id_proveedor == ProveedorInsumo.id_proveedor)\
+     .join(Insumo, Insumo.id_insumo == ProveedorInsumo.id_insumo)\
+     .order_by(HistorialPrecio.id_historial), HistorialPrecio.fecha
+
+
+EXPORTACIONES = {
+    'compras': _consulta_compras,
+    'salidas': _consulta_salidas,
+    'alertas': _consulta_alertas,
+    'historial_precios': _consulta_historial_precios,
+}
+
+
+def _valor(v):
+    if isinstance(v, datetime):
+        return v.isoformat(sep=' ')
+    if hasattr(v, 'isoformat'):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return str(v)
+    return v
+
+
+def _filas_csv(resultado):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(resultado.keys())
+    for n, fila in enumerate(resultado, start=1):
+        escritor.writerow([_valor(v) for v in fila])
+        if n % FILAS_POR_LOTE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _filas_ndjson(resultado):
+    columnas = list(resultado.keys())
+    lote = []
+    for fila in resultado:
+        lote.append(json.dumps({c: _valor(v) for c, v in zip(columnas, fila)}, ensure_ascii=False))
+        if len(lote) == FILAS_POR_LOTE:
+            yield '\n'.join(lote) + '\n'
+            lote = []
+    if lote:
+        yield '\n'.join(lote) + '\n'
+
+
+def _filtrar_fechas(consulta, columna, desde, hasta):
+    """Rango [desde, hasta] inclusivo; respeta si la columna es Date o DateTime."""
+    es_fecha = isinstance(columna.type, db.Date)
+    if desde:
+        consulta = consulta.where(columna >= (desde.date() if es_fecha else desde))
+    if hasta:
+        siguiente = hasta + timedelta(days=1)
+        consulta = consulta.where(columna < (siguiente.date() if es_fecha else siguiente))
+    return consulta
+
+
+# --------------------------------------------
+# GET /api/v1/exportar/<compras|salidas|alertas|historial_precios>
+#     ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&formato=csv|ndjson&archivo=1
+# Se envía fila a fila con un cursor del lado del servidor (yield_per),
+# la memoria no crece con el rango exportado.
+# --------------------------------------------
+@exportar_bp.route('/<string:nombre>', methods=['GET'])
+@login_required
+@limite_sentencias(TIMEOUT_EXPORTAR_MS)
+def exportar(nombre):
+    if nombre not in EXPORTACIONES:
+        return jsonify({'error': 'Exportación inexistente'}), 404
+
+    formato = request.args.get('formato', 'csv')
+    if formato not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Formato inválido (csv o ndjson)'}), 400
+
+    try:
+        desde = datetime.strptime(request.args['desde'], '%Y-%m-%d') if request.args.get('desde') else None
+        hasta = datetime.strptime(request.args['hasta'], '%Y-%m-%d') if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({'error': 'Fecha inválida, use YYYY-MM-DD'}), 400
+
+    archivo = request.args.get('archivo', '').lower() in ('1', 'true', 'si')
+    consulta, columna_fecha = EXPORTACIONES[nombre](archivo)
+    consulta = _filtrar_fechas(consulta, columna_fecha, desde, hasta)
+
+    def generar():
+        resultado = db.session.execute(consulta.execution_options(yield_per=FILAS_POR_LOTE))
+        try:
+            yield from (_filas_csv(resultado) if formato == 'csv' else _filas_ndjson(resultado))
+        finally:
+            resultado.close()
+
+    sufijo = '_'.join(a for a in (request.args.get('desde'), request.args.get('hasta')) if a)
+    archivo = f"{nombre}{'_' + sufijo if sufijo else ''}.{formato}"
+    return Response(
+        stream_with_context(generar()),
+        mimetype='text/csv' if formato == 'csv' else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename="{archivo}"'}
+    )
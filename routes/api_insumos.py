@@ -2,6 +2,16 @@
 from flask import Blueprint, request, jsonify
 from models import db, Insumo, AlertaStock
 from flask_login import login_required, current_user
+from decimal import Decimal
+from services.serializers import con_relaciones
+from services.versiones import condicional
+from services.cache import cacheada
+from services.paginacion import paginar
+from services.busqueda import buscar, ordenar_como
+from services.stock import mover_stock, decimal
+from services import costos
+from services.alertas import ABIERTAS
+from services.concurrencia import verificar_version, con_version
 
 insumos_bp = Blueprint('insumos_bp', __name__, url_prefix='/api/v1/insumos')
 
@@ -14,9 +24,9 @@ def buscar_insumos():
     if not q:
         return jsonify([])
 
-    insumos = Insumo.query.filter(
-        Insumo.nombre.ilike(f"%{q}%")
-    ).order_by(Insumo.nombre).limit(10).all()
+    # Coincidencias por índice de trigramas, ordenadas por relevancia
+    ids = buscar('insumos', q, limite=10)
+    insumos = ordenar_como(Insumo.query.filter(Insumo.id_insumo.in_(ids)).all(), ids, 'id_insumo')
 
     return jsonify([
         {
@@ -30,16 +40,27 @@ def buscar_insumos():
 
 #Esta ruta lista todos los insumos
 @insumos_bp.route('/', methods=['GET'])
+@condicional('insumos')
+@cacheada('insumos')
 def listar_insumos():
-    insumos = Insumo.query.all()
-    return jsonify([i.to_dict() for i in insumos])
+    return paginar(Insumo.query, [(Insumo.id_insumo, 'asc')], lambda i: i.to_dict())
 
 
 #Esta ruta es para buscar insumo por id
 @insumos_bp.route('/<int:id_insumo>', methods=['GET'])
 def obtener_insumo(id_insumo):
     insumo = Insumo.query.get_or_404(id_insumo)
-    return jsonify(insumo.to_dict())
+    return con_version(jsonify(insumo.to_dict()), insumo)
+
+
+# Costo vigente del insumo según el costeo (promedio o FIFO)
+@insumos_bp.route('/<int:id_insumo>/costo', methods=['GET'])
+def costo_insumo(id_insumo):
+    Insumo.query.get_or_404(id_insumo)
+    estado = costos.costo_actual(id_insumo)
+    if estado is None:
+        return jsonify({'error': 'El insumo todavía no tiene costeo'}), 404
+    return jsonify(estado.to_dict())
 
 
 
@@ -50,11 +71,19 @@ def crear_insumo():
     data = request.json
     nuevo = Insumo(
         nombre=data['nombre'],
-        cantidad=data.get('cantidad', 0),
+        cantidad=0,
         unidad_medida=data['unidad_medida'],
         stock_minimo=data.get('stock_minimo', 0)
     )
     db.session.add(nuevo)
+    db.session.flush()
+
+    # El stock inicial entra como ajuste en el libro de movimientos
+    cantidad_inicial = decimal(data.get('cantidad') or 0)
+    if cantidad_inicial:
+        costos.ajuste(nuevo.id_insumo, cantidad_inicial)
+        mover_stock(nuevo.id_insumo, cantidad_inicial, 'ajuste', f'insumo:{nuevo.id_insumo}')
+
     db.session.commit()
     return jsonify(nuevo.to_dict()), 201
 
@@ -68,22 +97,23 @@ def actualizar_insumo(id_insumo):
         return jsonify({'error': 'Solo el administrador puede editar insumos'}), 403
 
     insumo = Insumo.query.get_or_404(id_insumo)
+    conflicto = verificar_version(insumo)
+    if conflicto:
+        return conflicto
     data = request.json
 
-    for campo in ['nombre','cantidad','unidad_medida','stock_minimo']:
+    for campo in ['nombre','unidad_medida','stock_minimo']:
         if campo in data:
             setattr(insumo, campo, data[campo])
 
-    db.session.commit()
+    # Un cambio manual de stock se registra como ajuste por la diferencia
+    if 'cantidad' in data:
+        diferencia = decimal(data['cantidad']) - Decimal(insumo.cantidad or 0)
+        if diferencia:
+            costos.ajuste(insumo.id_insumo, diferencia)
+            mover_stock(insumo.id_insumo, diferencia, 'ajuste', f'insumo:{insumo.id_insumo}')
 
-    if float(insumo.cantidad) < float(insumo.stock_minimo):
-        alerta = AlertaStock(
-            id_insumo=insumo.id_insumo,
-            cantidad_actual=insumo.cantidad,
-            stock_minimo=insumo.stock_minimo
-        )
-        db.session.add(alerta)
-        db.session.commit()
+    db.session.commit()
 
     return jsonify(insumo.to_dict())
 
@@ -92,5 +122,5 @@ def actualizar_insumo(id_insumo):
 # Esta ruta es para relacionarla con las aletas de stock 
 @insumos_bp.route('/alertas', methods=['GET'])
 def listar_alertas():
-    alertas = AlertaStock.query.filter_by(estado='Pendiente').all()
+    alertas = con_relaciones(AlertaStock.query, 'alerta').filter(AlertaStock.estado.in_(ABIERTAS)).all()
     return jsonify([a.to_dict() for a in alertas])
@@ -1,8 +1,16 @@
 # routes/api_insumos_salida.py
 from flask import Blueprint, request, jsonify
-from models import db, Insumo, TanqueFabricado, TanqueInsumo, ProveedorInsumo, AlertaStock
+from models import db, Insumo, TanqueFabricado, TanqueInsumo, TanqueInsumoArchivo
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
+from services.serializers import con_relaciones, salida_a_dict
+from services.paginacion import paginar
+from services.stock import mover_stock, mover_stock_lote, StockInsuficiente, decimal
+from services.tanques import ajustar_costo_tanque, TanqueFinalizado
+from services.concurrencia import verificar_version, con_version
+from services import costos
+from collections import defaultdict
 
 insumos_salida_bp = Blueprint('insumos_salida_bp', __name__, url_prefix='/api/v1/insumos_salida')
 
@@ -17,8 +25,11 @@ def registrar_salida():
     
     id_insumo = data.get('id_insumo')
     id_tanque = data.get('id_tanque')
-    cantidad_usada = float(data.get('cantidad_usada', 0))
     operario = data.get('operario')
+    try:
+        cantidad_usada = decimal(data.get('cantidad_usada', 0))
+    except (InvalidOperation, TypeError, ValueError):
+        return jsonify({"error": "Cantidad inválida"}), 400
 
     if not operario:
         return jsonify({"error": "Debe indicar el operario"}), 400
@@ -33,17 +44,11 @@ def registrar_salida():
 
     if not insumo or not tanque:
         return jsonify({"error": "Insumo o tanque no encontrado"}), 404
+    if tanque.finalizado:
+        return jsonify({"error": "El tanque está finalizado"}), 409
 
-    # Verificar stock suficiente
-    if float(insumo.cantidad) < cantidad_usada:
-        return jsonify({"error": "Stock insuficiente"}), 400
-
-    # Buscar costo unitario actual del insumo
-    proveedor_insumo = ProveedorInsumo.query.filter_by(id_insumo=id_insumo).order_by(ProveedorInsumo.id_proveedor_insumo.desc()).first()
-    costo_unitario = float(proveedor_insumo.precio_actual) if proveedor_insumo else 0.0
-
-    # Descontar stock
-    insumo.cantidad = float(insumo.cantidad) - cantidad_usada
+    # Costo de la salida según el costeo del insumo (promedio o FIFO)
+    costo_unitario = costos.salida(id_insumo, cantidad_usada)
 
     # Registrar en TanqueInsumo
     registro = TanqueInsumo(
@@ -55,19 +60,21 @@ def registrar_salida():
         fecha_registro=datetime.utcnow()  
     )
     db.session.add(registro)
+    db.session.flush()
 
-    # Recalcular costo total del tanque
-    tanque.costo_total = float(tanque.costo_total) + (cantidad_usada * costo_unitario)
+    # Descontar stock (el UPDATE verifica que alcance)
+    try:
+        mover_stock(insumo.id_insumo, -cantidad_usada, 'salida', f'tanque_insumo:{registro.id_tanque_insumo}', validar_stock=True)
+    except StockInsuficiente:
+        db.session.rollback()
+        return jsonify({"error": "Stock insuficiente"}), 400
 
-    # Comprobar alerta de stock
-    if float(insumo.cantidad) < float(insumo.stock_minimo):
-        alerta = AlertaStock(
-            id_insumo=insumo.id_insumo,
-            cantidad_actual=insumo.cantidad,
-            stock_minimo=insumo.stock_minimo,
-            estado='Pendiente'
-        )
-        db.session.add(alerta)
+    # Sumar al costo total del tanque (UPDATE atómico, falla si lo finalizaron mientras tanto)
+    try:
+        ajustar_costo_tanque(tanque.id_tanque, cantidad_usada * costo_unitario)
+    except TanqueFinalizado:
+        db.session.rollback()
+        return jsonify({"error": "El tanque está finalizado"}), 409
 
     db.session.commit()
 
@@ -75,41 +82,166 @@ def registrar_salida():
         "mensaje": "Salida registrada correctamente",
         "tanque": tanque.to_dict(),
         "insumo": insumo.to_dict(),
-        "cantidad_usada": cantidad_usada,
-        "costo_unitario": costo_unitario,
+        "cantidad_usada": float(cantidad_usada),
+        "costo_unitario": float(costo_unitario),
         "nuevo_stock": float(insumo.cantidad)
     }), 201
 
+# --------------------------------------------
+# POST /api/v1/insumos_salida/lote
+# Registrar muchas salidas en una sola transacción
+# espera: { "salidas": [ {id_insumo, id_tanque, cantidad_usada, operario}, ... ] }
+# --------------------------------------------
+def _leer_linea(linea):
+    if not isinstance(linea, dict):
+        raise ValueError("Formato inválido")
+    if not linea.get('operario'):
+        raise ValueError("Debe indicar el operario")
+    try:
+        id_insumo = int(linea['id_insumo'])
+        id_tanque = int(linea['id_tanque'])
+        cantidad = decimal(linea.get('cantidad_usada', 0))
+    except (KeyError, InvalidOperation, TypeError, ValueError):
+        raise ValueError("Datos incompletos o inválidos")
+    if cantidad <= 0:
+        raise ValueError("Cantidad inválida")
+    return {'id_insumo': id_insumo, 'id_tanque': id_tanque, 'cantidad_usada': cantidad, 'operario': linea['operario']}
+
+
+@insumos_salida_bp.route('/lote', methods=['POST'])
+def registrar_salidas_lote():
+    data = request.get_json() or {}
+    lineas = data.get('salidas') if isinstance(data, dict) else data
+    if not isinstance(lineas, list) or not lineas:
+        return jsonify({"error": "Debe enviar una lista de salidas"}), 400
+
+    errores = []
+    validas = []
+    for n, linea in enumerate(lineas, start=1):
+        try:
+            validas.append((n, _leer_linea(linea)))
+        except ValueError as e:
+            errores.append({"linea": n, "error": str(e)})
+
+    # Insumos y tanques referenciados: dos consultas para todo el lote
+    ids_insumo = {l['id_insumo'] for _, l in validas}
+    ids_tanque = {l['id_tanque'] for _, l in validas}
+    insumos = {i.id_insumo: i for i in Insumo.query.filter(Insumo.id_insumo.in_(ids_insumo))}
+    tanques = {t.id_tanque: t for t in TanqueFabricado.query.filter(TanqueFabricado.id_tanque.in_(ids_tanque))}
+
+    # Verificar existencia y stock del lote completo
+    pedido = defaultdict(Decimal)
+    for n, l in validas:
+        insumo = insumos.get(l['id_insumo'])
+        if not insumo or l['id_tanque'] not in tanques:
+            errores.append({"linea": n, "error": "Insumo o tanque no encontrado"})
+            continue
+        if tanques[l['id_tanque']].finalizado:
+            errores.append({"linea": n, "error": "El tanque está finalizado"})
+            continue
+        pedido[insumo.id_insumo] += l['cantidad_usada']
+        if pedido[insumo.id_insumo] > Decimal(insumo.cantidad or 0):
+            errores.append({"linea": n, "error": f"Stock insuficiente del insumo {insumo.nombre}"})
+
+    if errores:
+        errores.sort(key=lambda e: e['linea'])
+        return jsonify({"error": "El lote tiene errores, no se registró ninguna salida", "errores": errores}), 400
+
+    # Costo de cada línea: una actualización del costeo por insumo, en el orden del lote
+    por_insumo = defaultdict(list)
+    for _, l in validas:
+        por_insumo[l['id_insumo']].append(l)
+    for id_insumo, lineas_insumo in por_insumo.items():
+        unitarios = costos.salida_lote(id_insumo, [l['cantidad_usada'] for l in lineas_insumo])
+        for l, costo in zip(lineas_insumo, unitarios):
+            l['costo_unitario'] = costo
+
+    ahora = datetime.utcnow()
+    registros = [
+        TanqueInsumo(
+            id_tanque=l['id_tanque'],
+            id_insumo=l['id_insumo'],
+            cantidad_usada=l['cantidad_usada'],
+            costo_unitario=l['costo_unitario'],
+            operario=l['operario'],
+            fecha_registro=ahora
+        ) for _, l in validas
+    ]
+    db.session.add_all(registros)
+    db.session.flush()
+
+    # Un UPDATE de stock por insumo y uno de costo por tanque
+    movimientos = defaultdict(list)
+    por_tanque = defaultdict(Decimal)
+    for r in registros:
+        movimientos[r.id_insumo].append((-r.cantidad_usada, f'tanque_insumo:{r.id_tanque_insumo}'))
+        por_tanque[r.id_tanque] += r.cantidad_usada * r.costo_unitario
+
+    saldos = {}
+    try:
+        for id_insumo, movs in movimientos.items():
+            saldos[id_insumo] = mover_stock_lote(id_insumo, movs, 'salida', validar_stock=True)
+    except StockInsuficiente as e:
+        # Otro operario descontó el mismo insumo mientras se validaba el lote
+        db.session.rollback()
+        errores = [
+            {"linea": n, "error": "Stock insuficiente"}
+            for n, l in validas if l['id_insumo'] == e.id_insumo
+        ]
+        return jsonify({"error": "El lote tiene errores, no se registró ninguna salida", "errores": errores}), 400
+
+    try:
+        costo_tanques = {t: ajustar_costo_tanque(t, delta) for t, delta in sorted(por_tanque.items())}
+    except TanqueFinalizado as e:
+        # Un administrador finalizó el tanque mientras se validaba el lote
+        db.session.rollback()
+        errores = [
+            {"linea": n, "error": "El tanque está finalizado"}
+            for n, l in validas if l['id_tanque'] == e.id_tanque
+        ]
+        return jsonify({"error": "El lote tiene errores, no se registró ninguna salida", "errores": errores}), 409
+
+    ids_registrados = [r.id_tanque_insumo for r in registros]
+    db.session.commit()
+
+    return jsonify({
+        "mensaje": f"{len(ids_registrados)} salidas registradas correctamente",
+        "ids_tanque_insumo": ids_registrados,
+        "stock": {i: float(saldo) for i, saldo in saldos.items()},
+        "costo_tanques": {t: float(costo) for t, costo in costo_tanques.items()}
+    }), 201
+
 #Delete de insumos_salida
 
 @insumos_salida_bp.route('/<int:id_tanque_insumo>', methods=['DELETE'])
 def eliminar_salida(id_tanque_insumo):
     registro = TanqueInsumo.query.get_or_404(id_tanque_insumo)
+    conflicto = verificar_version(registro)
+    if conflicto:
+        return conflicto
 
     insumo = Insumo.query.get_or_404(registro.id_insumo)
     tanque = TanqueFabricado.query.get_or_404(registro.id_tanque)
+    if tanque.finalizado:
+        return jsonify({"error": "El tanque está finalizado"}), 409
 
-    cantidad = float(registro.cantidad_usada)
-    costo_unitario = float(registro.costo_unitario or 0)
+    cantidad = Decimal(registro.cantidad_usada)
+    costo_unitario = Decimal(registro.costo_unitario or 0)
 
-    # 1. Devolver stock al insumo
-    insumo.cantidad = float(insumo.cantidad) + cantidad
+    # 1. Devolver stock al insumo (al costo con que salió)
+    costos.devolucion(insumo.id_insumo, cantidad, costo_unitario, fecha=registro.fecha_registro)
+    mover_stock(insumo.id_insumo, cantidad, 'reversion', f'tanque_insumo:{id_tanque_insumo}')
 
     # 2. Revertir costo del tanque
-    tanque.costo_total = float(tanque.costo_total) - (cantidad * costo_unitario)
-
-    if tanque.costo_total < 0:
-        tanque.costo_total = 0
+    try:
+        ajustar_costo_tanque(tanque.id_tanque, -(cantidad * costo_unitario))
+    except TanqueFinalizado:
+        db.session.rollback()
+        return jsonify({"error": "El tanque está finalizado"}), 409
 
     # 3. Eliminar registro de salida
     db.session.delete(registro)
 
-    # 4. Limpiar alertas si ya no corresponde
-    alertas = AlertaStock.query.filter_by(id_insumo=insumo.id_insumo, estado='Pendiente').all()
-    for alerta in alertas:
-        if float(insumo.cantidad) >= float(alerta.stock_minimo):
-            alerta.estado = 'Resuelta'
-
     db.session.commit()
 
     return jsonify({
@@ -127,30 +259,11 @@ def eliminar_salida(id_tanque_insumo):
 def listar_salidas():
     id_insumo = request.args.get('id_insumo', type=int)
 
+    query = con_relaciones(TanqueInsumo.query, 'salida')
     if id_insumo:
-        registros = TanqueInsumo.query.filter_by(id_insumo=id_insumo)\
-                    .order_by(TanqueInsumo.id_tanque_insumo.desc()).all()
-    else:
-        registros = TanqueInsumo.query.order_by(TanqueInsumo.id_tanque_insumo.desc()).all()
-
-    resultado = []
-    for r in registros:
-        tanque = TanqueFabricado.query.get(r.id_tanque)
-        insumo = Insumo.query.get(r.id_insumo)
-
-        resultado.append({
-            "id_tanque_insumo": r.id_tanque_insumo,
-            "id_tanque": r.id_tanque,
-            "tanque_nombre": tanque.modelo if tanque else "N/A",
-            "id_insumo": r.id_insumo,
-            "insumo_nombre": insumo.nombre if insumo else "N/A",
-            "cantidad_usada": float(r.cantidad_usada),
-            "costo_unitario": float(r.costo_unitario),
-            "operario": r.operario,
-            "fecha_registro": r.fecha_registro.isoformat() if r.fecha_registro else None
-        })
+        query = query.filter_by(id_insumo=id_insumo)
 
-    return jsonify(resultado), 200
+    return paginar(query, [(TanqueInsumo.id_tanque_insumo, 'desc')], salida_a_dict)
 
 
 
@@ -180,13 +293,16 @@ def listar_salidas():
 @insumos_salida_bp.route('/<int:id_tanque_insumo>', methods=['GET'])
 def obtener_salida(id_tanque_insumo):
     registro = TanqueInsumo.query.get_or_404(id_tanque_insumo)
-    return jsonify(registro.to_dict()), 200
+    return con_version(jsonify(registro.to_dict()), registro), 200
 
 
 #UPDATE SALIDA
 @insumos_salida_bp.route('/<int:id_tanque_insumo>', methods=['PUT'])
 def actualizar_salida(id_tanque_insumo):
     registro = TanqueInsumo.query.get_or_404(id_tanque_insumo)
+    conflicto = verificar_version(registro)
+    if conflicto:
+        return conflicto
     data = request.get_json() or {}
 
     # --- Validar y convertir cantidad ---
@@ -207,40 +323,43 @@ def actualizar_salida(id_tanque_insumo):
 
     # --- Obtener tanque e insumos ---
     tanque = TanqueFabricado.query.get_or_404(registro.id_tanque)
+    if tanque.finalizado:
+        return jsonify({"error": "El tanque está finalizado"}), 409
     insumo_antiguo = Insumo.query.get_or_404(registro.id_insumo)
     insumo_nuevo = Insumo.query.get_or_404(nuevo_id_insumo)
 
+    referencia = f'tanque_insumo:{id_tanque_insumo}'
+
+    # --- Revertir costo del tanque (falla si lo finalizaron mientras tanto) ---
+    try:
+        ajustar_costo_tanque(tanque.id_tanque, -(Decimal(registro.cantidad_usada or 0) * Decimal(registro.costo_unitario or 0)))
+    except TanqueFinalizado:
+        db.session.rollback()
+        return jsonify({"error": "El tanque está finalizado"}), 409
+
     # --- Revertir stock y costo del insumo original ---
-    insumo_antiguo.cantidad = float(insumo_antiguo.cantidad or 0) + float(registro.cantidad_usada or 0)
-    tanque.costo_total = float(tanque.costo_total or 0) - float(registro.cantidad_usada or 0) * float(registro.costo_unitario or 0)
-    if tanque.costo_total < 0:
-        tanque.costo_total = 0
+    costos.devolucion(insumo_antiguo.id_insumo, Decimal(registro.cantidad_usada or 0),
+                      Decimal(registro.costo_unitario or 0), fecha=registro.fecha_registro)
+    mover_stock(insumo_antiguo.id_insumo, Decimal(registro.cantidad_usada or 0), 'reversion', referencia)
 
-    # --- Verificar stock suficiente del nuevo insumo ---
-    if float(insumo_nuevo.cantidad or 0) < float(nueva_cantidad):
-        return jsonify({"error": f"Stock insuficiente del insumo {insumo_nuevo.nombre}"}), 400
+    # --- Costo según el costeo del nuevo insumo ---
+    costo_unitario = costos.salida(insumo_nuevo.id_insumo, nueva_cantidad)
 
-    # --- Obtener costo unitario ---
-    proveedor_insumo = ProveedorInsumo.query.filter_by(id_insumo=nuevo_id_insumo)\
-        .order_by(ProveedorInsumo.id_proveedor_insumo.desc()).first()
-    costo_unitario = float(proveedor_insumo.precio_actual or 0) if proveedor_insumo else 0.0
+    # --- Descontar el nuevo insumo (el UPDATE verifica que alcance) ---
+    try:
+        mover_stock(insumo_nuevo.id_insumo, -nueva_cantidad, 'salida', referencia, validar_stock=True)
+    except StockInsuficiente:
+        db.session.rollback()
+        return jsonify({"error": f"Stock insuficiente del insumo {insumo_nuevo.nombre}"}), 400
 
-    # --- Actualizar stock y registro ---
-    insumo_nuevo.cantidad = float(insumo_nuevo.cantidad or 0) - float(nueva_cantidad)
+    # --- Actualizar registro ---
     registro.id_insumo = nuevo_id_insumo
-    registro.cantidad_usada = float(nueva_cantidad)
+    registro.cantidad_usada = nueva_cantidad
     registro.costo_unitario = costo_unitario
     registro.operario = nuevo_operario
 
     # --- Ajustar costo total del tanque ---
-    tanque.costo_total += float(nueva_cantidad) * costo_unitario
-
-    # --- Actualizar alertas de stock ---
-    for ins in [insumo_antiguo, insumo_nuevo]:
-        alertas = AlertaStock.query.filter_by(id_insumo=ins.id_insumo, estado='Pendiente').all()
-        for alerta in alertas:
-            if float(ins.cantidad or 0) >= float(alerta.stock_minimo or 0):
-                alerta.estado = 'Resuelta'
+    ajustar_costo_tanque(tanque.id_tanque, nueva_cantidad * costo_unitario)
 
     db.session.commit()
 
@@ -262,23 +381,16 @@ def actualizar_salida(id_tanque_insumo):
 # --------------------------------------------
 @insumos_salida_bp.route('/tanque/<int:id_tanque>', methods=['GET'])
 def listar_por_tanque(id_tanque):
-    registros = TanqueInsumo.query.filter_by(id_tanque=id_tanque).all()
+    registros = con_relaciones(TanqueInsumo.query, 'salida').filter_by(id_tanque=id_tanque).all()
+    if not registros and db.session.query(TanqueFabricado.archivado).filter_by(id_tanque=id_tanque).scalar():
+        # tanque archivado: sus líneas están en tanque_insumo_archivo
+        registros = TanqueInsumoArchivo.query.options(
+            joinedload(TanqueInsumoArchivo.tanque), joinedload(TanqueInsumoArchivo.insumo)
+        ).filter_by(id_tanque=id_tanque).all()
 
     if not registros:
         return jsonify([]), 200  # mejor que 404 para el frontend
 
-    resultado = []
-    for r in registros:
-        insumo = Insumo.query.get(r.id_insumo)
-
-        resultado.append({
-            "id_tanque_insumo": r.id_tanque_insumo,
-            "id_insumo": r.id_insumo,
-            "insumo_nombre": insumo.nombre if insumo else "N/A",
-            "cantidad_usada": float(r.cantidad_usada),
-            "costo_unitario": float(r.costo_unitario),
-            "operario": r.operario,
-            "fecha_registro": r.fecha_registro.isoformat() if r.fecha_registro else None
-        })
+    resultado = [salida_a_dict(r, incluir_tanque=False) for r in registros]
 
     return jsonify(resultado), 200
@@ -0,0 +1,22 @@
+# routes/api_metricas.py
+import os
+
+from flask import Blueprint, Response, request, abort
+from services.metricas import exponer
+
+metricas_bp = Blueprint('metricas_bp', __name__)
+
+TOKEN = os.getenv('METRICAS_TOKEN')  # opcional: Prometheus manda "Authorization: Bearer <token>"
+
+
+# --------------------------------------------
+# GET /metrics  (formato de texto de Prometheus, sumado entre workers)
+# Sin login: lo consulta Prometheus dentro de la red de docker; nginx no
+# lo publica hacia afuera.
+# --------------------------------------------
+@metricas_bp.route('/metrics', methods=['GET'])
+def metrics():
+    if TOKEN and request.headers.get('Authorization') != f'Bearer {TOKEN}':
+        abort(401)
+    cuerpo, tipo = exponer()
+    return Response(cuerpo, mimetype=tipo.split(';')[0], headers={'Content-Type': tipo})
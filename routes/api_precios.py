@@ -0,0 +1,72 @@
+# routes/api_precios.py
+from datetime import date, datetime
+
+from flask import Blueprint, jsonify, request
+from models import ProveedorInsumo
+from services import precios
+from services.cache import cacheada
+from services.versiones import condicional
+
+precios_bp = Blueprint('precios_bp', __name__, url_prefix='/api/v1/precios')
+
+
+# --------------------------------------------
+# GET /api/v1/precios/mejores
+# Por insumo: el proveedor más barato, el rango de precios entre
+# proveedores y la última compra. Sale de mejores_precios, que se mantiene
+# al hacer commit, así que es una sola consulta para todo el catálogo.
+# --------------------------------------------
+@precios_bp.route('/mejores', methods=['GET'])
+@cacheada('mejores_precios', 'insumos', 'proveedores')
+def mejores_precios():
+    return jsonify(precios.mejores_precios()), 200
+
+
+# --------------------------------------------
+# GET /api/v1/precios/<id_proveedor_insumo>?desde=YYYY-MM-DD&hasta=YYYY-MM-DD
+#                                          &intervalo=dia|semana|mes
+# Sin intervalo devuelve los cambios de precio del rango; con intervalo,
+# velas (apertura, máximo, mínimo, cierre) por período.
+# --------------------------------------------
+@precios_bp.route('/<int:id_proveedor_insumo>', methods=['GET'])
+@condicional('historial_precios', 'proveedor_insumo')
+def historial_precios(id_proveedor_insumo):
+    pi = ProveedorInsumo.query.get_or_404(id_proveedor_insumo)
+
+    intervalo = request.args.get('intervalo')
+    if intervalo is not None and intervalo not in precios.INTERVALOS:
+        return jsonify({'error': f"intervalo debe ser {'|'.join(precios.INTERVALOS)}"}), 400
+    try:
+        desde = datetime.strptime(request.args['desde'], '%Y-%m-%d').date() if request.args.get('desde') else None
+        hasta = datetime.strptime(request.args['hasta'], '%Y-%m-%d').date() if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({'error': 'Fecha inválida, use YYYY-MM-DD'}), 400
+
+    previo, cambios = precios.puntos(pi.id_proveedor_insumo, desde, hasta)
+    inicial = previo if previo is not None else (cambios[0][1] if cambios else None)
+    final = cambios[-1][1] if cambios else previo
+    resultado = {
+        'id_proveedor_insumo': pi.id_proveedor_insumo,
+        'id_proveedor': pi.id_proveedor,
+        'id_insumo': pi.id_insumo,
+        'precio_inicial': float(inicial) if inicial is not None else None,
+        'precio_final': float(final) if final is not None else None,
+        'variacion_pct': precios.variacion(inicial, final),
+        'cambios': len(cambios),
+    }
+
+    if intervalo is None:
+        resultado['puntos'] = [{'fecha': f.strftime('%Y-%m-%d %H:%M:%S'), 'precio': float(p)} for f, p in cambios]
+        return jsonify(resultado), 200
+
+    # el rango de las velas: lo pedido o desde el primer cambio hasta hoy
+    inicio = desde or (cambios[0][0].date() if cambios else date.today())
+    fin = hasta or date.today()
+    if fin < inicio:
+        return jsonify({'error': 'hasta es anterior a desde'}), 400
+    if precios.cantidad_velas(inicio, fin, intervalo) > precios.MAX_VELAS:
+        return jsonify({'error': f'Demasiados períodos (máx. {precios.MAX_VELAS}), use un intervalo mayor'}), 400
+
+    resultado['intervalo'] = intervalo
+    resultado['velas'] = precios.velas(previo, cambios, intervalo, inicio, fin)
+    return jsonify(resultado), 200
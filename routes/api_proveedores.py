@@ -1,13 +1,21 @@
 # routes/api_proveedores.py
 from flask import Blueprint, request, jsonify
 from models import db, Proveedor, ProveedorInsumo
+from services.serializers import con_relaciones
+from services.versiones import condicional
+from services.cache import cacheada
+from services.paginacion import paginar
+from services.busqueda import buscar, ordenar_como
+from services.precios import cambiar_precio
+from services.concurrencia import verificar_version
 
 proveedores_bp = Blueprint('proveedores_bp', __name__, url_prefix='/api/v1/proveedores')
 
 @proveedores_bp.route('/', methods=['GET'])
+@condicional('proveedores')
+@cacheada('proveedores')
 def listar_proveedores():
-    provs = Proveedor.query.all()
-    return jsonify([p.to_dict() for p in provs])
+    return paginar(Proveedor.query, [(Proveedor.id_proveedor, 'asc')], lambda p: p.to_dict())
 
 
 
@@ -34,9 +42,8 @@ def buscar_proveedores():
     if not q:
         return jsonify([])
 
-    proveedores = Proveedor.query.filter(
-        Proveedor.nombre.ilike(f"%{q}%")
-    ).order_by(Proveedor.nombre).limit(10).all()
+    ids = buscar('proveedores', q, limite=10)
+    proveedores = ordenar_como(Proveedor.query.filter(Proveedor.id_proveedor.in_(ids)).all(), ids, 'id_proveedor')
 
     return jsonify([
         {
@@ -50,7 +57,7 @@ def buscar_proveedores():
 
 @proveedores_bp.route('/<int:id_proveedor>/insumos', methods=['GET'])
 def insumos_por_proveedor(id_proveedor):
-    proveedor = Proveedor.query.get_or_404(id_proveedor)
+    proveedor = con_relaciones(Proveedor.query, 'proveedor_insumos').get_or_404(id_proveedor)
     return jsonify(proveedor.insumos_detalle())
 
 @proveedores_bp.route('/<int:id_proveedor>/insumos', methods=['POST'])
@@ -62,7 +69,7 @@ def asociar_insumo_proveedor(id_proveedor):
         id_insumo=data['id_insumo'],
         precio_actual=data['precio_actual']
     )
-    db.session.add(pi)
+    cambiar_precio(pi, data['precio_actual'])  # el precio inicial abre el historial
     db.session.commit()
     return jsonify({'message': 'Asociación creada', 'id': pi.id_proveedor_insumo}), 201
 
@@ -71,6 +78,9 @@ def asociar_insumo_proveedor(id_proveedor):
 @proveedores_bp.route('/<int:id_proveedor>', methods=['PUT'])
 def actualizar_proveedor(id_proveedor):
     proveedor = Proveedor.query.get_or_404(id_proveedor)
+    conflicto = verificar_version(proveedor)
+    if conflicto:
+        return conflicto
     data = request.json
 
     proveedor.nombre = data.get('nombre', proveedor.nombre)
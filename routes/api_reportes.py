@@ -1,28 +1,61 @@
 # routes/api_reportes.py
-from flask import Blueprint, jsonify
-from models import db, Insumo, Compra, TanqueFabricado, AlertaStock
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+from models import Insumo, AlertaStock
+from services.reportes import totales, series, PERIODOS, DIMENSIONES
+from services.alertas import ABIERTAS
+from services.cache import cacheada
+from services.pool import limite_sentencias, TIMEOUT_REPORTES_MS
 
 reportes_bp = Blueprint('reportes_bp', __name__, url_prefix='/api/reportes')
 
 # 🔹 Resumen general del sistema
+# Los totales históricos salen de reportes_rollup (filas mensuales globales)
 @reportes_bp.route('/resumen', methods=['GET'])
+@cacheada('insumos', 'alertas_stock', 'reportes_rollup')
+@limite_sentencias(TIMEOUT_REPORTES_MS)
 def resumen():
     total_insumos = Insumo.query.count()
-    total_alertas_pendientes = AlertaStock.query.filter_by(estado='Pendiente').count()
-    total_compras = db.session.query(db.func.sum(Compra.total)).scalar() or 0
-    total_tanques = TanqueFabricado.query.count()
-    costo_total_tanques = db.session.query(db.func.sum(TanqueFabricado.costo_total)).scalar() or 0
+    total_alertas_pendientes = AlertaStock.query.filter(AlertaStock.estado.in_(ABIERTAS)).count()
+    acumulado = totales()
 
     return jsonify({
         'insumos_registrados': total_insumos,
         'alertas_pendientes': total_alertas_pendientes,
-        'valor_total_compras': float(total_compras),
-        'tanques_fabricados': total_tanques,
-        'costo_total_tanques': float(costo_total_tanques)
+        'valor_total_compras': float(acumulado['gasto_compras']),
+        'tanques_fabricados': int(acumulado['tanques']),
+        'costo_total_tanques': float(acumulado['costo_tanques'])
     })
 
+
+# 🔹 Series por día o mes
+# GET /api/reportes/series?periodo=dia|mes&dimension=global|insumo|proveedor|modelo
+#                         &clave=<id o modelo>&desde=YYYY-MM-DD&hasta=YYYY-MM-DD
+@reportes_bp.route('/series', methods=['GET'])
+@limite_sentencias(TIMEOUT_REPORTES_MS)
+def series_reportes():
+    periodo = request.args.get('periodo', 'mes')
+    dimension = request.args.get('dimension', 'global')
+    if periodo not in PERIODOS or dimension not in DIMENSIONES:
+        return jsonify({'error': f"periodo debe ser {'|'.join(PERIODOS)} y dimension {'|'.join(DIMENSIONES)}"}), 400
+
+    try:
+        desde = datetime.strptime(request.args['desde'], '%Y-%m-%d').date() if request.args.get('desde') else None
+        hasta = datetime.strptime(request.args['hasta'], '%Y-%m-%d').date() if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({'error': 'Fecha inválida, use YYYY-MM-DD'}), 400
+
+    clave = request.args.get('clave')
+    if dimension == 'global':
+        clave = ''
+    filas = series(periodo, dimension, clave, desde, hasta)
+    return jsonify([f.to_dict() for f in filas])
+
+
 # 🔹 Reporte de insumos por debajo del stock mínimo
 @reportes_bp.route('/bajo_stock', methods=['GET'])
+@limite_sentencias(TIMEOUT_REPORTES_MS)
 def insumos_bajo_stock():
     from models import Insumo
     insumos = Insumo.query.filter(Insumo.cantidad < Insumo.stock_minimo).all()
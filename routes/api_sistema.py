@@ -0,0 +1,35 @@
+# routes/api_sistema.py
+from flask import Blueprint, jsonify
+from flask_login import login_required, current_user
+from services import cache
+from services.pool import estadisticas_pool
+
+sistema_bp = Blueprint('sistema_bp', __name__, url_prefix='/api/sistema')
+
+
+# --------------------------------------------
+# GET /api/sistema/cache     -> hits, misses, tamaño de la caché de respuestas
+# DELETE /api/sistema/cache  -> vaciarla (solo administrador)
+# --------------------------------------------
+@sistema_bp.route('/cache', methods=['GET'])
+@login_required
+def estado_cache():
+    return jsonify(cache.estadisticas()), 200
+
+
+@sistema_bp.route('/cache', methods=['DELETE'])
+@login_required
+def vaciar_cache():
+    if current_user.role != 'administrador':
+        return jsonify({'error': 'Solo el administrador puede vaciar la caché'}), 403
+    cache.vaciar()
+    return jsonify({'ok': True, 'msg': 'Caché vaciada'}), 200
+
+
+# --------------------------------------------
+# GET /api/sistema/pool -> pool de conexiones del worker que atiende
+# --------------------------------------------
+@sistema_bp.route('/pool', methods=['GET'])
+@login_required
+def estado_pool():
+    return jsonify(estadisticas_pool()), 200
@@ -1,13 +1,21 @@
 # routes/api_tanques.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, url_for
 from models import db, TanqueFabricado, TanqueInsumo, Insumo
 from decimal import Decimal
 from datetime import datetime
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from flask import send_file
-import io
 from flask_login import login_required, current_user
+from services.serializers import con_relaciones
+from services.versiones import condicional
+from services.paginacion import paginar
+from services.busqueda import buscar
+from services.stock import mover_stock
+from services import costos
+from services.pdf_tanques import solicitar_pdf, invalidar_pdf
+from services.tanques import recalcular_costos, conciliar_costos
+from services.eventos import publicar
+from services.concurrencia import verificar_version, con_version
+from services.pool import limite_sentencias, TIMEOUT_PDF_MS, TIMEOUT_REPORTES_MS
 
 
 
@@ -15,12 +23,16 @@ tanques_bp = Blueprint('tanques_bp', __name__, url_prefix='/api/v1/tanques')
 
 @tanques_bp.route('/', methods=['GET'])
 def listar_tanques():
-    tanques = TanqueFabricado.query.order_by(TanqueFabricado.fecha.desc()).all()
-    return jsonify([t.to_dict() for t in tanques])
+    return paginar(
+        con_relaciones(TanqueFabricado.query, 'tanque'),
+        [(TanqueFabricado.fecha, 'desc'), (TanqueFabricado.id_tanque, 'desc')],
+        lambda t: t.to_dict()
+    )
 
 
 # GET /api/v1/tanques/activos
 @tanques_bp.route('/activos', methods=['GET'])
+@condicional('tanques_fabricados')
 def listar_tanques_activos():
     # Solo tanques que no estén finalizados
     tanques = TanqueFabricado.query.filter_by(finalizado=False).all()
@@ -59,10 +71,13 @@ def crear_tanque():
     for item in data.get('insumos', []):
         id_insumo = item['id_insumo']
         cantidad_usada = Decimal(str(item['cantidad_usada']))
-        costo_unitario = Decimal(str(item['costo_unitario']))
 
         insumo = Insumo.query.get_or_404(id_insumo)
 
+        # Costo de la salida según el costeo del insumo, como en /insumos_salida:
+        # un costo_unitario enviado se ignora (al borrar la línea vuelve a esa valuación)
+        costo_unitario = costos.salida(insumo.id_insumo, cantidad_usada)
+
         ti = TanqueInsumo(
             id_tanque = tanque.id_tanque,
             id_insumo = insumo.id_insumo,
@@ -70,10 +85,10 @@ def crear_tanque():
             costo_unitario = costo_unitario
         )
         db.session.add(ti)
+        db.session.flush()
         costo_total += cantidad_usada * costo_unitario
-        # NOTA: según requisitos iniciales NO descontamos stock automáticamente al fabricar un tanque
-        # si en el futuro querés descontar, descomentar la siguiente línea:
-        insumo.cantidad = Decimal(insumo.cantidad) - cantidad_usada
+        # el insumo usado sale del stock y queda asentado en el libro
+        mover_stock(insumo.id_insumo, -cantidad_usada, 'salida', f'tanque_insumo:{ti.id_tanque_insumo}')
 
     tanque.costo_total = costo_total
     db.session.commit()
@@ -81,13 +96,13 @@ def crear_tanque():
 
 @tanques_bp.route('/<int:id_tanque>', methods=['GET'])
 def obtener_tanque(id_tanque):
-    tanque = TanqueFabricado.query.get_or_404(id_tanque)
-    return jsonify(tanque.to_dict())
+    tanque = con_relaciones(TanqueFabricado.query, 'tanque').get_or_404(id_tanque)
+    return con_version(jsonify(tanque.to_dict()), tanque)
 
 @tanques_bp.route('/<int:id_tanque>/insumos', methods=['GET'])
 def insumos_tanque(id_tanque):
-    tanque = TanqueFabricado.query.get_or_404(id_tanque)
-    return jsonify([ti.to_dict() for ti in tanque.tanque_insumo])
+    tanque = con_relaciones(TanqueFabricado.query, 'tanque').get_or_404(id_tanque)
+    return jsonify([ti.to_dict() for ti in tanque.lineas()])
 
 
 @tanques_bp.route('/clientes', methods=['GET'])
@@ -97,15 +112,9 @@ def buscar_clientes():
     if not q:
         return jsonify([])
 
-    clientes = (
-        db.session.query(TanqueFabricado.cliente)
-        .filter(TanqueFabricado.cliente.ilike(f"%{q}%"))
-        .distinct()
-        .limit(10)
-        .all()
-    )
+    clientes = buscar('clientes', q, limite=10)
 
-    return jsonify([c[0] for c in clientes if c[0]])
+    return jsonify([c for c in clientes if c])
 
 @tanques_bp.route('/<int:id_tanque>/finalizar', methods=['PUT'])
 @login_required
@@ -115,77 +124,56 @@ def finalizar_tanque(id_tanque):
         return jsonify({'error': 'Solo el administrador puede finalizar tanques'}), 403
 
     tanque = TanqueFabricado.query.get_or_404(id_tanque)
-    
+    conflicto = verificar_version(tanque)
+    if conflicto:
+        return conflicto
+
     if tanque.finalizado:
         return jsonify({'error': 'Este tanque ya fue finalizado'}), 400
 
-    insumos = TanqueInsumo.query.filter_by(id_tanque=id_tanque).all()
-    if not insumos:
+    if not db.session.query(TanqueInsumo.query.filter_by(id_tanque=id_tanque).exists()).scalar():
         return jsonify({'error': 'El tanque no tiene insumos registrados'}), 400
 
-    # Marcar como finalizado
-    costo_total = sum(i.cantidad_usada * i.costo_unitario for i in insumos)
-    tanque.costo_total = costo_total
+    # Marcar como finalizado, con el costo recalculado desde sus líneas. Si entra
+    # una salida mientras tanto, sube la versión del tanque y el UPDATE de acá
+    # (WHERE version = la leída) no encuentra la fila: 409 por StaleDataError
+    recalcular_costos(id_tanque)
     tanque.finalizado = True
+    tanque.finalizado_en = datetime.utcnow()
+    publicar(db.session, 'tanque', {
+        'id_tanque': id_tanque, 'finalizado': True,
+        'pdf_url': url_for('tanques_bp.descargar_pdf', id_tanque=id_tanque)
+    })
     db.session.commit()
 
-    # Generar PDF en memoria
-    buffer = io.BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    pdf.setTitle(f"Tanque_{tanque.id_tanque}_Finalizado")
-
-    # Título e info
-    pdf.setFont("Helvetica-Bold", 16)
-    pdf.drawCentredString(width / 2, height - 50, f"Informe de Tanque Fabricado ID {tanque.id_tanque}")
-    pdf.setFont("Helvetica", 12)
-    pdf.drawString(50, height - 80, f"Cliente: {tanque.cliente}")
-    pdf.drawString(50, height - 95, f"Modelo: {tanque.modelo}")
-    pdf.drawString(50, height - 110, f"Fecha: {tanque.fecha.strftime('%Y-%m-%d')}")
-    pdf.drawString(50, height - 125, f"Costo Total: ${float(costo_total):.2f}")
-
-    # Tabla
-    y_start = height - 150
-    row_height = 20
-    x_positions = [50, 120, 220, 320, 400, 480]
-    headers = ["Fecha", "Cantidad", "Insumo", "Precio Unitario", "Precio Total", "Proveedor"]
-
-    def dibujar_fila(y, valores, bold=False):
-        pdf.setFont("Helvetica-Bold" if bold else "Helvetica", 10)
-        for i, val in enumerate(valores):
-            pdf.drawString(x_positions[i] + 2, y + 5, str(val))
-        pdf.line(x_positions[0], y, x_positions[-1] + 80, y)
-
-    y = y_start
-    dibujar_fila(y, headers, bold=True)
-    y -= row_height
-
-    for ti in tanque.tanque_insumo:
-        if y < 80:
-            pdf.showPage()
-            y = height - 50
-            dibujar_fila(y, headers, bold=True)
-            y -= row_height
-        fecha = tanque.fecha.strftime('%Y-%m-%d') if tanque.fecha else '-'
-        cantidad = f"{float(ti.cantidad_usada):.2f}"
-        insumo = ti.insumo.nombre
-        precio_unitario = f"${float(ti.costo_unitario):.2f}"
-        precio_total = f"${float(ti.cantidad_usada * ti.costo_unitario):.2f}"
-        proveedor_nombre = (
-        ti.insumo.proveedor_insumo[0].proveedor.nombre
-        if ti.insumo.proveedor_insumo else '-'
-    )
+    # El PDF se genera en segundo plano y queda guardado para descargarlo luego
+    estado, _ = solicitar_pdf(id_tanque)
+    return jsonify({
+        'ok': True,
+        'msg': 'Tanque finalizado correctamente',
+        'pdf_estado': estado,
+        'pdf_url': url_for('tanques_bp.descargar_pdf', id_tanque=id_tanque)
+    }), 202
 
-        dibujar_fila(y, [fecha, cantidad, insumo, precio_unitario, precio_total, proveedor_nombre])
-        y -= row_height
 
-    pdf.line(x_positions[0], y + row_height, x_positions[-1] + 80, y + row_height)
-    pdf.showPage()
-    pdf.save()
-    buffer.seek(0)
+# GET /api/v1/tanques/<id>/pdf
+# 200 con el PDF si ya está generado; 202 mientras se genera.
+@tanques_bp.route('/<int:id_tanque>/pdf', methods=['GET'])
+@login_required
+@limite_sentencias(TIMEOUT_PDF_MS)
+def descargar_pdf(id_tanque):
+    tanque = TanqueFabricado.query.get_or_404(id_tanque)
+    if not tanque.finalizado:
+        return jsonify({'error': 'El tanque no está finalizado'}), 400
+
+    estado, ruta = solicitar_pdf(id_tanque)
+    if estado == 'error':
+        return jsonify({'error': 'No se pudo generar el PDF'}), 500
+    if estado == 'pendiente':
+        return jsonify({'pdf_estado': estado}), 202, {'Retry-After': '1'}
 
     return send_file(
-        buffer,
+        ruta,
         as_attachment=True,
         download_name=f"Tanque_{tanque.id_tanque}_Finalizado.pdf",
         mimetype='application/pdf'
@@ -201,11 +189,40 @@ def desfinalizar_tanque(id_tanque):
         return jsonify({'error': 'Solo el administrador puede desfinalizar tanques'}), 403
 
     tanque = TanqueFabricado.query.get_or_404(id_tanque)
+    conflicto = verificar_version(tanque)
+    if conflicto:
+        return conflicto
 
     if not tanque.finalizado:
         return jsonify({'error': 'El tanque ya no está finalizado'}), 400
+    if tanque.archivado:
+        return jsonify({'error': 'El tanque está archivado, no se puede desfinalizar'}), 409
 
     tanque.finalizado = False
+    tanque.finalizado_en = None
+    publicar(db.session, 'tanque', {'id_tanque': id_tanque, 'finalizado': False})
     db.session.commit()
+    invalidar_pdf(id_tanque)
 
     return jsonify({'ok': True, 'msg': 'Tanque desfinalizado correctamente'})
+
+
+# GET  /api/v1/tanques/conciliacion -> tanques cuyo costo_total no coincide con sus líneas
+# POST /api/v1/tanques/conciliacion -> además los corrige (solo administrador)
+@tanques_bp.route('/conciliacion', methods=['GET', 'POST'])
+@login_required
+@limite_sentencias(TIMEOUT_REPORTES_MS)
+def conciliacion_costos():
+    reparar = request.method == 'POST'
+    if reparar and current_user.role != 'administrador':
+        return jsonify({'error': 'Solo el administrador puede corregir costos'}), 403
+
+    diferencias = conciliar_costos(reparar=reparar)
+    return jsonify({
+        'discrepancias': len(diferencias),
+        'reparado': reparar,
+        'tanques': [
+            {k: (float(v) if k != 'id_tanque' else v) for k, v in d.items()}
+            for d in diferencias
+        ]
+    }), 200
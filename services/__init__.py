@@ -0,0 +1,2 @@
+# services/__init__.py
+# Lógica compartida entre blueprints (consultas, stock, reportes, etc.)
@@ -0,0 +1,140 @@
+# services/alertas.py
+from datetime import datetime
+
+from sqlalchemy import and_, delete, event, func, select, update
+from models import db, Insumo, AlertaStock
+from services.transacciones import antes_del_commit, pendientes, tomar
+from services.eventos import publicar
+
+
+# ------------------------------------------------------------
+# Alertas de stock
+#
+# Cada insumo tiene como mucho una alerta abierta (Pendiente o Reconocida).
+# Las operaciones no crean alertas: marcan los insumos que tocaron y al
+# hacer commit se evalúan todos juntos contra el stock mínimo:
+#   - bajo el mínimo y sin alerta abierta -> se abre una (Pendiente)
+#   - bajo el mínimo con alerta abierta   -> se actualizan sus cantidades
+#   - stock recuperado con alerta abierta -> se resuelve sola
+# ------------------------------------------------------------
+PENDIENTE = 'Pendiente'
+RECONOCIDA = 'Reconocida'
+RESUELTA = 'Resuelta'
+ABIERTAS = (PENDIENTE, RECONOCIDA)
+
+_CLAVE = 'alertas_insumos'
+
+
+def marcar_insumos(session, ids_insumo):
+    """Agrega insumos a evaluar al hacer commit."""
+    pendientes(session, _CLAVE, set).update(ids_insumo)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _marcar_insumos_editados(session, flush_context):
+    # alta de insumos o cambio de stock_minimo desde el ORM
+    ids = [obj.id_insumo for obj in list(session.new) + list(session.dirty) if isinstance(obj, Insumo)]
+    if ids:
+        marcar_insumos(session, ids)
+
+
+def evaluar(ids_insumo):
+    """Evalúa los umbrales de un conjunto de insumos. Devuelve (abiertas, resueltas)."""
+    from services.reportes import registrar_alerta
+
+    ahora = datetime.utcnow()
+    alertas = AlertaStock.__table__
+    filas = db.session.execute(
+        select(Insumo.id_insumo, Insumo.cantidad, Insumo.stock_minimo, alertas.c.id_alerta)
+        .outerjoin(alertas, and_(alertas.c.id_insumo == Insumo.id_insumo, alertas.c.estado.in_(ABIERTAS)))
+        .where(Insumo.id_insumo.in_(ids_insumo))
+    ).all()
+
+    nuevas, vigentes, recuperadas = [], [], []
+    for id_insumo, cantidad, minimo, id_alerta in filas:
+        publicar(db.session, 'stock', {'id_insumo': id_insumo, 'cantidad': float(cantidad or 0), 'stock_minimo': float(minimo or 0)})
+        bajo = (cantidad or 0) < (minimo or 0)
+        if bajo and id_alerta is None:
+            nuevas.append({'id_insumo': id_insumo, 'fecha': ahora, 'cantidad_actual': cantidad or 0,
+                           'stock_minimo': minimo or 0, 'estado': PENDIENTE})
+        elif bajo:
+            vigentes.append({'id_alerta': id_alerta, 'cantidad_actual': cantidad or 0, 'stock_minimo': minimo or 0})
+        elif id_alerta is not None:
+            recuperadas.append(id_alerta)
+            publicar(db.session, 'alerta', {'id_alerta': id_alerta, 'id_insumo': id_insumo, 'estado': RESUELTA})
+
+    if nuevas:
+        # ON CONFLICT: si otro worker abrió la misma alerta recién, el índice único la rechaza
+        sentencia = _insert_ignorando_duplicados().returning(alertas.c.id_alerta, alertas.c.id_insumo, alertas.c.fecha)
+        for id_alerta, id_insumo, fecha in db.session.execute(sentencia, nuevas):
+            registrar_alerta(db.session, fecha, id_insumo)
+            publicar(db.session, 'alerta', {'id_alerta': id_alerta, 'id_insumo': id_insumo, 'estado': PENDIENTE})
+    if vigentes:
+        db.session.execute(update(AlertaStock), vigentes)
+    if recuperadas:
+        db.session.execute(
+            update(alertas).where(alertas.c.id_alerta.in_(recuperadas)).values(estado=RESUELTA)
+        )
+    return len(nuevas), len(recuperadas)
+
+
+def _insert_ignorando_duplicados():
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    return insert_dialecto(AlertaStock.__table__).on_conflict_do_nothing()
+
+
+@antes_del_commit(prioridad=500)  # antes de los agregados de reportes
+def _evaluar_marcados(session):
+    session.flush()
+    ids = tomar(session, _CLAVE)
+    if ids:
+        evaluar(ids)
+
+
+def cambiar_estado(alerta, estado):
+    """Reconocer o resolver a mano. Devuelve un mensaje de error o None."""
+    if alerta.estado == RESUELTA:
+        return 'La alerta ya está resuelta'
+    if estado == RECONOCIDA and alerta.estado == RECONOCIDA:
+        return 'La alerta ya fue reconocida'
+    alerta.estado = estado
+    publicar(db.session, 'alerta', {'id_alerta': alerta.id_alerta, 'id_insumo': alerta.id_insumo, 'estado': estado})
+    return None
+
+
+# ------------------------------------------------------------
+# Limpieza de duplicados previos al motor
+# ------------------------------------------------------------
+def deduplicar():
+    """
+    Deja una sola alerta abierta por insumo (la más reciente), borra las
+    otras y reevalúa todos los insumos con alertas abiertas.
+    Crea el índice único parcial si todavía no existe. Devuelve las borradas.
+    """
+    from services.reportes import registrar_alerta
+
+    alertas = AlertaStock.__table__
+    ultima = (
+        select(func.max(alertas.c.id_alerta))
+        .where(alertas.c.estado.in_(ABIERTAS))
+        .group_by(alertas.c.id_insumo)
+    )
+    borradas = db.session.execute(
+        delete(alertas)
+        .where(alertas.c.estado.in_(ABIERTAS), alertas.c.id_alerta.not_in(ultima))
+        .returning(alertas.c.id_insumo, alertas.c.fecha)
+    ).all()
+    for id_insumo, fecha in borradas:
+        registrar_alerta(db.session, fecha, id_insumo, signo=-1)
+
+    abiertas = db.session.execute(select(alertas.c.id_insumo).where(alertas.c.estado.in_(ABIERTAS))).scalars().all()
+    if abiertas:
+        evaluar(abiertas)
+    db.session.commit()
+
+    for indice in alertas.indexes:
+        indice.create(db.engine, checkfirst=True)
+    return len(borradas)
@@ -0,0 +1,135 @@
+# services/archivo.py
+import calendar
+import os
+from datetime import datetime
+
+from sqlalchemy import and_, column, delete, func, insert, literal, or_, select, table, update
+from models import db, AlertaStock, AlertaStockArchivo, TanqueFabricado, TanqueInsumo, TanqueInsumoArchivo
+from services.alertas import RESUELTA
+
+
+# ------------------------------------------------------------
+# Archivo de filas frías
+#
+# tanque_insumo y alertas_stock solo crecen. Las líneas de los tanques
+# finalizados hace más de MESES meses y las alertas resueltas igual de
+# viejas se mueven (mismo id, mismas columnas) a tanque_insumo_archivo y
+# alertas_stock_archivo: los listados, la conciliación y los índices del día
+# a día trabajan solo con las filas vigentes.
+#
+# Los agregados de reportes_rollup no cambian al archivar (el movimiento no
+# pasa por el ORM). Las vistas tanque_insumo_historico y
+# alertas_stock_historico (UNION ALL de vigentes y archivadas) son para
+# lo que necesita la historia completa: reconstruir los agregados y las
+# exportaciones con ?archivo=1.
+# ------------------------------------------------------------
+MESES = int(os.getenv('ARCHIVO_MESES', '12'))
+LOTE = 500  # tanques o alertas por transacción: los locks duran poco
+
+
+def _historico(modelo, nombre):
+    # columnas de la tabla vigente; la vista no está en db.metadata (no se crea como tabla)
+    return table(nombre, *(column(c.name, c.type) for c in modelo.__table__.c if c.name != 'version'))
+
+
+tanque_insumo_historico = _historico(TanqueInsumo, 'tanque_insumo_historico')
+alertas_stock_historico = _historico(AlertaStock, 'alertas_stock_historico')
+
+
+def lineas_tanque(archivo=False):
+    """Tabla de líneas de tanque para consultas Core: vigentes o con el archivo."""
+    return tanque_insumo_historico if archivo else TanqueInsumo.__table__
+
+
+def alertas(archivo=False):
+    """Tabla de alertas para consultas Core: vigentes o con el archivo."""
+    return alertas_stock_historico if archivo else AlertaStock.__table__
+
+
+def limite(meses=MESES, ahora=None):
+    """Fecha y hora de hace `meses` meses (el día se recorta al último del mes)."""
+    ahora = ahora or datetime.utcnow()
+    anio, mes = divmod(ahora.year * 12 + ahora.month - 1 - meses, 12)
+    mes += 1
+    return ahora.replace(year=anio, month=mes, day=min(ahora.day, calendar.monthrange(anio, mes)[1]))
+
+
+# ---------- Mover ----------
+def _copiar(origen, destino, condicion, ahora):
+    columnas = [c.name for c in origen.c]
+    db.session.execute(
+        insert(destino).from_select(columnas + ['archivado'], select(*origen.c, literal(ahora)).where(condicion))
+    )
+    return db.session.execute(delete(origen).where(condicion)).rowcount
+
+
+def archivar_tanques(meses=MESES, lote=LOTE):
+    """Archiva las líneas de los tanques finalizados antes del límite. Devuelve (tanques, líneas)."""
+    tanques = TanqueFabricado.__table__
+    corte = limite(meses)
+    candidatos = (
+        select(tanques.c.id_tanque)
+        .where(tanques.c.finalizado.is_(True), tanques.c.archivado.isnot(True))
+        .where(or_(tanques.c.finalizado_en < corte,
+                   and_(tanques.c.finalizado_en.is_(None), tanques.c.fecha < corte.date())))
+        .order_by(tanques.c.id_tanque)
+        .limit(lote)
+    )
+    total_tanques = total_lineas = 0
+    while True:
+        ids = db.session.execute(candidatos).scalars().all()
+        if not ids:
+            break
+        # Primero se marcan (y se bloquean) los tanques: si alguno se desfinalizó
+        # entre la consulta y acá, no vuelve en el RETURNING y sus líneas no se tocan.
+        # La versión sube: una edición que leyó el tanque antes choca al guardar.
+        marcados = db.session.execute(
+            update(tanques)
+            .where(tanques.c.id_tanque.in_(ids), tanques.c.finalizado.is_(True), tanques.c.archivado.isnot(True))
+            .values(archivado=True, version=tanques.c.version + 1)
+            .returning(tanques.c.id_tanque)
+        ).scalars().all()
+        lineas = TanqueInsumo.__table__
+        if marcados:
+            total_lineas += _copiar(lineas, TanqueInsumoArchivo.__table__, lineas.c.id_tanque.in_(marcados), datetime.utcnow())
+        db.session.commit()
+        total_tanques += len(marcados)
+    return total_tanques, total_lineas
+
+
+def archivar_alertas(meses=MESES, lote=LOTE):
+    """Archiva las alertas resueltas anteriores al límite. Devuelve cuántas movió."""
+    tabla = AlertaStock.__table__
+    viejas = (
+        select(tabla.c.id_alerta)
+        .where(tabla.c.estado == RESUELTA, tabla.c.fecha < limite(meses))
+        .order_by(tabla.c.id_alerta)
+        .limit(lote)
+    )
+    total = 0
+    while True:
+        ids = db.session.execute(viejas).scalars().all()
+        if not ids:
+            break
+        # estado se vuelve a exigir: una alerta no se reabre, pero por las dudas
+        total += _copiar(tabla, AlertaStockArchivo.__table__,
+                         and_(tabla.c.id_alerta.in_(ids), tabla.c.estado == RESUELTA), datetime.utcnow())
+        db.session.commit()
+    return total
+
+
+def archivar(meses=MESES, lote=LOTE):
+    """Archiva tanques y alertas. Devuelve {'tanques', 'lineas', 'alertas'}."""
+    tanques, lineas = archivar_tanques(meses, lote)
+    return {'tanques': tanques, 'lineas': lineas, 'alertas': archivar_alertas(meses, lote)}
+
+
+def estado():
+    """Filas vigentes y archivadas de cada tabla."""
+    def contar(tabla):
+        return db.session.execute(select(func.count()).select_from(tabla)).scalar()
+
+    return {
+        'tanque_insumo': (contar(TanqueInsumo.__table__), contar(TanqueInsumoArchivo.__table__)),
+        'alertas_stock': (contar(AlertaStock.__table__), contar(AlertaStockArchivo.__table__)),
+    }
@@ -0,0 +1,187 @@
+# services/busqueda.py
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from sqlalchemy import event, func, inspect, or_, case, text
+from models import db, Insumo, Proveedor, TanqueFabricado
+
+
+# ------------------------------------------------------------
+# Búsqueda por subcadena / aproximada para los autocompletados.
+#
+# En PostgreSQL se usa un índice GIN de trigramas (pg_trgm) sobre
+# f_unaccent(lower(col)), así el LIKE '%q%' y el operador % usan índice
+# (los crea la migración v004). En SQLite (o si no se pudieron crear las
+# extensiones) se arma un índice de n-gramas en memoria por proceso.
+# ------------------------------------------------------------
+UMBRAL_SIMILITUD = 0.3
+N = 3
+
+# corpus -> (modelo, columna clave, columna de texto)
+CORPUS = {
+    'insumos': (Insumo, Insumo.id_insumo, Insumo.nombre),
+    'proveedores': (Proveedor, Proveedor.id_proveedor, Proveedor.nombre),
+    'clientes': (TanqueFabricado, TanqueFabricado.cliente, TanqueFabricado.cliente),
+}
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos: 'Tornillería' -> 'tornilleria'."""
+    if not texto:
+        return ''
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    sin_acentos = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_acentos.lower().split())
+
+
+def _ngramas(texto):
+    if len(texto) < N:
+        return {texto} if texto else set()
+    return {texto[i:i + N] for i in range(len(texto) - N + 1)}
+
+
+# ---------- Motor PostgreSQL ----------
+_trigramas_disponibles = None
+
+
+def _usa_trigramas():
+    global _trigramas_disponibles
+    if _trigramas_disponibles is None:
+        if db.engine.dialect.name != 'postgresql':
+            _trigramas_disponibles = False
+        else:
+            existe = db.session.execute(text("SELECT 1 FROM pg_proc WHERE proname = 'f_unaccent'")).first()
+            _trigramas_disponibles = existe is not None
+    return _trigramas_disponibles
+
+
+def _escapar_like(valor):
+    return valor.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _buscar_postgres(corpus, q, limite, solo_contiene):
+    _, clave, columna = CORPUS[corpus]
+    campo = func.f_unaccent(func.lower(columna))
+    contiene = campo.like(f"%{_escapar_like(q)}%", escape='\\')
+    prefijo = campo.like(f"{_escapar_like(q)}%", escape='\\')
+    condicion = contiene if solo_contiene else or_(contiene, campo.op('%')(q))
+
+    consulta = (
+        db.session.query(clave)
+        .filter(columna.isnot(None), condicion)
+        .group_by(clave, columna)
+        .order_by(
+            case((prefijo, 0), (contiene, 1), else_=2),
+            func.similarity(campo, q).desc(),
+            columna
+        )
+    )
+    if limite:
+        consulta = consulta.limit(limite)
+    return [fila[0] for fila in consulta.all()]
+
+
+# ---------- Motor en memoria (SQLite / desarrollo) ----------
+class IndiceNgramas:
+    """Índice invertido de trigramas sobre textos normalizados."""
+
+    TTL = 60  # segundos; otros procesos pueden haber escrito
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.textos = {}
+        self.ngramas = defaultdict(set)
+        self.construido = 0
+        self.sucio = True
+        self.lock = threading.Lock()
+
+    def _construir(self):
+        _, clave, columna = CORPUS[self.corpus]
+        textos = {}
+        ngramas = defaultdict(set)
+        for valor_clave, valor in db.session.query(clave, columna).filter(columna.isnot(None)).distinct():
+            normal = normalizar(valor)
+            textos[valor_clave] = (valor, normal)
+            for g in _ngramas(normal):
+                ngramas[g].add(valor_clave)
+        self.textos, self.ngramas = textos, ngramas
+        self.construido = time.monotonic()
+        self.sucio = False
+
+    def _vigente(self):
+        with self.lock:
+            if self.sucio or time.monotonic() - self.construido > self.TTL:
+                self._construir()
+
+    def buscar(self, q, limite, solo_contiene):
+        self._vigente()
+        grams_q = _ngramas(q)
+
+        if len(q) < N:
+            candidatos = self.textos.keys()
+        else:
+            candidatos = set()
+            for g in grams_q:
+                candidatos |= self.ngramas.get(g, set())
+
+        resultados = []
+        for clave in candidatos:
+            original, normal = self.textos[clave]
+            contiene = q in normal
+            grams_t = _ngramas(normal)
+            similitud = len(grams_q & grams_t) / len(grams_q | grams_t) if grams_q else 0
+            if not contiene and (solo_contiene or similitud < UMBRAL_SIMILITUD):
+                continue
+            rango = 0 if normal.startswith(q) else (1 if contiene else 2)
+            resultados.append((rango, -similitud, original, clave))
+
+        resultados.sort()
+        if limite:
+            resultados = resultados[:limite]
+        return [r[3] for r in resultados]
+
+
+_indices = {nombre: IndiceNgramas(nombre) for nombre in CORPUS}
+
+
+def _cambia_texto(obj, columna):
+    # el historial sigue disponible en after_flush (se limpia después)
+    return inspect(obj).attrs[columna.key].history.has_changes()
+
+
+@event.listens_for(db.session, 'after_flush')
+def _marcar_indices_sucios(session, flush_context):
+    # Altas y bajas siempre; modificaciones solo si cambió el texto indexado:
+    # finalizar un tanque o subir la versión de un insumo no reconstruye nada
+    for obj in list(session.new) + list(session.deleted):
+        for nombre, (modelo, _, _) in CORPUS.items():
+            if isinstance(obj, modelo):
+                _indices[nombre].sucio = True
+    for obj in session.dirty:
+        for nombre, (modelo, _, columna) in CORPUS.items():
+            if isinstance(obj, modelo) and _cambia_texto(obj, columna):
+                _indices[nombre].sucio = True
+
+
+# ---------- API ----------
+def buscar(corpus, q, limite=10, solo_contiene=False):
+    """
+    Devuelve las claves del corpus que coinciden con q, ordenadas por relevancia
+    (empieza con q > contiene q > parecido). Sin distinguir acentos ni mayúsculas.
+
+    solo_contiene=True descarta las coincidencias aproximadas (filtros de historial).
+    """
+    q = normalizar(q)
+    if not q:
+        return []
+    if _usa_trigramas():
+        return _buscar_postgres(corpus, q, limite, solo_contiene)
+    return _indices[corpus].buscar(q, limite, solo_contiene)
+
+
+def ordenar_como(filas, claves, atributo):
+    """Reordena filas traídas con IN (...) según el orden de relevancia de claves."""
+    posicion = {c: i for i, c in enumerate(claves)}
+    return sorted(filas, key=lambda f: posicion[getattr(f, atributo)])
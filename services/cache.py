@@ -0,0 +1,189 @@
+# services/cache.py
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request, make_response
+from services.versiones import al_confirmar
+
+
+# ------------------------------------------------------------
+# Caché de respuestas compartida entre workers
+#
+# Un archivo SQLite local (no hay Redis) que ven todos los procesos de
+# gunicorn. Cada entrada se guarda bajo la URL más la "generación" de las
+# tablas de las que depende; cuando un commit escribe en una tabla su
+# generación sube y las entradas viejas dejan de encontrarse (quedan para
+# el LRU). Así una respuesta armada con datos viejos mientras otro worker
+# confirmaba nunca se sirve con la generación nueva.
+#   CACHE_RESPUESTAS_DB   ruta del archivo (default instance/cache_respuestas.sqlite3)
+#   CACHE_RESPUESTAS_MB   tamaño máximo (default 64)
+#   CACHE_RESPUESTAS_TTL  segundos de vida por defecto (default 300)
+# ------------------------------------------------------------
+TTL_POR_DEFECTO = int(os.getenv('CACHE_RESPUESTAS_TTL', '300'))
+MAXIMO_BYTES = int(float(os.getenv('CACHE_RESPUESTAS_MB', '64')) * 1024 * 1024)
+
+_local = threading.local()
+_ruta = None
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS entradas (
+    clave TEXT PRIMARY KEY, valor BLOB NOT NULL, tipo TEXT NOT NULL,
+    expira REAL NOT NULL, usado REAL NOT NULL, tamano INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entradas_usado ON entradas(usado);
+CREATE TABLE IF NOT EXISTS generaciones (tabla TEXT PRIMARY KEY, gen INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS contadores (nombre TEXT PRIMARY KEY, valor INTEGER NOT NULL);
+"""
+
+
+def _archivo():
+    global _ruta
+    if _ruta is None:
+        _ruta = os.getenv('CACHE_RESPUESTAS_DB') or os.path.join(current_app.instance_path, 'cache_respuestas.sqlite3')
+        os.makedirs(os.path.dirname(_ruta), exist_ok=True)
+    return _ruta
+
+
+def _conexion():
+    # una conexión por hilo y por proceso (después de un fork no se comparte)
+    conexion = getattr(_local, 'conexion', None)
+    if conexion is None or _local.pid != os.getpid():
+        conexion = sqlite3.connect(_archivo(), timeout=5, isolation_level=None, check_same_thread=False)
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.execute('PRAGMA synchronous=OFF')  # es descartable
+        conexion.executescript(_ESQUEMA)
+        _local.conexion, _local.pid = conexion, os.getpid()
+    return conexion
+
+
+def _contar(conexion, nombre, n=1):
+    conexion.execute(
+        "INSERT INTO contadores (nombre, valor) VALUES (?, ?) "
+        "ON CONFLICT(nombre) DO UPDATE SET valor = valor + excluded.valor", (nombre, n)
+    )
+
+
+def _generaciones(conexion, tablas):
+    marcas = ','.join('?' * len(tablas))
+    actuales = dict(conexion.execute(f"SELECT tabla, gen FROM generaciones WHERE tabla IN ({marcas})", tablas))
+    return '|'.join(f"{t}:{actuales.get(t, 0)}" for t in tablas)
+
+
+def obtener(clave):
+    """(valor, tipo) o None."""
+    conexion = _conexion()
+    ahora = time.time()
+    fila = conexion.execute("SELECT valor, tipo, expira FROM entradas WHERE clave = ?", (clave,)).fetchone()
+    if fila is None or fila[2] < ahora:
+        _contar(conexion, 'misses')
+        return None
+    conexion.execute("UPDATE entradas SET usado = ? WHERE clave = ?", (ahora, clave))
+    _contar(conexion, 'hits')
+    return fila[0], fila[1]
+
+
+def guardar(clave, valor, tipo, ttl=TTL_POR_DEFECTO):
+    conexion = _conexion()
+    ahora = time.time()
+    conexion.execute(
+        "INSERT OR REPLACE INTO entradas (clave, valor, tipo, expira, usado, tamano) VALUES (?, ?, ?, ?, ?, ?)",
+        (clave, valor, tipo, ahora + ttl, ahora, len(valor))
+    )
+    _expulsar(conexion, ahora)
+
+
+def _expulsar(conexion, ahora):
+    """Borra vencidas y, si se pasa del máximo, las menos usadas hasta quedar en el 90%."""
+    total = conexion.execute("SELECT coalesce(sum(tamano), 0) FROM entradas").fetchone()[0]
+    if total <= MAXIMO_BYTES:
+        return
+    conexion.execute("BEGIN IMMEDIATE")
+    try:
+        vencidas, tamano_vencidas = conexion.execute(
+            "SELECT count(*), coalesce(sum(tamano), 0) FROM entradas WHERE expira < ?", (ahora,)
+        ).fetchone()
+        conexion.execute("DELETE FROM entradas WHERE expira < ?", (ahora,))
+        total -= tamano_vencidas
+        expulsadas = 0
+        if total > MAXIMO_BYTES * 0.9:
+            for clave, tamano in conexion.execute("SELECT clave, tamano FROM entradas ORDER BY usado").fetchall():
+                conexion.execute("DELETE FROM entradas WHERE clave = ?", (clave,))
+                total -= tamano
+                expulsadas += 1
+                if total <= MAXIMO_BYTES * 0.9:
+                    break
+        _contar(conexion, 'expulsadas', expulsadas + vencidas)
+        conexion.execute("COMMIT")
+    except Exception:
+        conexion.execute("ROLLBACK")
+        raise
+
+
+@al_confirmar
+def invalidar(tablas):
+    """Sube la generación de las tablas: las respuestas que dependen de ellas se vuelven a armar."""
+    conexion = _conexion()
+    conexion.executemany(
+        "INSERT INTO generaciones (tabla, gen) VALUES (?, 1) ON CONFLICT(tabla) DO UPDATE SET gen = gen + 1",
+        [(t,) for t in sorted(tablas)]
+    )
+
+
+def vaciar():
+    conexion = _conexion()
+    conexion.execute("DELETE FROM entradas")
+
+
+def estadisticas():
+    conexion = _conexion()
+    contadores = dict(conexion.execute("SELECT nombre, valor FROM contadores"))
+    entradas, bytes_usados = conexion.execute("SELECT count(*), coalesce(sum(tamano), 0) FROM entradas").fetchone()
+    hits, misses = contadores.get('hits', 0), contadores.get('misses', 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        'expulsadas': contadores.get('expulsadas', 0),
+        'entradas': entradas,
+        'bytes': bytes_usados,
+        'maximo_bytes': MAXIMO_BYTES,
+        'generaciones': dict(conexion.execute("SELECT tabla, gen FROM generaciones"))
+    }
+
+
+def cacheada(*tablas, ttl=TTL_POR_DEFECTO):
+    """
+    Decorador para GET cuyo resultado depende solo de estas tablas y de la URL.
+    Guarda las respuestas 200; cualquier commit que escriba en las tablas las invalida.
+    """
+    tablas = tuple(sorted(tablas))
+
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            try:
+                clave = request.full_path + '#' + _generaciones(_conexion(), tablas)
+                encontrada = obtener(clave)
+            except sqlite3.Error as e:
+                current_app.logger.warning("Caché de respuestas no disponible: %s", e)
+                return vista(*args, **kwargs)
+            if encontrada is not None:
+                respuesta = make_response(encontrada[0])
+                respuesta.mimetype = encontrada[1]
+                respuesta.headers['X-Cache'] = 'HIT'
+                return respuesta
+
+            respuesta = make_response(vista(*args, **kwargs))
+            # una lista cortada (X-Truncated) no se guarda: la caché no conserva sus cabeceras
+            if respuesta.status_code == 200 and not respuesta.is_streamed and 'X-Truncated' not in respuesta.headers:
+                try:
+                    guardar(clave, respuesta.get_data(), respuesta.mimetype, ttl)
+                except sqlite3.Error as e:
+                    current_app.logger.warning("No se pudo guardar en la caché de respuestas: %s", e)
+            respuesta.headers['X-Cache'] = 'MISS'
+            return respuesta
+        return envoltura
+    return decorador
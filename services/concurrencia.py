@@ -0,0 +1,62 @@
+# services/concurrencia.py
+from flask import jsonify, request
+from sqlalchemy.orm.exc import StaleDataError
+from models import db
+
+
+# ------------------------------------------------------------
+# Control de concurrencia optimista
+#
+# Insumo, Proveedor, Compra, TanqueFabricado y TanqueInsumo tienen una
+# columna version que SQLAlchemy incrementa en cada UPDATE del ORM y exige
+# en el WHERE (version_id_col). Si otro worker escribió la fila entre la
+# lectura y el flush, el UPDATE/DELETE no encuentra la fila, se lanza
+# StaleDataError y se responde 409: no hay SELECT ... FOR UPDATE ni locks
+# que duren todo el pedido.
+#
+# Además el cliente puede decir qué versión editó (If-Match: "3", o
+# "version": 3 en el cuerpo JSON); si ya no es la vigente se rechaza con
+# 409 antes de tocar nada. Sin ninguno de los dos se acepta como antes.
+#
+# Los contadores que se mueven con UPDATE atómicos (stock de insumos) no
+# cambian la versión: dos salidas del mismo insumo no chocan entre sí.
+# ------------------------------------------------------------
+MENSAJE = 'El registro fue modificado por otro usuario, recargue e intente de nuevo'
+
+
+def _conflicto(version_actual):
+    return jsonify({'error': MENSAJE, 'version': version_actual}), 409
+
+
+def verificar_version(obj):
+    """
+    Compara la versión que manda el cliente con la del registro.
+    Devuelve la respuesta 409 si no coinciden, o None para seguir.
+    """
+    if request.if_match:
+        if not request.if_match.contains(str(obj.version)):
+            return _conflicto(obj.version)
+        return None
+    datos = request.get_json(silent=True)
+    if isinstance(datos, dict) and datos.get('version') is not None:
+        try:
+            pedida = int(datos['version'])
+        except (TypeError, ValueError):
+            return jsonify({'error': 'version inválida'}), 400
+        if pedida != obj.version:
+            return _conflicto(obj.version)
+    return None
+
+
+def con_version(respuesta, obj):
+    """Agrega el ETag de la versión del registro (para mandarlo luego en If-Match)."""
+    respuesta.set_etag(str(obj.version))
+    return respuesta
+
+
+def instalar(app):
+    @app.errorhandler(StaleDataError)
+    def _fila_modificada(error):
+        # el flush (o el commit) encontró la fila con otra versión
+        db.session.rollback()
+        return jsonify({'error': MENSAJE}), 409
@@ -0,0 +1,476 @@
+# services/costos.py
+import os
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import Integer, and_, case, cast, delete, func, insert, or_, select, update
+from models import db, Compra, CapaCosto, CostoInsumo, Insumo, MovimientoStock, ProveedorInsumo
+from services.stock import decimal
+
+
+# ------------------------------------------------------------
+# Costeo de inventario
+#
+# Cada insumo tiene un estado en costos_insumo (existencia valorizada,
+# valor y costo unitario) que se actualiza de a un movimiento:
+#   - promedio: el costo es el promedio ponderado; una compra lo recalcula
+#     y una salida se lleva unidades a ese costo sin cambiarlo
+#   - fifo: cada compra es una capa en capas_costo y las salidas consumen
+#     las capas con saldo de la más vieja a la más nueva
+# Las salidas leen el costo con el mismo UPDATE que descuenta la existencia
+# (en promedio es una sola sentencia), sin buscar el precio del proveedor.
+#
+# Llamar a estas funciones ANTES de mover_stock: un insumo sin estado se
+# abre con su stock actual al último precio de proveedor conocido.
+# ------------------------------------------------------------
+PROMEDIO = 'promedio'
+FIFO = 'fifo'
+METODOS = (PROMEDIO, FIFO)
+
+_CAPAS_POR_LECTURA = 50
+_CUATRO_DECIMALES = Decimal('0.0001')
+_CENTAVOS = Decimal('0.01')
+
+
+def metodo_por_defecto():
+    """Método para los insumos nuevos (COSTEO_METODO, por defecto promedio)."""
+    metodo = os.getenv('COSTEO_METODO', PROMEDIO).strip().lower()
+    if metodo not in METODOS:
+        raise ValueError(f"COSTEO_METODO inválido: {metodo} (promedio | fifo)")
+    return metodo
+
+
+def _fecha_hora(fecha):
+    if fecha is None:
+        return datetime.utcnow()
+    if isinstance(fecha, datetime):
+        return fecha
+    return datetime.combine(fecha, datetime.min.time()) if isinstance(fecha, date) else fecha
+
+
+def _insert_ignorando_duplicados(tabla):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    return insert_dialecto(tabla).on_conflict_do_nothing()
+
+
+def _precios_referencia(ids_insumo=None):
+    """Precio del último ProveedorInsumo de cada insumo (valuación de la existencia previa al costeo)."""
+    ultimos = select(func.max(ProveedorInsumo.id_proveedor_insumo)).group_by(ProveedorInsumo.id_insumo)
+    if ids_insumo is not None:
+        ultimos = ultimos.where(ProveedorInsumo.id_insumo.in_(ids_insumo))
+    return {
+        id_insumo: decimal(precio or 0)
+        for id_insumo, precio in db.session.execute(
+            select(ProveedorInsumo.id_insumo, ProveedorInsumo.precio_actual)
+            .where(ProveedorInsumo.id_proveedor_insumo.in_(ultimos))
+        )
+    }
+
+
+# ---------- Apertura ----------
+def _abrir(ids_insumo=None, metodo=None):
+    """
+    Crea el estado de los insumos que todavía no lo tienen (todos si no se
+    indican): su stock actual valorizado al último precio de proveedor.
+    """
+    metodo = metodo or metodo_por_defecto()
+    db.session.flush()  # un insumo recién creado tiene que estar en la tabla
+    costos = CostoInsumo.__table__
+    ins = Insumo.__table__
+    consulta = select(ins.c.id_insumo, ins.c.cantidad).where(
+        ~select(costos.c.id_insumo).where(costos.c.id_insumo == ins.c.id_insumo).exists()
+    )
+    if ids_insumo is not None:
+        consulta = consulta.where(ins.c.id_insumo.in_(ids_insumo))
+    faltan = db.session.execute(consulta).all()
+    if not faltan:
+        return 0
+
+    precios = _precios_referencia([i for i, _ in faltan] if ids_insumo is not None else None)
+    ahora = datetime.utcnow()
+    filas = []
+    for id_insumo, cantidad in faltan:
+        cantidad = decimal(cantidad or 0)
+        costo = precios.get(id_insumo, Decimal('0'))
+        filas.append({'id_insumo': id_insumo, 'metodo': metodo, 'cantidad': cantidad,
+                      'valor': cantidad * costo, 'costo_unitario': costo, 'actualizado': ahora})
+
+    # ON CONFLICT: otro worker pudo abrir el mismo insumo recién; solo el que lo creó arma la capa
+    creados = set(db.session.execute(
+        _insert_ignorando_duplicados(costos).returning(costos.c.id_insumo), filas
+    ).scalars())
+    if metodo == FIFO:
+        capas = [
+            {'id_insumo': f['id_insumo'], 'id_compra': None, 'fecha': ahora, 'cantidad': f['cantidad'],
+             'restante': f['cantidad'], 'costo_unitario': f['costo_unitario']}
+            for f in filas if f['id_insumo'] in creados and f['cantidad'] > 0
+        ]
+        if capas:
+            db.session.execute(insert(CapaCosto), capas)
+    return len(creados)
+
+
+def _actualizar(id_insumo, sentencia):
+    """Ejecuta un UPDATE ... RETURNING sobre el estado del insumo, abriéndolo si falta."""
+    sentencia = sentencia.where(CostoInsumo.__table__.c.id_insumo == id_insumo)
+    fila = db.session.execute(sentencia).first()
+    if fila is None:
+        _abrir([id_insumo])
+        fila = db.session.execute(sentencia).first()
+    return fila
+
+
+# ---------- Entradas ----------
+def entrada(id_insumo, cantidad, costo_unitario=None, id_compra=None, fecha=None):
+    """Suma una entrada valorizada. Sin costo_unitario entra al costo vigente."""
+    entrada_lote(id_insumo, [(cantidad, costo_unitario, id_compra, fecha)])
+
+
+def entrada_lote(id_insumo, entradas):
+    """
+    Varias entradas del mismo insumo con un solo UPDATE del estado.
+    entradas: lista de (cantidad, costo_unitario o None, id_compra o None, fecha o None).
+    En fifo cada entrada es una capa; su fecha ordena el consumo (una
+    devolución con la fecha de la salida original se consume primero).
+    """
+    entradas = [(decimal(q), None if p is None else decimal(p), id_compra, fecha) for q, p, id_compra, fecha in entradas]
+    assert all(q > 0 for q, *_ in entradas), entradas
+
+    tabla = CostoInsumo.__table__
+    c = tabla.c
+    total = sum((q for q, *_ in entradas), Decimal('0'))
+    # entradas sin costo: al costo vigente (se resuelve en el mismo UPDATE)
+    sin_costo = sum((q for q, p, *_ in entradas if p is None), Decimal('0'))
+    monto = sum((q * p for q, p, *_ in entradas if p is not None), Decimal('0')) + sin_costo * c.costo_unitario
+    sin_existencia = c.cantidad <= 0  # sin stock (o negativo): el valor arranca de nuevo
+
+    valor = case((sin_existencia, (c.cantidad + total) * (monto / total)), else_=c.valor + monto)
+    promedio = case((sin_existencia, monto / total), else_=(c.valor + monto) / (c.cantidad + total))
+    fila = _actualizar(id_insumo, update(tabla).values(
+        cantidad=c.cantidad + total,
+        valor=valor,
+        costo_unitario=case((c.metodo == PROMEDIO, promedio), (sin_existencia, monto / total), else_=c.costo_unitario),
+        actualizado=datetime.utcnow(),
+    ).returning(c.metodo, c.cantidad, c.costo_unitario))
+
+    metodo, cantidad, costo_vigente = fila
+    if metodo != FIFO:
+        return
+
+    # si la existencia estaba en negativo, las primeras unidades cubren ese faltante
+    faltante = max(total - decimal(cantidad), Decimal('0'))
+    capas = []
+    for q, p, id_compra, fecha in entradas:
+        cubierto = min(q, faltante)
+        faltante -= cubierto
+        capas.append({'id_insumo': id_insumo, 'id_compra': id_compra, 'fecha': _fecha_hora(fecha), 'cantidad': q,
+                      'restante': q - cubierto, 'costo_unitario': decimal(costo_vigente) if p is None else p})
+    db.session.execute(insert(CapaCosto), capas)
+
+
+def devolucion(id_insumo, cantidad, costo_unitario, fecha=None):
+    """Reversión de una salida: vuelve al costo con que salió (en fifo, con la fecha de la salida)."""
+    entrada(id_insumo, cantidad, costo_unitario, fecha=fecha)
+
+
+def ajuste(id_insumo, diferencia):
+    """Ajuste manual de stock: entra o sale al costo vigente."""
+    diferencia = decimal(diferencia)
+    if diferencia > 0:
+        entrada(id_insumo, diferencia)
+    elif diferencia < 0:
+        salida(id_insumo, -diferencia)
+
+
+def ajustar_compra(id_compra, id_insumo, cantidad_anterior, precio_anterior, cantidad, precio):
+    """
+    Edición de una compra ya costeada. En promedio cambia el valor por la
+    diferencia; en fifo corrige su capa (lo ya consumido no se recalcula:
+    para eso está reconstruir()).
+    """
+    cantidad_anterior, precio_anterior = decimal(cantidad_anterior), decimal(precio_anterior)
+    cantidad, precio = decimal(cantidad), decimal(precio)
+    if (cantidad, precio) == (cantidad_anterior, precio_anterior):
+        return
+
+    tabla = CostoInsumo.__table__
+    c = tabla.c
+    capas = CapaCosto.__table__
+    delta = cantidad - cantidad_anterior
+    fila = _actualizar(id_insumo, select(c.metodo).with_for_update())
+    if fila.metodo == FIFO:
+        capa = db.session.execute(
+            select(capas.c.id_capa, capas.c.restante, capas.c.costo_unitario)
+            .where(capas.c.id_compra == id_compra).order_by(capas.c.id_capa.desc()).limit(1)
+        ).first()
+        if capa is not None:
+            restante = max(decimal(capa.restante) + delta, Decimal('0'))
+            db.session.execute(update(capas).where(capas.c.id_capa == capa.id_capa).values(
+                cantidad=cantidad, restante=restante, costo_unitario=precio
+            ))
+            diferencia_valor = restante * precio - decimal(capa.restante) * decimal(capa.costo_unitario)
+        else:
+            diferencia_valor = delta * c.costo_unitario
+    else:
+        diferencia_valor = cantidad * precio - cantidad_anterior * precio_anterior
+
+    quedan = c.cantidad + delta
+    db.session.execute(update(tabla).where(c.id_insumo == id_insumo).values(
+        cantidad=quedan,
+        valor=case((quedan > 0, c.valor + diferencia_valor), else_=0),
+        costo_unitario=case(
+            (and_(c.metodo == PROMEDIO, quedan > 0), (c.valor + diferencia_valor) / quedan),
+            else_=c.costo_unitario
+        ),
+        actualizado=datetime.utcnow(),
+    ))
+
+
+# ---------- Salidas ----------
+def salida(id_insumo, cantidad):
+    """Da de baja `cantidad` y devuelve su costo unitario (redondeado como tanque_insumo)."""
+    return salida_lote(id_insumo, [cantidad])[0]
+
+
+def salida_lote(id_insumo, cantidades):
+    """
+    Varias salidas del mismo insumo en orden; devuelve el costo unitario de
+    cada una. El UPDATE del estado toma el lock de la fila, así dos workers
+    no consumen la misma capa.
+    """
+    cantidades = [decimal(q) for q in cantidades]
+    total = sum(cantidades, Decimal('0'))
+    tabla = CostoInsumo.__table__
+    c = tabla.c
+    metodo, costo = _actualizar(id_insumo, update(tabla).values(
+        cantidad=c.cantidad - total,
+        valor=case((c.metodo == PROMEDIO, c.valor - total * c.costo_unitario), else_=c.valor),
+        actualizado=datetime.utcnow(),
+    ).returning(c.metodo, c.costo_unitario))
+    if metodo == PROMEDIO:
+        return [decimal(costo).quantize(_CENTAVOS)] * len(cantidades)
+
+    montos, ultimo = _consumir_capas(id_insumo, cantidades, decimal(costo))
+    db.session.execute(update(tabla).where(c.id_insumo == id_insumo).values(
+        valor=c.valor - sum(montos, Decimal('0')),
+        costo_unitario=ultimo.quantize(_CUATRO_DECIMALES),
+    ))
+    return [(m / q).quantize(_CENTAVOS) if q else Decimal('0') for m, q in zip(montos, cantidades)]
+
+
+def _consumir_capas(id_insumo, cantidades, costo_vigente):
+    """Recorre las capas con saldo en orden FIFO. Devuelve (monto de cada salida, último costo usado)."""
+    capas = CapaCosto.__table__
+    abiertas = (
+        select(capas.c.id_capa, capas.c.fecha, capas.c.restante, capas.c.costo_unitario)
+        .where(capas.c.id_insumo == id_insumo, capas.c.restante > 0)
+        .order_by(capas.c.fecha, capas.c.id_capa)
+        .limit(_CAPAS_POR_LECTURA)
+    )
+    cola = deque()
+    despues = None  # (fecha, id_capa) de la última capa leída
+    agotadas = False
+    cambios = {}
+    montos = []
+    ultimo = costo_vigente
+
+    for cantidad in cantidades:
+        pendiente, monto = cantidad, Decimal('0')
+        while pendiente > 0:
+            if not cola and not agotadas:
+                consulta = abiertas
+                if despues is not None:
+                    consulta = consulta.where(or_(
+                        capas.c.fecha > despues[0], and_(capas.c.fecha == despues[0], capas.c.id_capa > despues[1])
+                    ))
+                bloque = db.session.execute(consulta).all()
+                agotadas = len(bloque) < _CAPAS_POR_LECTURA
+                if bloque:
+                    despues = (bloque[-1].fecha, bloque[-1].id_capa)
+                cola.extend([fila.id_capa, decimal(fila.restante), decimal(fila.costo_unitario)] for fila in bloque)
+            if not cola:
+                # sin capas (existencia anterior al costeo o stock negativo): al último costo
+                monto += pendiente * ultimo
+                break
+            capa = cola[0]
+            tomado = min(pendiente, capa[1])
+            capa[1] -= tomado
+            pendiente -= tomado
+            monto += tomado * capa[2]
+            ultimo = capa[2]
+            cambios[capa[0]] = capa[1]
+            if capa[1] <= 0:
+                cola.popleft()
+        montos.append(monto)
+
+    if cambios:
+        db.session.execute(update(CapaCosto), [{'id_capa': i, 'restante': r} for i, r in cambios.items()])
+    return montos, ultimo
+
+
+# ---------- Consultas ----------
+def costo_actual(id_insumo):
+    """Estado del costeo de un insumo (None si todavía no tiene)."""
+    return db.session.get(CostoInsumo, id_insumo)
+
+
+# ------------------------------------------------------------
+# Reconstrucción desde el libro de movimientos
+# ------------------------------------------------------------
+class _Costeo:
+    """Costeo de un insumo en memoria, con las mismas reglas que las funciones de arriba."""
+
+    def __init__(self, metodo, costo):
+        self.metodo = metodo
+        self.cantidad = Decimal('0')
+        self.valor = Decimal('0')
+        self.costo = costo
+        self.capas = deque()  # [id_compra, fecha, cantidad, restante, costo]
+        self.por_compra = {}
+
+    def entrada(self, cantidad, costo, id_compra=None, fecha=None):
+        if self.cantidad <= 0:
+            self.valor = (self.cantidad + cantidad) * costo
+            self.costo = costo
+        else:
+            self.valor += cantidad * costo
+            if self.metodo == PROMEDIO:
+                self.costo = self.valor / (self.cantidad + cantidad)
+        faltante = max(-self.cantidad, Decimal('0'))
+        self.cantidad += cantidad
+        if self.metodo == FIFO:
+            capa = [id_compra, fecha, cantidad, max(cantidad - faltante, Decimal('0')), costo]
+            # una devolución va antes que las capas posteriores a su fecha
+            posicion = len(self.capas)
+            while posicion and fecha is not None and self.capas[posicion - 1][1] > fecha:
+                posicion -= 1
+            self.capas.insert(posicion, capa)
+            if id_compra is not None:
+                self.por_compra[id_compra] = capa
+
+    def ajustar_compra(self, id_compra, delta, precio):
+        """Edición de una compra (reversión + compra en el libro): mismas reglas que ajustar_compra()."""
+        capa = self.por_compra.get(id_compra)
+        if self.metodo == FIFO and capa is not None:
+            restante = max(capa[3] + delta, Decimal('0'))
+            diferencia = restante * precio - capa[3] * capa[4]
+            capa[2] += delta
+            capa[3], capa[4] = restante, precio
+        elif self.metodo == FIFO:
+            diferencia = delta * self.costo
+        else:
+            diferencia = delta * precio
+        self.cantidad += delta
+        if self.cantidad <= 0:
+            self.valor = Decimal('0')
+        else:
+            self.valor += diferencia
+            if self.metodo == PROMEDIO:
+                self.costo = self.valor / self.cantidad
+
+    def salida(self, cantidad):
+        if self.metodo == PROMEDIO:
+            self.cantidad -= cantidad
+            self.valor -= cantidad * self.costo
+            return self.costo
+        pendiente, monto = cantidad, Decimal('0')
+        while pendiente > 0 and self.capas:
+            capa = self.capas[0]
+            tomado = min(pendiente, capa[3])
+            capa[3] -= tomado
+            pendiente -= tomado
+            monto += tomado * capa[4]
+            self.costo = capa[4]
+            if capa[3] <= 0:
+                self.capas.popleft()
+        monto += pendiente * self.costo
+        self.cantidad -= cantidad
+        self.valor -= monto
+        return monto / cantidad if cantidad else self.costo
+
+
+def reconstruir(metodo=None):
+    """
+    Rearma costos_insumo y capas_costo repasando movimientos_stock en orden
+    (compras a su precio, salidas y ajustes al costo del momento, reversiones
+    de salidas al costo con que salieron). La existencia anterior al libro
+    (la 'apertura') se valoriza al último precio de proveedor.
+    No modifica el costo ya registrado en las salidas. Devuelve los insumos costeados.
+    """
+    metodo = metodo or metodo_por_defecto()
+    assert metodo in METODOS, metodo
+    db.session.execute(delete(CapaCosto))
+    db.session.execute(delete(CostoInsumo))
+
+    mov = MovimientoStock.__table__
+    compras = Compra.__table__
+    id_compra_referida = cast(func.substr(mov.c.referencia, 8), Integer)
+    consulta = (
+        select(mov.c.id_insumo, mov.c.tipo, mov.c.cantidad, mov.c.referencia, mov.c.fecha,
+               compras.c.id_compra, compras.c.precio_unitario, compras.c.fecha.label('fecha_compra'))
+        .outerjoin(compras, and_(mov.c.referencia.like('compra:%'), compras.c.id_compra == id_compra_referida))
+        .order_by(mov.c.id_insumo, mov.c.id_movimiento)
+        .execution_options(yield_per=5000)
+    )
+    precios = _precios_referencia()
+    estados = {}
+    salidas = {}  # referencia -> (costo, fecha) de la última salida, para sus reversiones
+    revertidas = {}  # id_compra -> cantidad revertida, hasta que llega la compra editada
+    actual = None
+    for fila in db.session.execute(consulta):
+        if fila.id_insumo != actual:
+            actual = fila.id_insumo
+            salidas.clear()
+            revertidas.clear()
+            estados[actual] = _Costeo(metodo, precios.get(actual, Decimal('0')))
+        costeo = estados[actual]
+        cantidad = decimal(fila.cantidad)
+        referencia = fila.referencia or ''
+
+        if fila.id_compra is not None:
+            # editar una compra asienta su reversión y enseguida la compra nueva
+            precio = decimal(fila.precio_unitario)
+            if cantidad < 0:
+                revertidas[fila.id_compra] = -cantidad
+            elif fila.id_compra in revertidas:
+                costeo.ajustar_compra(fila.id_compra, cantidad - revertidas.pop(fila.id_compra), precio)
+            else:
+                costeo.entrada(cantidad, precio, fila.id_compra, _fecha_hora(fila.fecha_compra))
+        elif cantidad < 0:
+            salidas[referencia] = (costeo.salida(-cantidad), fila.fecha)
+        elif cantidad > 0:
+            costo, fecha = salidas.get(referencia, (costeo.costo, fila.fecha)) \
+                if referencia.startswith('tanque_insumo:') else (costeo.costo, fila.fecha)
+            costeo.entrada(cantidad, costo, fecha=fecha)
+
+    ahora = datetime.utcnow()
+    filas, capas = [], []
+    for id_insumo, costeo in estados.items():
+        filas.append({'id_insumo': id_insumo, 'metodo': metodo, 'cantidad': costeo.cantidad,
+                      'valor': costeo.valor.quantize(_CUATRO_DECIMALES),
+                      'costo_unitario': costeo.costo.quantize(_CUATRO_DECIMALES), 'actualizado': ahora})
+        capas.extend(
+            {'id_insumo': id_insumo, 'id_compra': id_compra, 'fecha': fecha or ahora, 'cantidad': cantidad,
+             'restante': restante, 'costo_unitario': costo}
+            for id_compra, fecha, cantidad, restante, costo in costeo.capas if restante > 0
+        )
+    for i in range(0, len(filas), 5000):
+        db.session.execute(insert(CostoInsumo), filas[i:i + 5000])
+    for i in range(0, len(capas), 5000):
+        db.session.execute(insert(CapaCosto), capas[i:i + 5000])
+
+    # insumos sin movimientos: su stock actual al último precio
+    abiertos = _abrir(metodo=metodo)
+    db.session.commit()
+    return len(filas) + abiertos
+
+
+def inicializar_costos():
+    """Primera vez: si hay insumos y todavía no hay estado de costeo, lo arma."""
+    if db.session.query(CostoInsumo.id_insumo).first() is None and db.session.query(Insumo.id_insumo).first() is not None:
+        return reconstruir()
+    return 0
@@ -0,0 +1,143 @@
+# services/eventos.py
+import json
+import os
+import queue
+import select
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func, select as sql_select
+from models import db
+from services.transacciones import antes_del_commit, despues_del_commit, pendientes, tomar
+
+
+# ------------------------------------------------------------
+# Eventos en vivo (stock, alertas, tanques finalizados)
+#
+# Los servicios publican eventos dentro de la transacción; se emiten solo
+# si hace commit. En PostgreSQL viajan con NOTIFY (llegan a todos los
+# workers) y cada proceso tiene un hilo con LISTEN que los reparte a sus
+# clientes SSE. En SQLite / desarrollo se reparten en el mismo proceso.
+# ------------------------------------------------------------
+CANAL = 'eventos_inventario'
+TAMANO_COLA = 1000  # por cliente; si un cliente no lee, se descartan eventos
+
+# Cada stream abierto ocupa un hilo del worker (gthread) mientras dure: como
+# mucho la mitad de los hilos de cada worker atiende streams, el resto queda
+# para la API. Pasado el tope se responde 503 y el navegador reintenta.
+MAX_CLIENTES = int(os.getenv('SSE_MAX_CLIENTES', str(max(1, int(os.getenv('GUNICORN_THREADS', '8')) // 2))))
+
+_CLAVE = 'eventos'
+
+
+class Broker:
+    """Reparte cada evento a las colas de los clientes conectados a este proceso."""
+
+    def __init__(self):
+        self.clientes = set()
+        self.lock = threading.Lock()
+
+    def suscribir(self):
+        """Cola nueva para un cliente, o None si este proceso ya tiene MAX_CLIENTES."""
+        cola = queue.Queue(maxsize=TAMANO_COLA)
+        with self.lock:
+            if len(self.clientes) >= MAX_CLIENTES:
+                return None
+            self.clientes.add(cola)
+        return cola
+
+    def desuscribir(self, cola):
+        with self.lock:
+            self.clientes.discard(cola)
+
+    def difundir(self, evento):
+        with self.lock:
+            clientes = list(self.clientes)
+        for cola in clientes:
+            try:
+                cola.put_nowait(evento)
+            except queue.Full:
+                pass
+
+
+broker = Broker()
+
+
+def publicar(session, tipo, datos):
+    """Encola un evento para emitir cuando la transacción haga commit."""
+    pendientes(session, _CLAVE, list).append({'tipo': tipo, 'datos': datos})
+
+
+def _usa_notify(session):
+    return session.get_bind().dialect.name == 'postgresql'
+
+
+@antes_del_commit(prioridad=950)  # después de evaluar alertas, que también publica
+def _notificar(session):
+    # NOTIFY es transaccional: PostgreSQL lo entrega recién al hacer commit
+    if not _usa_notify(session):
+        return
+    eventos = tomar(session, _CLAVE)
+    for evento in eventos or ():
+        session.execute(sql_select(func.pg_notify(CANAL, json.dumps(evento, default=str))))
+
+
+@despues_del_commit()
+def _difundir_local(session):
+    for evento in tomar(session, _CLAVE) or ():
+        broker.difundir(json.loads(json.dumps(evento, default=str)))
+
+
+# ---------- LISTEN (un hilo por proceso) ----------
+_hilo = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _escuchar(engine, log):
+    # el hilo no tiene contexto de aplicación: recibe el logger de la app
+    while True:
+        conexion = None
+        try:
+            conexion = engine.raw_connection()
+            conexion.detach()  # conexión propia, fuera del pool
+            dbapi = conexion.dbapi_connection
+            dbapi.autocommit = True
+            dbapi.cursor().execute(f"LISTEN {CANAL}")
+            while True:
+                if select.select([dbapi], [], [], 30) == ([], [], []):
+                    continue
+                dbapi.poll()
+                while dbapi.notifies:
+                    aviso = dbapi.notifies.pop(0)
+                    try:
+                        broker.difundir(json.loads(aviso.payload))
+                    except ValueError:
+                        pass
+        except Exception as e:
+            log.warning("LISTEN %s interrumpido, reintentando: %s", CANAL, e)
+        finally:
+            # desprendida del pool: si no se cierra acá, cada reintento deja una abierta
+            if conexion is not None:
+                try:
+                    conexion.close()
+                except Exception:
+                    pass
+        time.sleep(3)
+
+
+def iniciar_escucha():
+    """Arranca el hilo LISTEN de este proceso si hace falta (solo PostgreSQL)."""
+    global _hilo, _pid
+    if db.engine.dialect.name != 'postgresql':
+        return
+    with _lock:
+        # después de un fork el hilo del padre no existe en el hijo
+        if _hilo is None or _pid != os.getpid() or not _hilo.is_alive():
+            _pid = os.getpid()
+            _hilo = threading.Thread(
+                target=_escuchar, args=(db.engine, current_app.logger), name='eventos_listen', daemon=True
+            )
+            _hilo.start()
+            current_app.logger.info("Escuchando eventos en el canal %s (pid %s)", CANAL, _pid)
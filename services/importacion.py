@@ -0,0 +1,257 @@
+# services/importacion.py
+import csv
+import io
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import insert, update
+from models import db, Compra, Proveedor, Insumo, ProveedorInsumo, HistorialPrecio
+from services.busqueda import normalizar
+from services.stock import mover_stock_lote
+from services.costos import entrada_lote
+from services.precios import marcar_insumos as marcar_mejores_precios
+from services.reportes import registrar_compra
+from services.versiones import marcar_tablas
+
+TAMANO_BLOQUE = 2000
+MAX_ERRORES = 1000  # se cuentan todos, pero se devuelven solo los primeros
+
+
+# ------------------------------------------------------------
+# Importación masiva de compras desde CSV
+#
+# Columnas (encabezado obligatorio, separador ',' o ';'):
+#   fecha, proveedor | cuit, insumo | id_insumo, cantidad, precio_unitario
+#
+# El archivo se lee fila a fila y se escribe por bloques: las compras con
+# un INSERT multi-fila, el historial de precios con COPY en PostgreSQL y
+# el stock con un UPDATE por insumo y bloque. Proveedores e insumos se
+# resuelven contra mapas en memoria cargados una sola vez.
+# ------------------------------------------------------------
+class _Mapas:
+    def __init__(self):
+        self.proveedor_por_nombre = {}
+        self.proveedores_por_cuit = defaultdict(list)
+        for id_proveedor, nombre, cuit in db.session.query(Proveedor.id_proveedor, Proveedor.nombre, Proveedor.cuit):
+            self.proveedor_por_nombre.setdefault(normalizar(nombre), id_proveedor)
+            if cuit:
+                self.proveedores_por_cuit[_limpiar_cuit(cuit)].append((id_proveedor, normalizar(nombre)))
+
+        self.insumo_por_nombre = {}
+        self.insumos = set()
+        for id_insumo, nombre in db.session.query(Insumo.id_insumo, Insumo.nombre):
+            self.insumo_por_nombre.setdefault(normalizar(nombre), id_insumo)
+            self.insumos.add(id_insumo)
+
+        # (id_proveedor, id_insumo) -> id_proveedor_insumo
+        self.proveedor_insumo = {
+            (p, i): pi for pi, p, i in db.session.query(
+                ProveedorInsumo.id_proveedor_insumo, ProveedorInsumo.id_proveedor, ProveedorInsumo.id_insumo
+            )
+        }
+        # id_proveedor_insumo -> fecha del último precio registrado antes de importar
+        self.fecha_vigente = dict(
+            db.session.query(HistorialPrecio.id_proveedor_insumo, db.func.max(HistorialPrecio.fecha))
+            .group_by(HistorialPrecio.id_proveedor_insumo)
+        )
+        # id_proveedor_insumo -> (fecha, precio) del precio más reciente importado
+        self.ultimo_precio = {}
+        self.insumos_tocados = set()
+
+
+def _limpiar_cuit(cuit):
+    return ''.join(c for c in str(cuit) if c.isdigit())
+
+
+def _numero(valor):
+    valor = (valor or '').strip()
+    if ',' in valor and '.' not in valor:
+        valor = valor.replace(',', '.')  # "12,50" -> "12.50"
+    try:
+        return Decimal(valor)
+    except InvalidOperation:
+        raise ValueError(f"Número inválido: '{valor}'")
+
+
+def _fecha(valor):
+    valor = (valor or '').strip()
+    if not valor:
+        return datetime.utcnow().date()
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Fecha inválida: '{valor}'")
+
+
+def _leer_fila(fila, mapas):
+    cuit = _limpiar_cuit(fila.get('cuit') or '')
+    nombre_proveedor = normalizar(fila.get('proveedor') or '')
+    if cuit:
+        candidatos = mapas.proveedores_por_cuit.get(cuit, [])
+        # el CUIT puede repetirse: si viene el nombre, desempata
+        elegidos = [p for p, n in candidatos if n == nombre_proveedor] or [p for p, _ in candidatos]
+        id_proveedor = elegidos[0] if elegidos else None
+    else:
+        id_proveedor = mapas.proveedor_por_nombre.get(nombre_proveedor)
+    if id_proveedor is None:
+        raise ValueError(f"Proveedor no encontrado: '{fila.get('cuit') or fila.get('proveedor') or ''}'")
+
+    if (fila.get('id_insumo') or '').strip():
+        try:
+            id_insumo = int(fila['id_insumo'])
+        except ValueError:
+            raise ValueError(f"id_insumo inválido: '{fila['id_insumo']}'")
+        if id_insumo not in mapas.insumos:
+            id_insumo = None
+    else:
+        id_insumo = mapas.insumo_por_nombre.get(normalizar(fila.get('insumo') or ''))
+    if id_insumo is None:
+        raise ValueError(f"Insumo no encontrado: '{fila.get('id_insumo') or fila.get('insumo') or ''}'")
+
+    cantidad = _numero(fila.get('cantidad'))
+    precio_unitario = _numero(fila.get('precio_unitario'))
+    if cantidad <= 0 or precio_unitario < 0:
+        raise ValueError("Cantidad o precio inválidos")
+
+    return {
+        'fecha': _fecha(fila.get('fecha')),
+        'id_proveedor': id_proveedor,
+        'id_insumo': id_insumo,
+        'cantidad': cantidad,
+        'precio_unitario': precio_unitario,
+        'total': cantidad * precio_unitario,
+        'revisado': False,
+        'confirmado': False
+    }
+
+
+def _copiar(tabla, columnas, filas):
+    """COPY ... FROM STDIN en PostgreSQL (psycopg2); INSERT multi-fila en el resto."""
+    if not filas:
+        return
+    conexion = db.session.connection()
+    if conexion.dialect.name == 'postgresql' and conexion.dialect.driver == 'psycopg2':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(filas)
+        buffer.seek(0)
+        cursor = conexion.connection.cursor()  # misma transacción que la sesión
+        cursor.copy_expert(f"COPY {tabla.name} ({', '.join(columnas)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        marcar_tablas(db.session, {tabla.name})  # el COPY no pasa por los eventos del ORM
+    else:
+        db.session.execute(tabla.insert(), [dict(zip(columnas, f)) for f in filas])
+
+
+def _escribir_bloque(bloque, mapas):
+    if not bloque:
+        return
+
+    # 1. Compras (INSERT multi-fila con RETURNING de los ids)
+    ids = db.session.execute(
+        insert(Compra).returning(Compra.id_compra, sort_by_parameter_order=True),
+        bloque
+    ).scalars().all()
+
+    # 2. Asociaciones proveedor-insumo que todavía no existen
+    nuevos = {(c['id_proveedor'], c['id_insumo']) for c in bloque} - mapas.proveedor_insumo.keys()
+    if nuevos:
+        precios_nuevos = {}
+        for c in bloque:
+            precios_nuevos[(c['id_proveedor'], c['id_insumo'])] = c['precio_unitario']
+        filas = db.session.execute(
+            insert(ProveedorInsumo).returning(
+                ProveedorInsumo.id_proveedor_insumo, ProveedorInsumo.id_proveedor, ProveedorInsumo.id_insumo
+            ),
+            [{'id_proveedor': p, 'id_insumo': i, 'precio_actual': precios_nuevos[(p, i)]} for p, i in nuevos]
+        ).all()
+        for pi, p, i in filas:
+            mapas.proveedor_insumo[(p, i)] = pi
+
+    # 3. Historial de precios (COPY), solo los cambios
+    historial = []
+    for c in bloque:
+        pi = mapas.proveedor_insumo[(c['id_proveedor'], c['id_insumo'])]
+        fecha = datetime.combine(c['fecha'], datetime.min.time())
+        ultimo = mapas.ultimo_precio.get(pi)
+        if ultimo is not None and fecha >= ultimo[0] and c['precio_unitario'] == ultimo[1]:
+            continue  # sigue la corrida del último precio: no agrega nada
+        historial.append((pi, fecha, c['precio_unitario'], False, False))
+        # Una compra histórica no pisa un precio más nuevo
+        vigente = ultimo[0] if ultimo is not None else mapas.fecha_vigente.get(pi)
+        if vigente is None or fecha >= vigente:
+            mapas.ultimo_precio[pi] = (fecha, c['precio_unitario'])
+    _copiar(HistorialPrecio.__table__, ['id_proveedor_insumo', 'fecha', 'precio', 'revisado', 'confirmado'], historial)
+
+    # 4. Stock: un UPDATE por insumo del bloque (y los agregados de reportes)
+    movimientos = defaultdict(list)
+    entradas = defaultdict(list)
+    for id_compra, c in zip(ids, bloque):
+        movimientos[c['id_insumo']].append((c['cantidad'], f'compra:{id_compra}'))
+        entradas[c['id_insumo']].append((c['cantidad'], c['precio_unitario'], id_compra, c['fecha']))
+        registrar_compra(db.session, c['fecha'], c['id_proveedor'], c['id_insumo'], c['total'], c['cantidad'])
+    for id_insumo, movs in movimientos.items():
+        entrada_lote(id_insumo, entradas[id_insumo])  # costeo antes que el stock
+        mover_stock_lote(id_insumo, movs, 'compra')
+    mapas.insumos_tocados.update(movimientos)
+
+
+def _finalizar(mapas):
+    # Precio actual = el de la compra más reciente de cada asociación
+    if mapas.ultimo_precio:
+        db.session.execute(
+            update(ProveedorInsumo),
+            [{'id_proveedor_insumo': pi, 'precio_actual': precio} for pi, (_, precio) in mapas.ultimo_precio.items()]
+        )
+    # los INSERT/UPDATE en bloque no pasan por after_flush: se marcan a mano
+    marcar_mejores_precios(db.session, mapas.insumos_tocados)
+
+
+def importar_compras(archivo, dry_run=False):
+    """
+    Importa compras desde un archivo de texto CSV (iterable de líneas).
+    Las filas con error se saltean y se informan; con dry_run=True se valida y
+    se calcula todo pero se hace rollback al final.
+    """
+    primera = archivo.readline()
+    delimitador = ';' if primera.count(';') > primera.count(',') else ','
+    encabezado = [c.strip().lower() for c in next(csv.reader([primera], delimiter=delimitador))]
+    lector = csv.DictReader(archivo, fieldnames=encabezado, delimiter=delimitador)
+
+    faltan = {'cantidad', 'precio_unitario'} - set(encabezado)
+    if faltan or not ({'proveedor', 'cuit'} & set(encabezado)) or not ({'insumo', 'id_insumo'} & set(encabezado)):
+        raise ValueError("Encabezado inválido: se esperan fecha, proveedor|cuit, insumo|id_insumo, cantidad, precio_unitario")
+
+    mapas = _Mapas()
+    resumen = {'filas': 0, 'importadas': 0, 'con_error': 0, 'errores': [], 'dry_run': dry_run}
+    bloque = []
+
+    try:
+        for numero, fila in enumerate(lector, start=2):  # la línea 1 es el encabezado
+            resumen['filas'] += 1
+            try:
+                bloque.append(_leer_fila(fila, mapas))
+            except ValueError as e:
+                resumen['con_error'] += 1
+                if len(resumen['errores']) < MAX_ERRORES:
+                    resumen['errores'].append({'linea': numero, 'error': str(e)})
+                continue
+
+            if len(bloque) >= TAMANO_BLOQUE:
+                _escribir_bloque(bloque, mapas)
+                resumen['importadas'] += len(bloque)
+                bloque = []
+
+        _escribir_bloque(bloque, mapas)
+        resumen['importadas'] += len(bloque)
+        _finalizar(mapas)
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    return resumen
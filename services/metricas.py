@@ -0,0 +1,114 @@
+# services/metricas.py
+import os
+import time
+
+from flask import g, has_request_context, request
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess, REGISTRY
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# ------------------------------------------------------------
+# Métricas Prometheus por endpoint de Flask
+#
+# Por request: latencia, código de estado, cantidad de sentencias SQL y
+# tiempo total en la base (eventos before/after_cursor_execute). Con
+# PROMETHEUS_MULTIPROC_DIR definido (lo hace gunicorn.conf.py) cada worker
+# escribe en archivos mmap de ese directorio y /metrics suma todos.
+# El costo por request son unos perf_counter() y sumas en memoria.
+# ------------------------------------------------------------
+MULTIPROCESO = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+_ETIQUETAS = ('endpoint', 'method')
+_BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LATENCIA = Histogram('http_request_duration_seconds', 'Latencia de la request', _ETIQUETAS, buckets=_BUCKETS_LATENCIA)
+REQUESTS = Counter('http_requests_total', 'Requests atendidas', _ETIQUETAS + ('status',))
+SENTENCIAS = Histogram(
+    'db_statements_per_request', 'Sentencias SQL por request', _ETIQUETAS,
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+)
+TIEMPO_DB = Counter('db_time_seconds_total', 'Tiempo total esperando a la base', _ETIQUETAS)
+ESPERA_POOL = Histogram(
+    'db_pool_checkout_wait_seconds', 'Espera para obtener una conexión del pool',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+)
+POOL_EN_USO = Gauge('db_pool_checked_out', 'Conexiones en uso', multiprocess_mode='livesum')
+POOL_TAMANO = Gauge('db_pool_size', 'Tamaño configurado del pool', multiprocess_mode='livesum')
+
+
+# ---------- SQL ----------
+# El inicio va en el contexto de ejecución de cada sentencia y no en la
+# conexión: si la sentencia falla after_cursor_execute no corre y no queda
+# nada colgado en una conexión del pool.
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._inicio_sql = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_sql(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, '_inicio_sql', None)
+    if inicio is None:
+        return
+    if has_request_context() and '_metricas_sql' in g:
+        g._metricas_sql[0] += 1
+        g._metricas_sql[1] += time.perf_counter() - inicio
+
+
+# ---------- Requests ----------
+def _inicio():
+    g._metricas_inicio = time.perf_counter()
+    g._metricas_sql = [0, 0.0]
+
+
+def _registrar(status):
+    if '_metricas_inicio' not in g or g.get('_metricas_hecho'):
+        return
+    g._metricas_hecho = True
+    etiquetas = (request.endpoint or 'sin_ruta', request.method)  # sin_ruta: 404, no explota la cardinalidad
+    LATENCIA.labels(*etiquetas).observe(time.perf_counter() - g._metricas_inicio)
+    REQUESTS.labels(*etiquetas, str(status)).inc()
+    sentencias, segundos = g._metricas_sql
+    SENTENCIAS.labels(*etiquetas).observe(sentencias)
+    if segundos:
+        TIEMPO_DB.labels(*etiquetas).inc(segundos)
+    _actualizar_pool()
+
+
+def _actualizar_pool():
+    from services.pool import estadisticas_pool
+    datos = estadisticas_pool()
+    if 'tamano' in datos:
+        POOL_EN_USO.set(datos['en_uso'])
+        POOL_TAMANO.set(datos['tamano'])
+
+
+def instalar(app):
+    @app.before_request
+    def _metricas_antes():
+        _inicio()
+
+    @app.after_request
+    def _metricas_despues(respuesta):
+        _registrar(respuesta.status_code)
+        return respuesta
+
+    @app.teardown_request
+    def _metricas_error(error):
+        # una excepción sin manejar no pasa por after_request
+        if error is not None:
+            _registrar(500)
+
+
+def exponer():
+    """(cuerpo, content-type) en formato de texto de Prometheus."""
+    if MULTIPROCESO:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST
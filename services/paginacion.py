@@ -0,0 +1,120 @@
+# services/paginacion.py
+import base64
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import request, jsonify, url_for
+from sqlalchemy import and_, or_
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 500
+# tope del listado sin limit/after (combos y pantallas que esperan un array)
+LIMITE_LISTA = int(os.getenv('PAGINACION_LIMITE_LISTA', '1000'))
+
+
+# ------------------------------------------------------------
+# Paginación por cursor (keyset)
+# El cursor guarda los valores de las columnas de orden de la última
+# fila enviada; la página siguiente se pide con WHERE (col) < (valor),
+# así el costo no depende de cuántas páginas se hayan recorrido.
+# ------------------------------------------------------------
+def _a_json(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def _desde_json(valor, columna):
+    tipo = columna.type.python_type
+    if valor is None:
+        return None
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    if tipo is date:
+        return date.fromisoformat(valor)
+    return tipo(valor)
+
+
+def codificar_cursor(valores):
+    crudo = json.dumps([_a_json(v) for v in valores]).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, orden):
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(crudo)
+        if len(valores) != len(orden):
+            raise ValueError
+        return [_desde_json(v, col) for v, (col, _) in zip(valores, orden)]
+    except (ValueError, TypeError) as e:
+        raise ValueError('Cursor inválido') from e
+
+
+def _filtro_despues_de(orden, valores):
+    # (a, b) después de (x, y)  ==>  a <op> x OR (a = x AND b <op> y)
+    condiciones = []
+    for i, (col, sentido) in enumerate(orden):
+        iguales = [c == v for (c, _), v in zip(orden[:i], valores[:i])]
+        corte = col < valores[i] if sentido == 'desc' else col > valores[i]
+        condiciones.append(and_(*iguales, corte))
+    return or_(*condiciones)
+
+
+def pide_pagina():
+    """True si el cliente pidió paginación (parámetros limit / after)."""
+    return 'limit' in request.args or 'after' in request.args
+
+
+def paginar(query, orden, serializar):
+    """
+    Responde un listado paginado por cursor.
+
+    orden: lista de (columna, 'asc' | 'desc'); la última columna debe ser única (la PK).
+    Sin limit/after se devuelve un array como antes, para no romper los
+    clientes que lo esperan, pero con a lo sumo LIMITE_LISTA filas. Si se
+    corta, la respuesta lo avisa con X-Truncated y Link: <...>; rel="next"
+    (la página siguiente, ya con cursor). Las pantallas usan traerTodos()
+    de base.html, que pide páginas.
+    """
+    query = query.order_by(*[col.desc() if s == 'desc' else col.asc() for col, s in orden])
+
+    if not pide_pagina():
+        filas = query.limit(LIMITE_LISTA + 1).all()
+        respuesta = jsonify([serializar(r) for r in filas[:LIMITE_LISTA]])
+        if len(filas) > LIMITE_LISTA:
+            cursor = codificar_cursor([getattr(filas[LIMITE_LISTA - 1], col.key) for col, _ in orden])
+            siguiente = url_for(request.endpoint, **(request.view_args or {}),
+                                **request.args.to_dict(), limit=LIMITE_MAXIMO, after=cursor)
+            respuesta.headers['X-Truncated'] = 'true'
+            respuesta.headers['Link'] = f'<{siguiente}>; rel="next"'
+        return respuesta
+
+    limite = request.args.get('limit', LIMITE_POR_DEFECTO, type=int)
+    limite = max(1, min(limite or LIMITE_POR_DEFECTO, LIMITE_MAXIMO))
+
+    cursor = request.args.get('after')
+    if cursor:
+        try:
+            valores = decodificar_cursor(cursor, orden)
+        except ValueError:
+            return jsonify({'error': 'Cursor inválido'}), 400
+        query = query.filter(_filtro_despues_de(orden, valores))
+
+    filas = query.limit(limite + 1).all()
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+
+    siguiente = None
+    if hay_mas:
+        ultima = filas[-1]
+        siguiente = codificar_cursor([getattr(ultima, col.key) for col, _ in orden])
+
+    return jsonify({
+        'items': [serializar(r) for r in filas],
+        'next_cursor': siguiente
+    })
@@ -0,0 +1,204 @@
+# services/pdf_tanques.py
+import glob
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import abort, current_app
+from sqlalchemy import event, inspect, or_, select
+from models import db, Insumo, Proveedor, ProveedorInsumo, TanqueFabricado
+from services.archivo import lineas_tanque
+from services.serializers import con_relaciones
+from services.transacciones import despues_del_commit, pendientes, tomar
+
+
+# ------------------------------------------------------------
+# Informes PDF de tanques finalizados
+#
+# Cada PDF se genera una vez por versión del tanque y queda en disco como
+# tanque_<id>_v<version>.pdf (la columna version de TanqueFabricado, que
+# sube al finalizar, desfinalizar, archivar o con cada salida). Para saber
+# si ya está alcanza con leer la versión: las líneas y los proveedores se
+# cargan solo cuando hay que generarlo. Las versiones viejas se borran.
+# El PDF también imprime nombres de insumos y proveedores, que no suben la
+# versión del tanque: al renombrar uno se borran los PDF de los tanques que
+# lo usan (también los archivados) y se regeneran cuando se piden.
+# La generación corre en un pool de hilos, fuera del hilo que atiende la
+# request.
+# ------------------------------------------------------------
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='pdf_tanques')
+_pendientes = {}  # ruta -> Future
+_lock = threading.Lock()
+
+
+def _directorio():
+    directorio = os.getenv('PDF_CACHE_DIR') or os.path.join(current_app.instance_path, 'pdf_tanques')
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def _datos_tanque(tanque):
+    """Todo lo que se imprime, como valores simples: el hilo de render no toca la sesión."""
+    filas = []
+    costo_total = 0
+    for ti in tanque.lineas():
+        asociaciones = sorted(ti.insumo.proveedor_insumo, key=lambda pi: pi.id_proveedor_insumo)
+        costo_total += ti.cantidad_usada * ti.costo_unitario
+        filas.append([
+            tanque.fecha.strftime('%Y-%m-%d') if tanque.fecha else '-',
+            f"{float(ti.cantidad_usada):.2f}",
+            ti.insumo.nombre,
+            f"${float(ti.costo_unitario):.2f}",
+            f"${float(ti.cantidad_usada * ti.costo_unitario):.2f}",
+            asociaciones[0].proveedor.nombre if asociaciones else '-'
+        ])
+    return {
+        'id_tanque': tanque.id_tanque,
+        'cliente': tanque.cliente,
+        'modelo': tanque.modelo,
+        'fecha': tanque.fecha.strftime('%Y-%m-%d'),
+        'costo_total': f"{float(costo_total):.2f}",
+        'filas': filas
+    }
+
+
+def _renderizar(datos, ruta):
+    # ReportLab se importa recién al generar el primer PDF: no pesa en el arranque de los workers
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = tempfile.NamedTemporaryFile(dir=os.path.dirname(ruta), suffix='.tmp', delete=False)
+    try:
+        pdf = canvas.Canvas(buffer, pagesize=letter)
+        width, height = letter
+        pdf.setTitle(f"Tanque_{datos['id_tanque']}_Finalizado")
+
+        # Título e info
+        pdf.setFont("Helvetica-Bold", 16)
+        pdf.drawCentredString(width / 2, height - 50, f"Informe de Tanque Fabricado ID {datos['id_tanque']}")
+        pdf.setFont("Helvetica", 12)
+        pdf.drawString(50, height - 80, f"Cliente: {datos['cliente']}")
+        pdf.drawString(50, height - 95, f"Modelo: {datos['modelo']}")
+        pdf.drawString(50, height - 110, f"Fecha: {datos['fecha']}")
+        pdf.drawString(50, height - 125, f"Costo Total: ${datos['costo_total']}")
+
+        # Tabla
+        y_start = height - 150
+        row_height = 20
+        x_positions = [50, 120, 220, 320, 400, 480]
+        headers = ["Fecha", "Cantidad", "Insumo", "Precio Unitario", "Precio Total", "Proveedor"]
+
+        def dibujar_fila(y, valores, bold=False):
+            pdf.setFont("Helvetica-Bold" if bold else "Helvetica", 10)
+            for i, val in enumerate(valores):
+                pdf.drawString(x_positions[i] + 2, y + 5, str(val))
+            pdf.line(x_positions[0], y, x_positions[-1] + 80, y)
+
+        y = y_start
+        dibujar_fila(y, headers, bold=True)
+        y -= row_height
+
+        for fila in datos['filas']:
+            if y < 80:
+                pdf.showPage()
+                y = height - 50
+                dibujar_fila(y, headers, bold=True)
+                y -= row_height
+            dibujar_fila(y, fila)
+            y -= row_height
+
+        pdf.line(x_positions[0], y + row_height, x_positions[-1] + 80, y + row_height)
+        pdf.showPage()
+        pdf.save()
+        buffer.close()
+        # Nadie ve un PDF a medio escribir: se publica con un rename atómico
+        os.replace(buffer.name, ruta)
+    except Exception:
+        buffer.close()
+        os.unlink(buffer.name)
+        raise
+
+    for vieja in glob.glob(os.path.join(os.path.dirname(ruta), f"tanque_{datos['id_tanque']}_*.pdf")):
+        if vieja != ruta:
+            try:
+                os.unlink(vieja)
+            except FileNotFoundError:  # otro worker ya la borró
+                pass
+
+
+def _ruta(id_tanque, version):
+    return os.path.join(_directorio(), f"tanque_{id_tanque}_v{version}.pdf")
+
+
+def solicitar_pdf(id_tanque):
+    """
+    Devuelve (estado, ruta) con estado 'listo', 'pendiente' o 'error'.
+    Si la versión actual del tanque no está en disco, encola su generación.
+    """
+    version = db.session.query(TanqueFabricado.version).filter_by(id_tanque=id_tanque).scalar()
+    if version is None:
+        abort(404)
+    ruta = _ruta(id_tanque, version)
+
+    if os.path.exists(ruta):
+        return 'listo', ruta
+
+    with _lock:
+        tarea = _pendientes.get(ruta)
+        if tarea is not None and tarea.done():
+            del _pendientes[ruta]
+            if tarea.exception() is not None:
+                current_app.logger.error("Error generando PDF del tanque %s: %s", id_tanque, tarea.exception())
+                return 'error', None
+            if os.path.exists(ruta):
+                return 'listo', ruta
+            tarea = None
+        if tarea is not None:
+            return 'pendiente', ruta
+
+    # No está en disco ni en cola: recién acá se cargan las líneas
+    # filter_by y no get(): get() devuelve el tanque ya cargado sin aplicar las relaciones
+    tanque = con_relaciones(TanqueFabricado.query, 'tanque_pdf').filter_by(id_tanque=id_tanque).first_or_404()
+    datos = _datos_tanque(tanque)
+    ruta = _ruta(id_tanque, tanque.version)
+    with _lock:
+        if ruta not in _pendientes:
+            _pendientes[ruta] = _executor.submit(_renderizar, datos, ruta)
+    return 'pendiente', ruta
+
+
+def invalidar_pdf(id_tanque):
+    """Borra los PDF generados del tanque (todas sus versiones)."""
+    for ruta in glob.glob(os.path.join(_directorio(), f"tanque_{id_tanque}_*.pdf")):
+        try:
+            os.unlink(ruta)
+        except FileNotFoundError:
+            pass
+
+
+# ---------- Renombres de insumos y proveedores ----------
+_A_BORRAR = 'pdf_tanques.a_borrar'
+
+
+@event.listens_for(db.session, 'after_flush')
+def _marcar_renombres(session, flush_context):
+    insumos, proveedores = set(), set()
+    for obj in session.dirty:
+        if isinstance(obj, (Insumo, Proveedor)) and inspect(obj).attrs.nombre.history.has_changes():
+            (insumos if isinstance(obj, Insumo) else proveedores).add(inspect(obj).identity[0])
+    if not insumos and not proveedores:
+        return
+    # dentro del flush todavía se puede consultar; en after_commit ya no
+    lineas = lineas_tanque(archivo=True)
+    de_proveedores = select(ProveedorInsumo.id_insumo).where(ProveedorInsumo.id_proveedor.in_(proveedores))
+    consulta = select(lineas.c.id_tanque).distinct().where(
+        or_(lineas.c.id_insumo.in_(insumos), lineas.c.id_insumo.in_(de_proveedores))
+    )
+    pendientes(session, _A_BORRAR, set).update(session.connection().execute(consulta).scalars())
+
+
+@despues_del_commit()
+def _borrar_renombrados(session):
+    for id_tanque in tomar(session, _A_BORRAR) or ():
+        invalidar_pdf(id_tanque)
@@ -0,0 +1,167 @@
+# services/pool.py
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context, jsonify
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+from models import db
+from services.metricas import ESPERA_POOL
+
+
+# ------------------------------------------------------------
+# Pool de conexiones configurable por entorno
+#   DB_POOL_SIZE (5)  DB_MAX_OVERFLOW (5)  DB_POOL_TIMEOUT (10 s)
+#   DB_POOL_RECYCLE (1800 s)  DB_POOL_PRE_PING (1)
+#   DB_STATEMENT_TIMEOUT_MS (30000): tope general de cada sentencia
+#   DB_QUERY_CACHE_SIZE (1200): caché de sentencias compiladas de SQLAlchemy
+#   DB_PGBOUNCER (0): detrás de PgBouncer (modo transaction) no se guarda
+#     pool propio (NullPool) y el tope se fija con SET LOCAL en cada
+#     transacción, porque PgBouncer no acepta parámetros de arranque.
+# Solo aplica a PostgreSQL; SQLite queda con lo de Flask-SQLAlchemy.
+# ------------------------------------------------------------
+def _entero(nombre, defecto):
+    return int(os.getenv(nombre, defecto))
+
+
+PGBOUNCER = os.getenv('DB_PGBOUNCER', '0') == '1'
+STATEMENT_TIMEOUT_MS = _entero('DB_STATEMENT_TIMEOUT_MS', 30000)
+
+# topes por tipo de ruta (ver limite_sentencias)
+TIMEOUT_REPORTES_MS = _entero('DB_TIMEOUT_REPORTES_MS', 10000)
+TIMEOUT_PDF_MS = _entero('DB_TIMEOUT_PDF_MS', 5000)
+TIMEOUT_EXPORTAR_MS = _entero('DB_TIMEOUT_EXPORTAR_MS', 120000)
+
+
+class PoolMedido(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout (incluye abrir conexiones nuevas)."""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            _medidas.registrar_timeout()
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            _medidas.registrar_espera(espera)
+            ESPERA_POOL.observe(espera)
+
+
+class _Medidas:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.timeouts = 0
+
+    def registrar_espera(self, segundos):
+        with self.lock:
+            self.checkouts += 1
+            self.espera_total += segundos
+            self.espera_maxima = max(self.espera_maxima, segundos)
+
+    def registrar_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+
+_medidas = _Medidas()
+
+
+def opciones_engine(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS según el entorno."""
+    if make_url(uri).get_backend_name() != 'postgresql':
+        return {}
+    opciones = {
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1',  # descarta conexiones muertas tras un reinicio
+        'query_cache_size': _entero('DB_QUERY_CACHE_SIZE', 1200),
+    }
+    if PGBOUNCER:
+        opciones['poolclass'] = NullPool
+        return opciones
+    opciones.update({
+        'poolclass': PoolMedido,
+        'pool_size': _entero('DB_POOL_SIZE', 5),
+        'max_overflow': _entero('DB_MAX_OVERFLOW', 5),
+        'pool_timeout': _entero('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': _entero('DB_POOL_RECYCLE', 1800),
+        'connect_args': {'options': f'-c statement_timeout={STATEMENT_TIMEOUT_MS}'},
+    })
+    return opciones
+
+
+# ---------- Tope por ruta ----------
+def _es_postgres(conexion):
+    return conexion.dialect.name == 'postgresql'
+
+
+def _fijar(conexion, limite):
+    # SET LOCAL dura lo que la transacción: la conexión vuelve al pool sin el cambio
+    conexion.execute(text(f"SET LOCAL statement_timeout = {int(limite)}"))
+
+
+@event.listens_for(db.session, 'after_begin')
+def _fijar_timeout(session, transaccion, conexion):
+    if not _es_postgres(conexion):
+        return
+    limite = g.get('statement_timeout_ms') if has_request_context() else None
+    if limite is None and PGBOUNCER:
+        limite = STATEMENT_TIMEOUT_MS
+    if limite is not None:
+        _fijar(conexion, limite)
+
+
+def limite_sentencias(ms):
+    """
+    Decorador de rutas: ninguna sentencia de la request puede tardar más de ms.
+    Si se corta, responde 503 en lugar de quedarse con la conexión.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            # para las transacciones que empiecen de acá en más (after_begin)...
+            g.statement_timeout_ms = ms
+            # ...y para la que ya está abierta: @login_required carga el usuario
+            # antes de llegar acá y esa consulta ya empezó la transacción
+            if db.session().in_transaction():
+                conexion = db.session.connection()
+                if _es_postgres(conexion):
+                    _fijar(conexion, ms)
+            try:
+                return vista(*args, **kwargs)
+            except exc.OperationalError as e:
+                if getattr(e.orig, 'pgcode', None) != '57014':  # query_canceled
+                    raise
+                db.session.rollback()
+                return jsonify({'error': 'La consulta tardó demasiado, intente con un rango menor'}), 503
+        return envoltura
+    return decorador
+
+
+# ---------- Telemetría ----------
+def estadisticas_pool():
+    """Estado del pool de ESTE proceso (cada worker tiene el suyo)."""
+    pool = db.engine.pool
+    datos = {'pid': os.getpid(), 'clase': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        datos.update({
+            'tamano': pool.size(),
+            'en_uso': pool.checkedout(),
+            'libres': pool.checkedin(),
+            'overflow': pool.overflow(),
+            'maximo': pool.size() + pool._max_overflow,
+        })
+    with _medidas.lock:
+        datos.update({
+            'checkouts': _medidas.checkouts,
+            'espera_promedio_ms': round(_medidas.espera_total / _medidas.checkouts * 1000, 3) if _medidas.checkouts else 0,
+            'espera_maxima_ms': round(_medidas.espera_maxima * 1000, 3),
+            'timeouts': _medidas.timeouts,
+        })
+    return datos
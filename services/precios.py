@@ -0,0 +1,293 @@
+# services/precios.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, event, func, inspect, insert, literal, not_, select
+from models import db, Compra, HistorialPrecio, Insumo, MejorPrecio, Proveedor, ProveedorInsumo
+from services.stock import decimal
+from services.transacciones import antes_del_commit, pendientes, tomar
+
+
+# ------------------------------------------------------------
+# Historial de precios por proveedor-insumo
+#
+# historial_precios guarda los CAMBIOS de precio: cada fila es el precio
+# que rige desde su fecha hasta la fila siguiente. Una compra al mismo
+# precio no agrega nada. Las consultas por rango usan el índice
+# (id_proveedor_insumo, fecha) y el agrupado en velas (apertura, máximo,
+# mínimo, cierre) se hace sobre esos pocos puntos.
+# ------------------------------------------------------------
+INTERVALOS = ('dia', 'semana', 'mes')
+MAX_VELAS = 5000
+
+_CLAVE = 'mejores_precios'
+
+
+def _como_fecha_hora(valor):
+    return valor if isinstance(valor, datetime) else datetime.combine(valor, datetime.min.time())
+
+
+def cambiar_precio(proveedor_insumo, precio, fecha=None):
+    """
+    Asienta el precio en el historial a la fecha de la compra (ahora si no se
+    indica) si difiere del que regía ese día; siempre, si la asociación es
+    nueva. precio_actual solo cambia si la fecha no es anterior al último
+    punto del historial: una compra vieja cargada tarde no pisa un precio
+    más nuevo (igual que la importación). Devuelve True si lo asentó.
+    """
+    precio = decimal(precio)
+    ahora = datetime.utcnow()
+    fecha = _como_fecha_hora(fecha) if fecha else ahora
+    if fecha.date() == ahora.date():
+        fecha = ahora  # una compra de hoy (solo fecha) va después de los cambios de hoy
+
+    if proveedor_insumo.id_proveedor_insumo is None:
+        proveedor_insumo.precio_actual = precio
+        db.session.add(proveedor_insumo)
+        db.session.flush()  # para tener id_proveedor_insumo
+    else:
+        h = HistorialPrecio.__table__
+        ultimo = db.session.execute(
+            select(h.c.fecha).where(h.c.id_proveedor_insumo == proveedor_insumo.id_proveedor_insumo)
+            .order_by(h.c.fecha.desc(), h.c.id_historial.desc()).limit(1)
+        ).scalar()
+        if ultimo is None or fecha >= ultimo:
+            if decimal(proveedor_insumo.precio_actual) == precio:
+                return False
+            proveedor_insumo.precio_actual = precio
+        else:
+            vigente = db.session.execute(
+                select(h.c.precio)
+                .where(h.c.id_proveedor_insumo == proveedor_insumo.id_proveedor_insumo, h.c.fecha <= fecha)
+                .order_by(h.c.fecha.desc(), h.c.id_historial.desc()).limit(1)
+            ).scalar()
+            if vigente is not None and decimal(vigente) == precio:
+                return False
+    db.session.add(HistorialPrecio(
+        id_proveedor_insumo=proveedor_insumo.id_proveedor_insumo,
+        precio=precio,
+        fecha=fecha
+    ))
+    return True
+
+
+# ---------- Consultas ----------
+def puntos(id_proveedor_insumo, desde=None, hasta=None):
+    """
+    Cambios de precio en [desde, hasta] (fechas, inclusive). Devuelve
+    (precio vigente al empezar el rango o None, [(fecha, precio)]).
+    """
+    h = HistorialPrecio.__table__
+    orden = (h.c.fecha, h.c.id_historial)
+    consulta = select(h.c.fecha, h.c.precio).where(h.c.id_proveedor_insumo == id_proveedor_insumo)
+
+    previo = None
+    if desde is not None:
+        inicio = _como_fecha_hora(desde)
+        previo = db.session.execute(
+            consulta.where(h.c.fecha < inicio).order_by(*(c.desc() for c in orden)).limit(1)
+        ).first()
+        consulta = consulta.where(h.c.fecha >= inicio)
+    if hasta is not None:
+        consulta = consulta.where(h.c.fecha < _como_fecha_hora(hasta) + timedelta(days=1))
+
+    filas = [(fecha, decimal(precio)) for fecha, precio in db.session.execute(consulta.order_by(*orden))]
+    return (decimal(previo.precio) if previo else None), filas
+
+
+def _inicio(fecha, intervalo):
+    dia = fecha.date() if isinstance(fecha, datetime) else fecha
+    if intervalo == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if intervalo == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+
+def _siguiente(inicio, intervalo):
+    if intervalo == 'semana':
+        return inicio + timedelta(days=7)
+    if intervalo == 'mes':
+        return (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return inicio + timedelta(days=1)
+
+
+def cantidad_velas(desde, hasta, intervalo):
+    """Cuántas velas tiene el rango (para rechazar pedidos desproporcionados)."""
+    dias = (hasta - desde).days + 1
+    return {'dia': dias, 'semana': dias // 7 + 1, 'mes': dias // 28 + 1}[intervalo]
+
+
+def velas(previo, cambios, intervalo, desde, hasta):
+    """
+    Agrupa la serie escalonada en velas por día, semana o mes entre desde y
+    hasta (fechas). Un período sin cambios repite el precio vigente.
+    """
+    assert intervalo in INTERVALOS, intervalo
+    resultado = []
+    vigente = previo
+    i = 0
+    periodo = _inicio(desde, intervalo)
+    while periodo <= hasta:
+        fin = _como_fecha_hora(_siguiente(periodo, intervalo))
+        apertura, maximo, minimo, n = vigente, vigente, vigente, 0
+        while i < len(cambios) and cambios[i][0] < fin:
+            precio = cambios[i][1]
+            if apertura is None:
+                apertura = maximo = minimo = precio
+            maximo, minimo = max(maximo, precio), min(minimo, precio)
+            n += precio != vigente  # filas repetidas (sin compactar) no cuentan
+            vigente = precio
+            i += 1
+        if apertura is not None:
+            anterior = resultado[-1]['cierre'] if resultado else apertura
+            resultado.append({
+                'fecha': periodo.isoformat(),
+                'apertura': float(apertura),
+                'maximo': float(maximo),
+                'minimo': float(minimo),
+                'cierre': float(vigente),
+                'cambios': n,
+                'variacion_pct': variacion(anterior, vigente),
+            })
+        periodo = _siguiente(periodo, intervalo)
+    return resultado
+
+
+def variacion(inicial, final):
+    """Variación porcentual entre dos precios (None si el inicial es 0 o no existe)."""
+    if inicial is None or final is None or not inicial:
+        return None
+    return round(float((decimal(final) - decimal(inicial)) / decimal(inicial) * 100), 2)
+
+
+# ------------------------------------------------------------
+# Compactación
+# ------------------------------------------------------------
+def compactar():
+    """
+    Pliega las corridas de precios repetidos: borra cada fila cuyo precio es
+    igual al de la fila anterior de la misma asociación (queda la primera,
+    que marca desde cuándo rige). Las filas revisadas o confirmadas no se
+    tocan. Devuelve las filas borradas.
+    """
+    h = HistorialPrecio.__table__
+    anterior = func.lag(h.c.precio).over(
+        partition_by=h.c.id_proveedor_insumo, order_by=(h.c.fecha, h.c.id_historial)
+    )
+    serie = select(h.c.id_historial, h.c.precio, h.c.revisado, h.c.confirmado, anterior.label('anterior')).subquery()
+    repetidas = select(serie.c.id_historial).where(and_(
+        serie.c.anterior == serie.c.precio,
+        not_(func.coalesce(serie.c.revisado, False)),
+        not_(func.coalesce(serie.c.confirmado, False)),
+    ))
+    borradas = db.session.execute(
+        delete(h).where(h.c.id_historial.in_(repetidas)).execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return borradas
+
+
+# ------------------------------------------------------------
+# Mejores precios por insumo
+#
+# mejores_precios tiene una fila por insumo con el proveedor más barato,
+# el rango de precios entre proveedores y la última compra. Se arma con
+# una sola consulta de ventanas sobre proveedor_insumo; al hacer commit se
+# recalculan solo los insumos cuyos precios o compras cambiaron.
+# ------------------------------------------------------------
+def marcar_insumos(session, ids_insumo):
+    """Agrega insumos a recalcular en mejores_precios al hacer commit."""
+    pendientes(session, _CLAVE, set).update(ids_insumo)
+
+
+def _cambio(obj, *atributos):
+    estado = inspect(obj)
+    return any(estado.attrs[a].history.has_changes() for a in atributos)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _marcar_cambios(session, flush_context):
+    ids = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (ProveedorInsumo, Compra)):
+            ids.add(obj.id_insumo)
+    for obj in session.dirty:
+        if isinstance(obj, ProveedorInsumo) and _cambio(obj, 'precio_actual', 'id_insumo', 'id_proveedor'):
+            ids.add(obj.id_insumo)
+            ids.update(inspect(obj).attrs.id_insumo.history.deleted)
+        elif isinstance(obj, Compra) and _cambio(obj, 'fecha', 'id_insumo'):
+            ids.add(obj.id_insumo)
+            ids.update(inspect(obj).attrs.id_insumo.history.deleted)
+    ids.discard(None)
+    if ids:
+        marcar_insumos(session, ids)
+
+
+def _consulta_mejores(ids_insumo=None):
+    """Una fila por insumo: el proveedor más barato y los agregados de la ventana del insumo."""
+    pi = ProveedorInsumo.__table__
+    compras = Compra.__table__
+    por_insumo = {'partition_by': pi.c.id_insumo}
+    ranking = select(
+        pi.c.id_insumo, pi.c.id_proveedor, pi.c.id_proveedor_insumo, pi.c.precio_actual,
+        func.row_number().over(order_by=(pi.c.precio_actual, pi.c.id_proveedor_insumo), **por_insumo).label('orden'),
+        func.max(pi.c.precio_actual).over(**por_insumo).label('maximo'),
+        func.avg(pi.c.precio_actual).over(**por_insumo).label('promedio'),
+        func.count().over(**por_insumo).label('proveedores'),
+    )
+    if ids_insumo is not None:
+        ranking = ranking.where(pi.c.id_insumo.in_(ids_insumo))
+    ranking = ranking.subquery()
+    ultima_compra = select(func.max(compras.c.fecha)).where(compras.c.id_insumo == ranking.c.id_insumo).scalar_subquery()
+    return select(
+        ranking.c.id_insumo, ranking.c.id_proveedor, ranking.c.id_proveedor_insumo, ranking.c.precio_actual,
+        ranking.c.maximo, ranking.c.promedio, ranking.c.proveedores, ultima_compra, literal(datetime.utcnow())
+    ).where(ranking.c.orden == 1)
+
+
+def refrescar_mejores(ids_insumo=None):
+    """Recalcula mejores_precios de esos insumos (todos si no se indican). Devuelve las filas escritas."""
+    tabla = MejorPrecio.__table__
+    borrar = delete(tabla)
+    if ids_insumo is not None:
+        ids_insumo = sorted(ids_insumo)  # en orden, para no bloquearse cruzado con otra transacción
+        borrar = borrar.where(tabla.c.id_insumo.in_(ids_insumo))
+    db.session.execute(borrar)
+    columnas = ['id_insumo', 'id_proveedor', 'id_proveedor_insumo', 'precio_minimo', 'precio_maximo',
+                'precio_promedio', 'proveedores', 'ultima_compra', 'actualizado']
+    return db.session.execute(insert(tabla).from_select(columnas, _consulta_mejores(ids_insumo))).rowcount
+
+
+@antes_del_commit(prioridad=600)
+def _refrescar_marcados(session):
+    session.flush()
+    ids = tomar(session, _CLAVE)
+    if ids:
+        refrescar_mejores(ids)
+
+
+def reconstruir_mejores():
+    """Rearma mejores_precios completa. Devuelve las filas escritas."""
+    filas = refrescar_mejores()
+    tomar(db.session, _CLAVE)
+    db.session.commit()
+    return filas
+
+
+def inicializar_mejores_precios():
+    """Primera vez: si hay proveedores-insumo y la tabla está vacía, la arma."""
+    if db.session.query(MejorPrecio.id_insumo).first() is None \
+            and db.session.query(ProveedorInsumo.id_proveedor_insumo).first() is not None:
+        return reconstruir_mejores()
+    return 0
+
+
+def mejores_precios():
+    """Toda la matriz con los nombres del insumo y del proveedor, en una consulta."""
+    filas = db.session.execute(
+        select(MejorPrecio, Insumo.nombre, Proveedor.nombre)
+        .join(Insumo, Insumo.id_insumo == MejorPrecio.id_insumo)
+        .join(Proveedor, Proveedor.id_proveedor == MejorPrecio.id_proveedor)
+        .order_by(Insumo.nombre, MejorPrecio.id_insumo)
+    ).all()
+    return [dict(m.to_dict(), insumo=insumo, proveedor=proveedor) for m, insumo, proveedor in filas]
@@ -0,0 +1,259 @@
+# services/reportes.py
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import event, func, inspect, select
+from models import db, Compra, TanqueInsumo, TanqueFabricado, AlertaStock, ReporteRollup
+from services.stock import decimal
+from services.transacciones import antes_del_commit, pendientes, tomar
+from services import archivo
+
+
+# ------------------------------------------------------------
+# Agregados de reportes (reportes_rollup)
+#
+# Una fila por (periodo, fecha, dimension, clave) con las métricas
+# sumadas. Cada transacción junta en session.info los cambios de compras,
+# salidas, tanques y alertas que hizo, y al hacer commit los suma con un
+# único INSERT ... ON CONFLICT DO UPDATE. Los reportes leen solo esta
+# tabla, así no dependen del tamaño del historial.
+# ------------------------------------------------------------
+PERIODOS = ('dia', 'mes')
+DIMENSIONES = ('global', 'insumo', 'proveedor', 'modelo')
+METRICAS = ('gasto_compras', 'cantidad_comprada', 'cantidad_consumida', 'costo_tanques', 'alertas', 'tanques')
+
+_CLAVE = 'reportes_rollup'
+_FILAS_POR_INSERT = 500
+
+
+def _dia(valor):
+    if valor is None:
+        return datetime.utcnow().date()
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+def _acumulador(session):
+    # (tipo, dia, a, b) -> [valor1, valor2]; ver registrar_*
+    return pendientes(session, _CLAVE, lambda: defaultdict(lambda: [Decimal('0'), Decimal('0')]))
+
+
+def registrar_compra(session, fecha, id_proveedor, id_insumo, total, cantidad, signo=1):
+    fila = _acumulador(session)[('compra', _dia(fecha), id_proveedor, id_insumo)]
+    fila[0] += signo * decimal(total or 0)
+    fila[1] += signo * decimal(cantidad or 0)
+
+
+def registrar_salida(session, fecha, id_tanque, id_insumo, cantidad, costo_unitario, signo=1):
+    cantidad = decimal(cantidad or 0)
+    fila = _acumulador(session)[('salida', _dia(fecha), id_tanque, id_insumo)]
+    fila[0] += signo * cantidad
+    fila[1] += signo * cantidad * decimal(costo_unitario or 0)
+
+
+def registrar_tanque(session, fecha, id_tanque, signo=1):
+    _acumulador(session)[('tanque', _dia(fecha), id_tanque, None)][0] += signo
+
+
+def registrar_alerta(session, fecha, id_insumo, signo=1):
+    _acumulador(session)[('alerta', _dia(fecha), None, id_insumo)][0] += signo
+
+
+# ---------- Cambios hechos con el ORM ----------
+def _valores(obj, atributos):
+    """(viejos, nuevos) de los atributos de un objeto modificado; None si no cambió ninguno."""
+    estado = inspect(obj)
+    viejos, nuevos, cambio = [], [], False
+    for atributo in atributos:
+        historia = estado.attrs[atributo].history
+        actual = getattr(obj, atributo)
+        if historia.added and historia.deleted:
+            cambio = True
+            viejos.append(historia.deleted[0])
+        else:
+            viejos.append(actual)
+        nuevos.append(actual)
+    return (viejos, nuevos) if cambio else None
+
+
+def _registrar_objeto(session, obj, signo, valores=None):
+    if isinstance(obj, Compra):
+        v = valores or [obj.fecha, obj.id_proveedor, obj.id_insumo, obj.total, obj.cantidad]
+        registrar_compra(session, *v, signo=signo)
+    elif isinstance(obj, TanqueInsumo):
+        v = valores or [obj.fecha_registro, obj.id_tanque, obj.id_insumo, obj.cantidad_usada, obj.costo_unitario]
+        registrar_salida(session, *v, signo=signo)
+    elif isinstance(obj, TanqueFabricado):
+        registrar_tanque(session, (valores or [obj.fecha])[0], obj.id_tanque, signo=signo)
+    elif isinstance(obj, AlertaStock):
+        registrar_alerta(session, obj.fecha, obj.id_insumo, signo=signo)
+
+
+_ATRIBUTOS = {
+    Compra: ('fecha', 'id_proveedor', 'id_insumo', 'total', 'cantidad'),
+    TanqueInsumo: ('fecha_registro', 'id_tanque', 'id_insumo', 'cantidad_usada', 'costo_unitario'),
+    TanqueFabricado: ('fecha',),
+}
+
+
+@event.listens_for(db.session, 'after_flush')
+def _registrar_cambios(session, flush_context):
+    for obj in session.new:
+        _registrar_objeto(session, obj, 1)
+    for obj in session.deleted:
+        _registrar_objeto(session, obj, -1)
+    for obj in session.dirty:
+        atributos = _ATRIBUTOS.get(type(obj))
+        cambios = atributos and _valores(obj, atributos)
+        if cambios:
+            _registrar_objeto(session, obj, -1, cambios[0])
+            _registrar_objeto(session, obj, 1, cambios[1])
+
+
+# ---------- Volcado a reportes_rollup ----------
+def _expandir(hechos):
+    """
+    hechos: iterable de (tipo, dia, a, b, valor1, valor2) ya resueltos
+      compra: a=id_proveedor, b=id_insumo, valor1=total,    valor2=cantidad
+      salida: a=modelo,       b=id_insumo, valor1=cantidad, valor2=costo
+      tanque: a=modelo,                    valor1=cantidad de tanques
+      alerta:                 b=id_insumo, valor1=cantidad de alertas
+    Devuelve {(periodo, fecha, dimension, clave): {metrica: delta}}.
+    """
+    deltas = defaultdict(lambda: dict.fromkeys(METRICAS, 0))
+    for tipo, dia, a, b, v1, v2 in hechos:
+        if tipo == 'compra':
+            destinos = (('global', ''), ('proveedor', str(a)), ('insumo', str(b)))
+            metricas = (('gasto_compras', v1), ('cantidad_comprada', v2))
+        elif tipo == 'salida':
+            destinos = (('global', ''), ('modelo', a or ''), ('insumo', str(b)))
+            metricas = (('cantidad_consumida', v1), ('costo_tanques', v2))
+        elif tipo == 'tanque':
+            destinos = (('global', ''), ('modelo', a or ''))
+            metricas = (('tanques', int(v1)),)
+        else:
+            destinos = (('global', ''), ('insumo', str(b)))
+            metricas = (('alertas', int(v1)),)
+
+        for periodo, fecha in (('dia', dia), ('mes', dia.replace(day=1))):
+            for dimension, clave in destinos:
+                fila = deltas[(periodo, fecha, dimension, clave)]
+                for metrica, valor in metricas:
+                    fila[metrica] += valor
+    return deltas
+
+
+def _sumar(deltas):
+    """INSERT ... ON CONFLICT DO UPDATE SET m = m + excluded.m, en orden de clave."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    filas = [
+        dict(zip(('periodo', 'fecha', 'dimension', 'clave'), clave), **metricas)
+        for clave, metricas in sorted(deltas.items())
+        if any(metricas.values())
+    ]
+    tabla = ReporteRollup.__table__
+    sentencia = insert(tabla)
+    sentencia = sentencia.on_conflict_do_update(
+        index_elements=['periodo', 'fecha', 'dimension', 'clave'],
+        set_={m: tabla.c[m] + sentencia.excluded[m] for m in METRICAS}
+    )
+    # una sola sentencia compilada (queda en la caché de SQLAlchemy) y
+    # executemany por tandas; un VALUES distinto por tanda se recompila cada vez
+    for i in range(0, len(filas), _FILAS_POR_INSERT):
+        db.session.execute(sentencia, filas[i:i + _FILAS_POR_INSERT])
+    return len(filas)
+
+
+@antes_del_commit(prioridad=900)  # al final: otros servicios pueden crear alertas antes
+def _volcar(session):
+    session.flush()
+    acumulado = tomar(session, _CLAVE)
+    if not acumulado:
+        return
+
+    ids_tanque = {a for (tipo, _, a, _) in acumulado if tipo in ('salida', 'tanque')}
+    modelos = dict(session.execute(
+        select(TanqueFabricado.id_tanque, TanqueFabricado.modelo).where(TanqueFabricado.id_tanque.in_(ids_tanque))
+    ).all()) if ids_tanque else {}
+
+    hechos = []
+    for (tipo, dia, a, b), (v1, v2) in acumulado.items():
+        if tipo in ('salida', 'tanque'):
+            a = modelos.get(a)
+        hechos.append((tipo, dia, a, b, v1, v2))
+    _sumar(_expandir(hechos))
+
+
+# ---------- Reconstrucción ----------
+def _hechos_historicos():
+    compras = select(
+        Compra.fecha, Compra.id_proveedor, Compra.id_insumo,
+        func.sum(Compra.total), func.sum(Compra.cantidad)
+    ).group_by(Compra.fecha, Compra.id_proveedor, Compra.id_insumo)
+    for fecha, id_proveedor, id_insumo, total, cantidad in db.session.execute(compras):
+        yield ('compra', _dia(fecha), id_proveedor, id_insumo, decimal(total or 0), decimal(cantidad or 0))
+
+    # líneas y alertas con las archivadas: los agregados cubren toda la historia
+    lineas = archivo.lineas_tanque(archivo=True).c
+    dia_salida = func.date(lineas.fecha_registro, type_=db.Date)
+    salidas = select(
+        dia_salida, TanqueFabricado.modelo, lineas.id_insumo,
+        func.sum(lineas.cantidad_usada), func.sum(lineas.cantidad_usada * lineas.costo_unitario)
+    ).join(TanqueFabricado, TanqueFabricado.id_tanque == lineas.id_tanque)\
+     .group_by(dia_salida, TanqueFabricado.modelo, lineas.id_insumo)
+    for dia, modelo, id_insumo, cantidad, costo in db.session.execute(salidas):
+        yield ('salida', _dia(dia), modelo, id_insumo, decimal(cantidad or 0), decimal(costo or 0))
+
+    tanques = select(TanqueFabricado.fecha, TanqueFabricado.modelo, func.count())\
+        .group_by(TanqueFabricado.fecha, TanqueFabricado.modelo)
+    for fecha, modelo, cantidad in db.session.execute(tanques):
+        yield ('tanque', _dia(fecha), modelo, None, cantidad, 0)
+
+    todas = archivo.alertas(archivo=True).c
+    dia_alerta = func.date(todas.fecha, type_=db.Date)
+    alertas = select(dia_alerta, todas.id_insumo, func.count()).group_by(dia_alerta, todas.id_insumo)
+    for dia, id_insumo, cantidad in db.session.execute(alertas):
+        yield ('alerta', _dia(dia), None, id_insumo, cantidad, 0)
+
+
+def reconstruir_rollups():
+    """Borra reportes_rollup y la vuelve a calcular desde las tablas. Devuelve las filas escritas."""
+    db.session.query(ReporteRollup).delete()
+    filas = _sumar(_expandir(_hechos_historicos()))
+    tomar(db.session, _CLAVE)  # lo anterior ya está contado en la reconstrucción
+    db.session.commit()
+    return filas
+
+
+def inicializar_rollups():
+    """Primera vez: si hay datos y la tabla de agregados está vacía, la arma."""
+    if db.session.query(ReporteRollup.periodo).first() is None and db.session.query(Compra.id_compra).first() is not None:
+        return reconstruir_rollups()
+    return 0
+
+
+# ---------- Consultas ----------
+def totales():
+    """Totales históricos globales sumando las filas mensuales."""
+    fila = db.session.query(*[func.coalesce(func.sum(getattr(ReporteRollup, m)), 0) for m in METRICAS])\
+        .filter(ReporteRollup.periodo == 'mes', ReporteRollup.dimension == 'global').one()
+    return dict(zip(METRICAS, fila))
+
+
+def series(periodo, dimension, clave=None, desde=None, hasta=None):
+    consulta = ReporteRollup.query.filter_by(periodo=periodo, dimension=dimension)
+    if clave is not None:
+        consulta = consulta.filter_by(clave=clave)
+    if desde:
+        consulta = consulta.filter(ReporteRollup.fecha >= desde)
+    if hasta:
+        consulta = consulta.filter(ReporteRollup.fecha <= hasta)
+    return consulta.order_by(ReporteRollup.fecha, ReporteRollup.clave).all()
@@ -0,0 +1,246 @@
+# services/respaldos.py
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine, func, inspect, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from models import db
+
+
+# ------------------------------------------------------------
+# Respaldos de PostgreSQL
+#
+# pg_dump en formato directorio: un archivo comprimido por tabla, escrito
+# por varios procesos en paralelo (-j) y comprimido a medida que se vuelca.
+# Junto al volcado queda manifiesto.json con el sha256 y el tamaño de cada
+# archivo y las filas de cada tabla de models.py, contadas dentro del mismo
+# snapshot que usa pg_dump (pg_export_snapshot), así coinciden exactamente.
+#
+# verificar() comprueba las sumas y además restaura el volcado en una base
+# temporal del mismo servidor, cuenta las filas y la borra.
+#
+# Se conecta con DATABASE_URL (variables PG* para pg_dump/pg_restore, la
+# contraseña nunca va en la línea de comandos).
+# ------------------------------------------------------------
+DIRECTORIO = os.getenv('BACKUP_DIR', './backups')
+JOBS = int(os.getenv('BACKUP_JOBS', str(min(4, os.cpu_count() or 1))))
+COMPRESION = int(os.getenv('BACKUP_COMPRESION', '6'))  # gzip 0-9
+CONSERVAR = int(os.getenv('BACKUP_CONSERVAR', '7'))
+
+MANIFIESTO = 'manifiesto.json'
+_BLOQUE = 1024 * 1024
+
+
+class ErrorRespaldo(Exception):
+    pass
+
+
+# ---------- Conexión ----------
+def _url():
+    url = make_url(db.engine.url)
+    if url.get_backend_name() != 'postgresql':
+        raise ErrorRespaldo(f"Los respaldos son solo para PostgreSQL (DATABASE_URL es {url.get_backend_name()})")
+    return url
+
+
+@contextmanager
+def _motor(url, base=None):
+    # Conexión propia, sin el statement_timeout de los workers: los conteos
+    # y la transacción que sostiene el snapshot pueden durar lo que el volcado
+    motor = create_engine(
+        url.set(database=base) if base else url, poolclass=NullPool,
+        connect_args={'options': '-c statement_timeout=0 -c idle_in_transaction_session_timeout=0'}
+    )
+    try:
+        yield motor
+    finally:
+        motor.dispose()
+
+
+def _entorno(url, base=None):
+    entorno = dict(os.environ)
+    for variable, valor in (('PGHOST', url.host), ('PGPORT', url.port), ('PGUSER', url.username),
+                            ('PGPASSWORD', url.password), ('PGDATABASE', base or url.database)):
+        if valor is not None:
+            entorno[variable] = str(valor)
+    return entorno
+
+
+def _ejecutar(argumentos, entorno):
+    if shutil.which(argumentos[0]) is None:
+        raise ErrorRespaldo(f"No se encontró {argumentos[0]} (instalar el cliente de PostgreSQL)")
+    proceso = subprocess.run(argumentos, env=entorno, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        raise ErrorRespaldo(f"{argumentos[0]} terminó con código {proceso.returncode}: {proceso.stderr.strip()}")
+    return proceso.stdout
+
+
+# ---------- Conteos y sumas ----------
+def _conteos(conexion):
+    """Filas de cada tabla de models.py que exista en la base."""
+    existentes = set(inspect(conexion).get_table_names())
+    return {
+        tabla.name: conexion.execute(select(func.count()).select_from(tabla)).scalar()
+        for tabla in db.metadata.sorted_tables if tabla.name in existentes
+    }
+
+
+def _sha256(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(_BLOQUE), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _sumas(directorio, jobs=JOBS):
+    """{archivo: {bytes, sha256}} de todo el volcado (menos el manifiesto), en paralelo."""
+    directorio = Path(directorio)
+    archivos = sorted(p for p in directorio.rglob('*') if p.is_file() and p.name != MANIFIESTO)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as hilos:  # hashlib suelta el GIL
+        sumas = list(hilos.map(_sha256, archivos))
+    return {
+        str(p.relative_to(directorio)): {'bytes': p.stat().st_size, 'sha256': s}
+        for p, s in zip(archivos, sumas)
+    }
+
+
+def leer_manifiesto(ruta):
+    try:
+        with open(Path(ruta) / MANIFIESTO, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise ErrorRespaldo(f"{ruta}: manifiesto ilegible ({e})")
+
+
+# ---------- Crear ----------
+def crear(directorio=DIRECTORIO, jobs=JOBS, compresion=COMPRESION):
+    """Vuelca la base en un subdirectorio nuevo de `directorio`. Devuelve (ruta, manifiesto)."""
+    url = _url()
+    inicio = time.perf_counter()
+    ahora = datetime.now()
+    destino = Path(directorio) / f"respaldo_{ahora:%Y-%m-%d_%H-%M-%S}"
+    if destino.exists():
+        raise ErrorRespaldo(f"{destino} ya existe")
+    Path(directorio).mkdir(parents=True, exist_ok=True)
+
+    try:
+        with _motor(url) as motor, motor.connect() as conexion:
+            conexion = conexion.execution_options(isolation_level='REPEATABLE READ')
+            with conexion.begin():
+                # pg_dump usa el mismo snapshot mientras esta transacción siga abierta
+                snapshot = conexion.execute(text('SELECT pg_export_snapshot()')).scalar()
+                tablas = _conteos(conexion)
+                servidor = conexion.execute(text('SHOW server_version')).scalar()
+                _ejecutar([
+                    'pg_dump', '--format=directory', f'--jobs={jobs}', f'--compress={compresion}',
+                    f'--snapshot={snapshot}', '--no-owner', '--no-privileges', f'--file={destino}'
+                ], _entorno(url))
+        version_pg_dump = _ejecutar(['pg_dump', '--version'], _entorno(url)).strip()
+
+        manifiesto = {
+            'fecha': ahora.isoformat(timespec='seconds'),
+            'base': url.database,
+            'servidor': servidor,
+            'pg_dump': version_pg_dump,
+            'jobs': jobs,
+            'compresion': compresion,
+            'duracion_s': round(time.perf_counter() - inicio, 1),
+            'tablas': tablas,
+            'archivos': _sumas(destino, jobs),
+        }
+        temporal = destino / (MANIFIESTO + '.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, indent=2, sort_keys=True)
+        os.replace(temporal, destino / MANIFIESTO)  # sin manifiesto el respaldo no cuenta como completo
+    except BaseException:
+        shutil.rmtree(destino, ignore_errors=True)
+        raise
+    return destino, manifiesto
+
+
+# ---------- Verificar ----------
+def verificar_archivos(ruta, manifiesto=None, jobs=JOBS):
+    """Compara el volcado con su manifiesto. Devuelve la lista de problemas (vacía si está bien)."""
+    manifiesto = manifiesto or leer_manifiesto(ruta)
+    esperados = manifiesto['archivos']
+    actuales = _sumas(ruta, jobs)
+    problemas = [f"falta {a}" for a in sorted(esperados.keys() - actuales.keys())]
+    problemas += [f"sobra {a}" for a in sorted(actuales.keys() - esperados.keys())]
+    for archivo in sorted(esperados.keys() & actuales.keys()):
+        if actuales[archivo]['bytes'] != esperados[archivo]['bytes']:
+            problemas.append(f"{archivo}: tamaño {actuales[archivo]['bytes']} (esperado {esperados[archivo]['bytes']})")
+        elif actuales[archivo]['sha256'] != esperados[archivo]['sha256']:
+            problemas.append(f"{archivo}: sha256 distinto")
+    return problemas
+
+
+def verificar(ruta, jobs=JOBS, restaurar=True):
+    """
+    Verifica las sumas del volcado y, con restaurar=True, lo restaura en una
+    base temporal y compara las filas por tabla con el manifiesto.
+    Devuelve {'ok', 'archivos': [problemas], 'tablas': [{tabla, esperado, restaurado}], 'duracion_s'}.
+    """
+    inicio = time.perf_counter()
+    manifiesto = leer_manifiesto(ruta)
+    resultado = {'archivos': verificar_archivos(ruta, manifiesto, jobs), 'tablas': []}
+    if restaurar and not resultado['archivos']:
+        resultado['tablas'] = _restaurar_y_contar(ruta, manifiesto['tablas'], jobs)
+    resultado['ok'] = not resultado['archivos'] and all(t['esperado'] == t['restaurado'] for t in resultado['tablas'])
+    resultado['duracion_s'] = round(time.perf_counter() - inicio, 1)
+    return resultado
+
+
+def _restaurar_y_contar(ruta, esperadas, jobs):
+    url = _url()
+    temporal = f"verificacion_{datetime.now():%Y%m%d%H%M%S}_{os.getpid()}"
+    with _motor(url) as motor:
+        with motor.connect().execution_options(isolation_level='AUTOCOMMIT') as conexion:
+            conexion.execute(text(f'CREATE DATABASE "{temporal}" TEMPLATE template0'))
+        try:
+            _ejecutar([
+                'pg_restore', f'--dbname={temporal}', f'--jobs={jobs}',
+                '--no-owner', '--no-privileges', '--exit-on-error', str(ruta)
+            ], _entorno(url, temporal))
+            with _motor(url, temporal) as restaurada, restaurada.connect() as conexion:
+                restauradas = _conteos(conexion)
+        finally:
+            with motor.connect().execution_options(isolation_level='AUTOCOMMIT') as conexion:
+                conexion.execute(text(f'DROP DATABASE IF EXISTS "{temporal}"'))
+    return [
+        {'tabla': tabla, 'esperado': esperadas.get(tabla), 'restaurado': restauradas.get(tabla)}
+        for tabla in sorted(esperadas.keys() | restauradas.keys())
+    ]
+
+
+# ---------- Retención ----------
+def listar(directorio=DIRECTORIO):
+    """[(ruta, manifiesto)] de los respaldos completos, del más nuevo al más viejo."""
+    base = Path(directorio)
+    if not base.is_dir():
+        return []
+    respaldos = []
+    for ruta in base.iterdir():
+        if (ruta / MANIFIESTO).is_file():
+            try:
+                respaldos.append((ruta, leer_manifiesto(ruta)))
+            except ErrorRespaldo:
+                continue
+    return sorted(respaldos, key=lambda r: r[1]['fecha'], reverse=True)
+
+
+def podar(directorio=DIRECTORIO, conservar=CONSERVAR):
+    """Borra los respaldos completos más viejos, dejando `conservar`. Devuelve las rutas borradas."""
+    borrar = [ruta for ruta, _ in listar(directorio)[max(conservar, 1):]]
+    for ruta in borrar:
+        shutil.rmtree(ruta)
+    return borrar
@@ -0,0 +1,70 @@
+# services/serializers.py
+from sqlalchemy.orm import joinedload, selectinload, configure_mappers
+from models import Compra, Insumo, Proveedor, ProveedorInsumo, TanqueFabricado, TanqueInsumo, TanqueInsumoArchivo, AlertaStock
+
+
+# ------------------------------------------------------------
+# Relaciones que necesita cada serializador.
+# Cada endpoint pide un "perfil" y las relaciones se cargan con
+# joinedload / selectinload, así un listado cuesta siempre la misma
+# cantidad de consultas sin importar cuántas filas devuelva.
+# ------------------------------------------------------------
+_RELACIONES = None
+
+
+def _relaciones():
+    global _RELACIONES
+    if _RELACIONES is None:
+        # Las relaciones definidas con backref existen recién después de configurar los mappers
+        configure_mappers()
+        _RELACIONES = {
+            'compra': (
+                joinedload(Compra.proveedor),
+                joinedload(Compra.insumo),
+            ),
+            'tanque': (
+                selectinload(TanqueFabricado.tanque_insumo).joinedload(TanqueInsumo.insumo),
+                selectinload(TanqueFabricado.lineas_archivadas).joinedload(TanqueInsumoArchivo.insumo),
+            ),
+            'tanque_pdf': (
+                selectinload(TanqueFabricado.tanque_insumo).joinedload(TanqueInsumo.insumo)
+                .selectinload(Insumo.proveedor_insumo).joinedload(ProveedorInsumo.proveedor),
+                selectinload(TanqueFabricado.lineas_archivadas).joinedload(TanqueInsumoArchivo.insumo)
+                .selectinload(Insumo.proveedor_insumo).joinedload(ProveedorInsumo.proveedor),
+            ),
+            'salida': (
+                joinedload(TanqueInsumo.tanque),
+                joinedload(TanqueInsumo.insumo),
+            ),
+            'proveedor_insumos': (
+                selectinload(Proveedor.proveedor_insumo).joinedload(ProveedorInsumo.insumo),
+            ),
+            'alerta': (
+                joinedload(AlertaStock.insumo),
+            ),
+        }
+    return _RELACIONES
+
+
+def con_relaciones(query, perfil):
+    """Agrega a la consulta las opciones de carga del perfil indicado."""
+    return query.options(*_relaciones()[perfil])
+
+
+# ---------- Serializadores de listados ----------
+def salida_a_dict(r, incluir_tanque=True):
+    """Fila de TanqueInsumo para los listados de salidas (perfil 'salida')."""
+    dato = {
+        "id_tanque_insumo": r.id_tanque_insumo,
+        "id_insumo": r.id_insumo,
+        "insumo_nombre": r.insumo.nombre if r.insumo else "N/A",
+        "cantidad_usada": float(r.cantidad_usada),
+        "costo_unitario": float(r.costo_unitario),
+        "operario": r.operario,
+        "fecha_registro": r.fecha_registro.isoformat() if r.fecha_registro else None,
+        "version": r.version
+    }
+    if incluir_tanque:
+        dato["id_tanque"] = r.id_tanque
+        dato["tanque_nombre"] = r.tanque.modelo if r.tanque else "N/A"
+    return dato
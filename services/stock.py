@@ -0,0 +1,138 @@
+# services/stock.py
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func, insert, literal, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from models import db, Insumo, MovimientoStock
+from services.alertas import marcar_insumos
+
+TIPOS = ('compra', 'salida', 'ajuste', 'reversion')
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, id_insumo):
+        super().__init__(f"Stock insuficiente del insumo {id_insumo}")
+        self.id_insumo = id_insumo
+
+
+def decimal(valor):
+    """Convierte números del JSON a Decimal sin pasar por float."""
+    return valor if isinstance(valor, Decimal) else Decimal(str(valor))
+
+
+# ------------------------------------------------------------
+# Movimientos de stock
+# El saldo se actualiza con un único UPDATE ... SET cantidad = cantidad + :delta
+# RETURNING cantidad, así dos workers que descuentan el mismo insumo no se
+# pisan. Cada cambio queda asentado en movimientos_stock.
+# ------------------------------------------------------------
+def mover_stock(id_insumo, cantidad, tipo, referencia=None, validar_stock=False):
+    """
+    Suma `cantidad` (con signo) al stock del insumo y registra el movimiento.
+    Devuelve el saldo resultante. Con validar_stock=True el UPDATE solo se
+    aplica si el saldo no queda negativo; si no, lanza StockInsuficiente.
+    """
+    return mover_stock_lote(id_insumo, [(cantidad, referencia)], tipo, validar_stock)
+
+
+def mover_stock_lote(id_insumo, movimientos, tipo, validar_stock=False):
+    """
+    Igual que mover_stock pero para varios movimientos del mismo insumo:
+    un solo UPDATE por el total y un INSERT por lote en el libro.
+    movimientos: lista de (cantidad, referencia).
+    """
+    assert tipo in TIPOS, tipo
+    movimientos = [(decimal(c), ref) for c, ref in movimientos]
+    total = sum((c for c, _ in movimientos), Decimal('0'))
+
+    db.session.flush()  # que los INSERT pendientes (insumo nuevo, salida) existan
+
+    tabla = Insumo.__table__
+    sentencia = (
+        update(tabla)
+        .where(tabla.c.id_insumo == id_insumo)
+        .values(cantidad=func.coalesce(tabla.c.cantidad, 0) + total)
+        .returning(tabla.c.cantidad)
+    )
+    if validar_stock and total < 0:
+        sentencia = sentencia.where(func.coalesce(tabla.c.cantidad, 0) + total >= 0)
+
+    fila = db.session.execute(sentencia).first()
+    if fila is None:
+        raise StockInsuficiente(id_insumo)
+    saldo = fila[0]
+
+    # El Insumo cargado en la sesión tiene el valor viejo: lo actualizamos sin marcarlo sucio
+    insumo = db.session.identity_map.get(identity_key(Insumo, id_insumo))
+    if insumo is not None:
+        set_committed_value(insumo, 'cantidad', saldo)
+    marcar_insumos(db.session, [id_insumo])  # las alertas se evalúan al hacer commit
+
+    ahora = datetime.utcnow()
+    corriente = saldo - total
+    filas = []
+    for cantidad, referencia in movimientos:
+        corriente += cantidad
+        filas.append({
+            'id_insumo': id_insumo,
+            'tipo': tipo,
+            'cantidad': cantidad,
+            'saldo': corriente,
+            'referencia': referencia,
+            'fecha': ahora
+        })
+    db.session.execute(insert(MovimientoStock), filas)
+
+    return saldo
+
+
+# ------------------------------------------------------------
+# Reconstrucción de saldos desde el libro
+# ------------------------------------------------------------
+def reconstruir_saldos():
+    """
+    Recalcula Insumo.cantidad = SUM(movimientos) para todos los insumos en una
+    sola pasada. La primera vez, cada insumo recibe un 'ajuste' de apertura por
+    la diferencia entre su stock actual y lo ya asentado (el stock anterior al
+    libro), así la reconstrucción parte de los saldos vigentes.
+    Devuelve (aperturas, corregidos).
+    """
+    ins = Insumo.__table__
+    mov = MovimientoStock.__table__
+    ahora = datetime.utcnow()
+
+    suma = (
+        select(func.coalesce(func.sum(mov.c.cantidad), 0))
+        .where(mov.c.id_insumo == ins.c.id_insumo)
+        .scalar_subquery()
+    )
+
+    sin_apertura = ~(
+        select(mov.c.id_movimiento)
+        .where(mov.c.id_insumo == ins.c.id_insumo, mov.c.referencia == 'apertura')
+        .exists()
+    )
+    aperturas = db.session.execute(
+        insert(mov).from_select(
+            ['id_insumo', 'tipo', 'cantidad', 'saldo', 'referencia', 'fecha'],
+            select(
+                ins.c.id_insumo,
+                literal('ajuste'),
+                func.coalesce(ins.c.cantidad, 0) - suma,
+                func.coalesce(ins.c.cantidad, 0),
+                literal('apertura'),
+                literal(ahora)
+            ).where(sin_apertura)
+        )
+    ).rowcount
+
+    corregidos = db.session.execute(
+        update(ins)
+        .where(func.coalesce(ins.c.cantidad, 0) != suma)
+        .values(cantidad=suma)
+    ).rowcount
+
+    db.session.commit()
+    return aperturas, corregidos
@@ -0,0 +1,109 @@
+# services/tanques.py
+from sqlalchemy import func, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from models import db, TanqueFabricado, TanqueInsumo
+from services.stock import decimal
+
+
+class TanqueFinalizado(Exception):
+    def __init__(self, id_tanque):
+        super().__init__(f"El tanque {id_tanque} está finalizado")
+        self.id_tanque = id_tanque
+
+
+def ajustar_costo_tanque(id_tanque, delta):
+    """
+    Suma `delta` al costo_total del tanque con un UPDATE atómico. Devuelve el nuevo costo.
+    Solo aplica si el tanque no está finalizado (si no, lanza TanqueFinalizado)
+    y sube su versión: una finalización que leyó el tanque antes choca al guardar.
+    """
+    tabla = TanqueFabricado.__table__
+    fila = db.session.execute(
+        update(tabla)
+        .where(tabla.c.id_tanque == id_tanque, tabla.c.finalizado.isnot(True))
+        .values(costo_total=func.coalesce(tabla.c.costo_total, 0) + decimal(delta), version=tabla.c.version + 1)
+        .returning(tabla.c.costo_total, tabla.c.version)
+    ).first()
+    if fila is None:
+        if db.session.get(TanqueFabricado, id_tanque) is None:
+            return None
+        raise TanqueFinalizado(id_tanque)
+
+    tanque = db.session.identity_map.get(identity_key(TanqueFabricado, id_tanque))
+    if tanque is not None:
+        set_committed_value(tanque, 'costo_total', fila[0])
+        set_committed_value(tanque, 'version', fila[1])
+    return fila[0]
+
+
+# ------------------------------------------------------------
+# Conciliación de costo_total
+# El costo de un tanque es ROUND(SUM(cantidad_usada * costo_unitario), 2)
+# de sus líneas. Se calcula para todos los tanques con un solo GROUP BY y
+# se repara con un solo UPDATE ... FROM sobre ese mismo agrupado.
+# ------------------------------------------------------------
+def _costos_calculados(id_tanque=None):
+    """Subconsulta (id_tanque, costo_total, calculado) de todos los tanques, o de uno."""
+    tanques = TanqueFabricado.__table__
+    lineas = TanqueInsumo.__table__
+    consulta = (
+        select(
+            tanques.c.id_tanque,
+            tanques.c.costo_total,
+            func.round(
+                func.coalesce(func.sum(lineas.c.cantidad_usada * lineas.c.costo_unitario), 0), 2,
+                type_=tanques.c.costo_total.type
+            ).label('calculado')
+        )
+        .select_from(tanques.outerjoin(lineas, lineas.c.id_tanque == tanques.c.id_tanque))
+        .where(tanques.c.archivado.isnot(True))  # archivados: costo congelado, sus líneas ya no están acá
+        .group_by(tanques.c.id_tanque, tanques.c.costo_total)
+    )
+    if id_tanque is not None:
+        consulta = consulta.where(tanques.c.id_tanque == id_tanque)
+    return consulta.subquery('costos')
+
+
+def conciliar_costos(reparar=False):
+    """
+    Devuelve las diferencias entre costo_total y la suma de las líneas:
+    lista de {id_tanque, costo_total, calculado, diferencia}.
+    Con reparar=True además corrige todos los tanques en bloque y hace commit.
+    """
+    costos = _costos_calculados()
+    filas = db.session.execute(
+        select(costos.c.id_tanque, costos.c.costo_total, costos.c.calculado)
+        .where(func.coalesce(costos.c.costo_total, -1) != costos.c.calculado)
+        .order_by(costos.c.id_tanque)
+    ).all()
+
+    diferencias = [{
+        'id_tanque': id_tanque,
+        'costo_total': decimal(costo or 0),
+        'calculado': decimal(calc),
+        'diferencia': decimal(costo or 0) - decimal(calc)
+    } for id_tanque, costo, calc in filas]
+
+    if reparar and diferencias:
+        recalcular_costos()
+        db.session.commit()
+    return diferencias
+
+
+def recalcular_costos(id_tanque=None):
+    """costo_total = suma de las líneas, de un tanque o de todos. Devuelve cuántos cambiaron."""
+    tanques = TanqueFabricado.__table__
+    costos = _costos_calculados(id_tanque)
+    corregidos = db.session.execute(
+        update(tanques)
+        .where(tanques.c.id_tanque == costos.c.id_tanque)
+        .where(func.coalesce(tanques.c.costo_total, -1) != costos.c.calculado)
+        .values(costo_total=costos.c.calculado)
+    ).rowcount
+
+    # Los tanques cargados en la sesión quedaron con el valor viejo
+    for obj in list(db.session.identity_map.values()):
+        if isinstance(obj, TanqueFabricado) and (id_tanque is None or obj.id_tanque == id_tanque):
+            db.session.expire(obj, ['costo_total'])
+    return corregidos
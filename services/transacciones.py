@@ -0,0 +1,69 @@
+# services/transacciones.py
+from sqlalchemy import event
+from models import db
+
+
+# ------------------------------------------------------------
+# Trabajo diferido al commit de la sesión.
+#
+# Los servicios acumulan cambios en session.info mientras dura la
+# transacción (con pendientes()) y registran funciones que los aplican:
+#   - antes_del_commit: dentro de la transacción, pueden escribir.
+#   - despues_del_commit: ya confirmada, para avisos hacia afuera.
+# Las funciones corren por orden de prioridad (menor primero). Si la
+# transacción se deshace, lo acumulado se descarta.
+# ------------------------------------------------------------
+_antes = []
+_despues = []
+_claves = set()
+
+
+def _registrar(lista, prioridad):
+    def decorador(funcion):
+        lista.append((prioridad, funcion))
+        lista.sort(key=lambda par: par[0])
+        return funcion
+    return decorador
+
+
+def antes_del_commit(prioridad=100):
+    """Decorador: funcion(session) corre en before_commit."""
+    return _registrar(_antes, prioridad)
+
+
+def despues_del_commit(prioridad=100):
+    """Decorador: funcion(session) corre en after_commit."""
+    return _registrar(_despues, prioridad)
+
+
+def pendientes(session, clave, fabrica):
+    """Acumulador de la transacción guardado en session.info[clave]."""
+    _claves.add(clave)
+    if clave not in session.info:
+        session.info[clave] = fabrica()
+    return session.info[clave]
+
+
+def tomar(session, clave):
+    """Saca y devuelve lo acumulado bajo clave (None si no hay nada)."""
+    return session.info.pop(clave, None)
+
+
+@event.listens_for(db.session, 'before_commit')
+def _antes_del_commit(session):
+    for _, funcion in _antes:
+        funcion(session)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _despues_del_commit(session):
+    for _, funcion in _despues:
+        funcion(session)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _descartar(session, transaccion_previa):
+    if transaccion_previa.nested:  # un SAVEPOINT no descarta lo de la transacción
+        return
+    for clave in _claves:
+        session.info.pop(clave, None)
@@ -0,0 +1,128 @@
+# services/versiones.py
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import request, make_response
+from sqlalchemy import event, select
+from models import db, VersionTabla
+from services.transacciones import antes_del_commit, despues_del_commit, pendientes, tomar
+
+
+# ------------------------------------------------------------
+# Versiones por tabla y GET condicional
+#
+# Cada commit que escribe en una tabla (ORM o UPDATE/INSERT/DELETE por
+# db.session.execute) incrementa su contador en versiones_tabla. Los
+# listados decorados con @condicional arman su ETag con esos contadores:
+# si el cliente ya tiene esa versión se responde 304 sin consultar ni
+# serializar nada.
+# ------------------------------------------------------------
+_CLAVE = 'versiones_tabla'
+_CONFIRMADAS = 'versiones_confirmadas'
+_TABLA = VersionTabla.__tablename__
+_avisos = []
+
+
+def al_confirmar(funcion):
+    """Decorador: funcion(tablas) corre después de cada commit que escribió en esas tablas."""
+    _avisos.append(funcion)
+    return funcion
+
+
+def marcar_tablas(session, tablas):
+    pendientes(session, _CLAVE, set).update(tablas)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _marcar_flush(session, flush_context):
+    objetos = list(session.new) + list(session.deleted) + [o for o in session.dirty if session.is_modified(o)]
+    tablas = {obj.__table__.name for obj in objetos}
+    if tablas:
+        marcar_tablas(session, tablas)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _marcar_sentencia(estado):
+    # UPDATE/INSERT/DELETE masivos que no pasan por el flush
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        tabla = getattr(estado.statement, 'table', None)
+        if tabla is not None and tabla.name != _TABLA:
+            marcar_tablas(estado.session, {tabla.name})
+
+
+def _incrementar(tablas):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    ahora = datetime.utcnow()
+    tabla = VersionTabla.__table__
+    # en orden, para que dos transacciones no se bloqueen cruzadas
+    sentencia = insert(tabla).values([{'tabla': t, 'version': 1, 'actualizado': ahora} for t in sorted(tablas)])
+    sentencia = sentencia.on_conflict_do_update(
+        index_elements=['tabla'],
+        set_={'version': tabla.c.version + 1, 'actualizado': sentencia.excluded.actualizado}
+    )
+    db.session.execute(sentencia)
+
+
+@antes_del_commit(prioridad=960)  # última escritura de la transacción
+def _volcar(session):
+    session.flush()
+    tablas = tomar(session, _CLAVE)
+    if tablas:
+        _incrementar(tablas)
+        pendientes(session, _CONFIRMADAS, set).update(tablas)
+
+
+@despues_del_commit(prioridad=50)
+def _avisar(session):
+    tablas = tomar(session, _CONFIRMADAS)
+    if tablas:
+        for funcion in _avisos:
+            funcion(tablas)
+
+
+def versiones(tablas):
+    """{tabla: (version, actualizado)} de las tablas pedidas; una sola consulta."""
+    filas = db.session.execute(
+        select(VersionTabla.tabla, VersionTabla.version, VersionTabla.actualizado)
+        .where(VersionTabla.tabla.in_(tablas))
+    ).all()
+    return {t: (v, a) for t, v, a in filas}
+
+
+def condicional(*tablas):
+    """
+    Decorador para GET cuyo resultado depende solo de estas tablas y de la URL.
+    Agrega ETag y Last-Modified y responde 304 si el cliente ya está al día.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            actuales = versiones(tablas)
+            firma = request.full_path + '|' + '|'.join(f"{t}:{actuales.get(t, (0, None))[0]}" for t in sorted(tablas))
+            etag = hashlib.sha1(firma.encode()).hexdigest()[:20]
+            fechas = [a for _, a in actuales.values() if a is not None]
+            modificado = max(fechas).replace(microsecond=0) if fechas else None
+
+            if request.if_none_match:
+                al_dia = request.if_none_match.contains_weak(etag)
+            else:
+                al_dia = (modificado is not None and request.if_modified_since is not None
+                          and modificado <= request.if_modified_since.replace(tzinfo=None))
+            if al_dia:
+                respuesta = make_response('', 304)
+            else:
+                respuesta = make_response(vista(*args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+            respuesta.set_etag(etag, weak=True)
+            if modificado is not None:
+                respuesta.last_modified = modificado
+            respuesta.headers['Cache-Control'] = 'private, no-cache'  # siempre revalidar
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,63 @@
+# tests/conftest.py
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# Base SQLite en memoria (una por test) y cachés en un directorio temporal;
+# tiene que estar antes de importar app.py, que arma la app al importarse
+_TEMPORAL = tempfile.mkdtemp(prefix='sistema_tests_')
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+os.environ.setdefault('SECRET_KEY', 'tests')
+os.environ.setdefault('CACHE_RESPUESTAS_DB', os.path.join(_TEMPORAL, 'cache_respuestas.sqlite3'))
+os.environ.setdefault('PDF_CACHE_DIR', os.path.join(_TEMPORAL, 'pdf_tanques'))
+os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from commands import inicializar_base  # noqa: E402
+from models import db, Insumo, Proveedor, ProveedorInsumo, User  # noqa: E402
+from services import cache  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    aplicacion = create_app()
+    aplicacion.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with aplicacion.app_context():
+        inicializar_base(log=lambda *args: None)
+        cache.vaciar()
+        shutil.rmtree(os.environ['PDF_CACHE_DIR'], ignore_errors=True)  # los ids se repiten entre tests
+        yield aplicacion
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente con la sesión del admin iniciada."""
+    cliente = app.test_client()
+    admin = User.query.filter_by(username='admin').one()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(admin.id)
+        sesion['_fresh'] = True
+    return cliente
+
+
+@pytest.fixture
+def catalogo(app):
+    """Dos proveedores y tres insumos con precio en ambos. Devuelve (proveedores, insumos) como ids."""
+    proveedores = [Proveedor(nombre=f'Proveedor {n}', razon_social='SA', cuit=f'20-{n}') for n in range(2)]
+    insumos = [
+        Insumo(nombre=nombre, cantidad=100, unidad_medida='u', stock_minimo=10)
+        for nombre in ('Chapa 2mm', 'Tornillería M8', 'Pintura epoxi')
+    ]
+    db.session.add_all(proveedores + insumos)
+    db.session.flush()
+    for p in proveedores:
+        for i in insumos:
+            db.session.add(ProveedorInsumo(id_proveedor=p.id_proveedor, id_insumo=i.id_insumo, precio_actual=10))
+    db.session.commit()
+    return [p.id_proveedor for p in proveedores], [i.id_insumo for i in insumos]
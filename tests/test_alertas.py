@@ -0,0 +1,35 @@
+# tests/test_alertas.py
+from models import AlertaStock
+from services.alertas import PENDIENTE, RESUELTA
+
+
+def _salida(client, id_insumo, id_tanque, cantidad):
+    respuesta = client.post('/api/v1/insumos_salida/', json={
+        'id_insumo': id_insumo, 'id_tanque': id_tanque, 'cantidad_usada': cantidad, 'operario': 'op'
+    })
+    assert respuesta.status_code in (200, 201)
+
+
+def test_una_sola_alerta_abierta_por_insumo(client, catalogo):
+    proveedores, insumos = catalogo
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-1'}).get_json()['id_tanque']
+
+    _salida(client, insumos[0], id_tanque, 95)  # 100 -> 5, mínimo 10
+    _salida(client, insumos[0], id_tanque, 2)   # 5 -> 3: sigue la misma alerta
+    alertas = AlertaStock.query.filter_by(id_insumo=insumos[0]).all()
+    assert [(a.estado, float(a.cantidad_actual)) for a in alertas] == [(PENDIENTE, 3)]
+
+
+def test_la_alerta_se_resuelve_al_reponer(client, catalogo):
+    proveedores, insumos = catalogo
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-1'}).get_json()['id_tanque']
+    _salida(client, insumos[0], id_tanque, 95)
+
+    client.post('/api/v1/compras/', json={
+        'id_proveedor': proveedores[0], 'id_insumo': insumos[0], 'cantidad': 50, 'precio_unitario': 10
+    })
+    assert [a.estado for a in AlertaStock.query.filter_by(id_insumo=insumos[0])] == [RESUELTA]
+
+    _salida(client, insumos[0], id_tanque, 50)  # vuelve a bajar: se abre otra
+    estados = sorted(a.estado for a in AlertaStock.query.filter_by(id_insumo=insumos[0]))
+    assert estados == [PENDIENTE, RESUELTA]
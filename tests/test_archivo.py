@@ -0,0 +1,151 @@
+# tests/test_archivo.py
+import csv
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models import db, AlertaStock, AlertaStockArchivo, ReporteRollup, TanqueFabricado, TanqueInsumo, TanqueInsumoArchivo
+from routes import api_tanques
+from services import archivo, reportes
+from services.alertas import RESUELTA
+
+HACE_DOS_ANIOS = datetime.utcnow() - timedelta(days=730)
+
+
+def _tanque(client, id_insumo, *cantidades, finalizar=True):
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-1', 'cliente': 'Cliente'}).get_json()['id_tanque']
+    for cantidad in cantidades:
+        respuesta = client.post('/api/v1/insumos_salida/', json={
+            'id_insumo': id_insumo, 'id_tanque': id_tanque, 'cantidad_usada': cantidad, 'operario': 'op'
+        })
+        assert respuesta.status_code == 201
+    if finalizar:
+        assert client.put(f'/api/v1/tanques/{id_tanque}/finalizar').status_code == 202
+    return id_tanque
+
+
+def _envejecer(id_tanque):
+    db.session.execute(
+        db.update(TanqueFabricado).where(TanqueFabricado.id_tanque == id_tanque).values(finalizado_en=HACE_DOS_ANIOS)
+    )
+    db.session.commit()
+
+
+@pytest.fixture
+def tanques(client, catalogo):
+    """Un tanque viejo (se archiva), uno finalizado recién y uno abierto. Devuelve sus ids."""
+    _, insumos = catalogo
+    viejo = _tanque(client, insumos[0], 2, 3)
+    reciente = _tanque(client, insumos[0], 1)
+    abierto = _tanque(client, insumos[1], 4, finalizar=False)
+    _envejecer(viejo)
+    return viejo, reciente, abierto
+
+
+def _filas():
+    return sorted(
+        (r.periodo, r.fecha, r.dimension, r.clave) + tuple(float(getattr(r, m)) for m in reportes.METRICAS)
+        for r in ReporteRollup.query.all()
+    )
+
+
+def _exportar_salidas(client, **parametros):
+    respuesta = client.get('/api/v1/exportar/salidas', query_string=parametros)
+    assert respuesta.status_code == 200
+    return [int(f['id_tanque']) for f in csv.DictReader(io.StringIO(respuesta.get_data(as_text=True)))]
+
+
+def test_mueve_las_lineas_de_los_tanques_viejos(client, catalogo, tanques):
+    _, insumos = catalogo
+    viejo, reciente, abierto = tanques
+    version = db.session.get(TanqueFabricado, viejo).version
+
+    db.session.add(AlertaStock(id_insumo=insumos[2], fecha=HACE_DOS_ANIOS, cantidad_actual=5, stock_minimo=10, estado=RESUELTA))
+    db.session.commit()
+
+    assert archivo.archivar() == {'tanques': 1, 'lineas': 2, 'alertas': 1}
+    db.session.expire_all()
+
+    assert {t.id_tanque for t in TanqueInsumoArchivo.query} == {viejo}
+    assert {t.id_tanque for t in TanqueInsumo.query} == {reciente, abierto}
+    assert AlertaStockArchivo.query.count() == 1
+    tanque = db.session.get(TanqueFabricado, viejo)
+    assert (tanque.archivado, tanque.version) == (True, version + 1)
+    # el detalle del tanque sigue mostrando sus líneas, ahora desde el archivo
+    assert [l['cantidad_usada'] for l in client.get(f'/api/v1/tanques/{viejo}').get_json()['insumos_utilizados']] == [2, 3]
+
+    assert archivo.archivar() == {'tanques': 0, 'lineas': 0, 'alertas': 0}
+
+
+def test_los_agregados_no_cambian_al_archivar_ni_al_reconstruir(client, tanques):
+    antes = _filas()
+    archivo.archivar()
+    assert _filas() == antes
+
+    # la reconstrucción lee tanque_insumo_historico: lo archivado sigue contando
+    reportes.reconstruir_rollups()
+    assert _filas() == antes
+
+
+def test_exportar_con_archivo_incluye_las_lineas_archivadas(client, tanques):
+    viejo, reciente, abierto = tanques
+    archivo.archivar()
+
+    assert sorted(set(_exportar_salidas(client))) == [reciente, abierto]
+    assert sorted(set(_exportar_salidas(client, archivo=1))) == [viejo, reciente, abierto]
+
+
+def test_un_tanque_archivado_no_se_desfinaliza(client, tanques):
+    viejo, _, _ = tanques
+    leida = db.session.get(TanqueFabricado, viejo).version
+    archivo.archivar()
+
+    respuesta = client.put(f'/api/v1/tanques/{viejo}/desfinalizar')
+    assert respuesta.status_code == 409
+    # quien leyó el tanque antes de archivarlo choca con la versión
+    respuesta = client.put(f'/api/v1/tanques/{viejo}/desfinalizar', headers={'If-Match': f'"{leida}"'})
+    assert respuesta.status_code == 409
+    db.session.expire_all()
+    assert db.session.get(TanqueFabricado, viejo).finalizado
+
+
+def test_archivar_mientras_se_desfinaliza_no_pierde_la_edicion(client, tanques, monkeypatch):
+    viejo, _, _ = tanques
+
+    # el archivo marca el tanque después de que desfinalizar lo leyó (sin autoflush:
+    # la edición todavía no llegó a la base)
+    def archivar_en_el_medio(session, tipo, datos):
+        session.connection().execute(
+            db.update(TanqueFabricado.__table__).where(TanqueFabricado.id_tanque == viejo)
+            .values(archivado=True, version=TanqueFabricado.__table__.c.version + 1)
+        )
+    monkeypatch.setattr(api_tanques, 'publicar', archivar_en_el_medio)
+
+    assert client.put(f'/api/v1/tanques/{viejo}/desfinalizar').status_code == 409
+    db.session.rollback()
+    db.session.expire_all()
+    assert db.session.get(TanqueFabricado, viejo).finalizado
+
+
+def test_desfinalizar_mientras_se_archiva_deja_las_lineas(client, tanques):
+    viejo, _, _ = tanques
+
+    # otro administrador desfinaliza entre la búsqueda de candidatos y el UPDATE que los marca
+    def desfinalizar_en_el_medio(estado):
+        if estado.is_update and estado.statement.table.name == 'tanques_fabricados':
+            estado.session.connection().execute(
+                db.update(TanqueFabricado.__table__).where(TanqueFabricado.id_tanque == viejo).values(finalizado=False)
+            )
+    event.listen(db.session, 'do_orm_execute', desfinalizar_en_el_medio)
+    try:
+        assert archivo.archivar_tanques() == (0, 0)
+    finally:
+        event.remove(db.session, 'do_orm_execute', desfinalizar_en_el_medio)
+
+    db.session.expire_all()
+    tanque = db.session.get(TanqueFabricado, viejo)
+    assert (tanque.finalizado, tanque.archivado) == (False, False)
+    assert TanqueInsumo.query.filter_by(id_tanque=viejo).count() == 2
+    assert TanqueInsumoArchivo.query.count() == 0
@@ -0,0 +1,62 @@
+# tests/test_arranque.py
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _entorno(tmp_path):
+    entorno = dict(os.environ)
+    entorno.update({
+        'PROMETHEUS_MULTIPROC_DIR': str(tmp_path / 'no_existe' / 'metricas'),  # primer arranque
+        'DATABASE_URL': f"sqlite:///{tmp_path / 'arranque.sqlite3'}",
+        'CACHE_RESPUESTAS_DB': str(tmp_path / 'cache.sqlite3'),
+        'SECRET_KEY': 'tests',
+    })
+    entorno.pop('_PROMETHEUS_MULTIPROC_MASTER', None)
+    return entorno
+
+
+def test_configuracion_antes_que_la_app_con_directorio_nuevo(tmp_path):
+    # el mismo orden que gunicorn con preload_app: se lee la configuración,
+    # se importa la app y recién después corre on_starting
+    codigo = (
+        "import runpy; runpy.run_path('gunicorn.conf.py'); "
+        "import app; from services import metricas; "
+        "metricas.ESPERA_POOL.observe(0.01); print(metricas.exponer()[0].decode())"
+    )
+    proceso = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, env=_entorno(tmp_path),
+                             capture_output=True, text=True, timeout=60)
+    assert proceso.returncode == 0, proceso.stderr
+    assert 'db_pool_checkout_wait_seconds_count 1.0' in proceso.stdout
+
+
+def test_gunicorn_arranca_con_directorio_nuevo(tmp_path):
+    pytest.importorskip('gunicorn')
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        puerto = s.getsockname()[1]
+    entorno = _entorno(tmp_path)
+    entorno.update({'GUNICORN_BIND': f'127.0.0.1:{puerto}', 'GUNICORN_WORKERS': '1'})
+    proceso = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                               cwd=RAIZ, env=entorno, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        limite = time.monotonic() + 30
+        while True:
+            assert proceso.poll() is None, proceso.stdout.read()
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{puerto}/metrics', timeout=2) as respuesta:
+                    assert respuesta.status == 200
+                    break
+            except OSError:
+                assert time.monotonic() < limite, 'gunicorn no respondió'
+                time.sleep(0.3)
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
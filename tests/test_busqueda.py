@@ -0,0 +1,36 @@
+# tests/test_busqueda.py
+from models import db, Insumo, TanqueFabricado
+from services import busqueda
+
+
+def test_busca_sin_acentos_ni_mayusculas(app, catalogo):
+    _, insumos = catalogo
+    assert busqueda.buscar('insumos', 'TORNILLERIA') == [insumos[1]]
+
+
+def test_solo_el_cambio_de_nombre_ensucia_el_indice(app, catalogo):
+    _, insumos = catalogo
+    busqueda.buscar('insumos', 'chapa')  # construye el índice
+    indice = busqueda._indices['insumos']
+    assert not indice.sucio
+
+    insumo = db.session.get(Insumo, insumos[0])
+    insumo.cantidad = 5
+    db.session.commit()
+    assert not indice.sucio
+
+    insumo.nombre = 'Chapa 3mm'
+    db.session.commit()
+    assert indice.sucio
+    assert busqueda.buscar('insumos', '3mm') == [insumos[0]]
+
+
+def test_finalizar_un_tanque_no_ensucia_clientes(app):
+    tanque = TanqueFabricado(modelo='M1', cliente='Lácteos del Sur', costo_total=0)
+    db.session.add(tanque)
+    db.session.commit()
+    assert busqueda.buscar('clientes', 'lacteos') == ['Lácteos del Sur']
+
+    tanque.finalizado = True
+    db.session.commit()
+    assert not busqueda._indices['clientes'].sucio
@@ -0,0 +1,33 @@
+# tests/test_cache.py
+from models import db, Proveedor
+
+
+def _nombres(respuesta):
+    return [p['nombre'] for p in respuesta.get_json()]
+
+
+def test_una_escritura_invalida_la_respuesta_cacheada(client, catalogo):
+    proveedores, insumos = catalogo
+    assert client.get('/api/v1/proveedores/').headers['X-Cache'] == 'MISS'
+    assert client.get('/api/v1/proveedores/').headers['X-Cache'] == 'HIT'
+
+    # escribir en otra tabla no la toca
+    client.put(f'/api/v1/insumos/{insumos[0]}', json={'stock_minimo': 20})
+    assert client.get('/api/v1/proveedores/').headers['X-Cache'] == 'HIT'
+
+    # el commit sobre proveedores sube la generación (al_confirmar) y la entrada queda vieja
+    assert client.put(f'/api/v1/proveedores/{proveedores[0]}', json={'nombre': 'Aceros SA'}).status_code == 200
+    respuesta = client.get('/api/v1/proveedores/')
+    assert respuesta.headers['X-Cache'] == 'MISS'
+    assert 'Aceros SA' in _nombres(respuesta)
+    assert client.get('/api/v1/proveedores/').headers['X-Cache'] == 'HIT'
+
+
+def test_un_rollback_no_invalida(client, catalogo):
+    client.get('/api/v1/proveedores/')
+    db.session.add(Proveedor(nombre='Descartado', razon_social='SA', cuit='20-9'))
+    db.session.flush()
+    db.session.rollback()
+    respuesta = client.get('/api/v1/proveedores/')
+    assert respuesta.headers['X-Cache'] == 'HIT'
+    assert 'Descartado' not in _nombres(respuesta)
@@ -0,0 +1,56 @@
+# tests/test_concurrencia.py
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm.exc import StaleDataError
+
+from models import db, Insumo, TanqueFabricado
+
+
+def test_if_match_vigente_y_vencido(client, catalogo):
+    _, insumos = catalogo
+    url = f'/api/v1/insumos/{insumos[0]}'
+    etag = client.get(url).headers['ETag']
+
+    respuesta = client.put(url, json={'nombre': 'Chapa 3mm'}, headers={'If-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()['version'] == 2
+
+    repetida = client.put(url, json={'nombre': 'Chapa 4mm'}, headers={'If-Match': etag})
+    assert repetida.status_code == 409
+    assert repetida.get_json()['version'] == 2
+
+
+def test_version_en_el_cuerpo(client, catalogo):
+    proveedores, _ = catalogo
+    url = f'/api/v1/proveedores/{proveedores[0]}'
+    assert client.put(url, json={'nombre': 'P', 'version': 0}).status_code == 409
+    assert client.put(url, json={'nombre': 'P', 'version': 'x'}).status_code == 400
+    assert client.put(url, json={'nombre': 'P', 'version': 1}).status_code == 200
+
+
+def test_escritura_concurrente_lanza_stale_data(app, catalogo):
+    _, insumos = catalogo
+    insumo = db.session.get(Insumo, insumos[0])  # este pedido leyó la versión 1
+    tabla = Insumo.__table__
+    db.session.execute(update(tabla).where(tabla.c.id_insumo == insumos[0]).values(version=tabla.c.version + 1))
+    insumo.nombre = 'Otro'
+    with pytest.raises(StaleDataError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_stale_data_se_responde_409(app):
+    with app.test_request_context('/'):
+        respuesta = app.make_response(app.handle_user_exception(StaleDataError('fila modificada')))
+    assert respuesta.status_code == 409
+
+
+def test_salida_a_un_tanque_finalizado_es_409(client, catalogo):
+    _, insumos = catalogo
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-1'}).get_json()['id_tanque']
+    salida = {'id_insumo': insumos[0], 'id_tanque': id_tanque, 'cantidad_usada': 1, 'operario': 'op'}
+    assert client.post('/api/v1/insumos_salida/', json=salida).status_code in (200, 201)
+    assert client.put(f'/api/v1/tanques/{id_tanque}/finalizar').status_code == 202
+
+    assert client.post('/api/v1/insumos_salida/', json=salida).status_code == 409
+    assert db.session.get(TanqueFabricado, id_tanque).finalizado
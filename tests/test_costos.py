@@ -0,0 +1,109 @@
+# tests/test_costos.py
+from decimal import Decimal
+
+import pytest
+
+from models import db, CapaCosto, CostoInsumo, Insumo, TanqueInsumo
+from services import costos
+
+
+@pytest.fixture
+def insumo_vacio(app, catalogo):
+    """Insumo sin stock (el costeo no arranca con existencia previa)."""
+    insumo = Insumo(nombre='Brida 4"', cantidad=0, unidad_medida='u', stock_minimo=0)
+    db.session.add(insumo)
+    db.session.commit()
+    return insumo.id_insumo
+
+
+def _compra(client, id_proveedor, id_insumo, cantidad, precio, fecha):
+    respuesta = client.post('/api/v1/compras/', json={
+        'id_proveedor': id_proveedor, 'id_insumo': id_insumo, 'cantidad': cantidad,
+        'precio_unitario': precio, 'fecha': fecha
+    })
+    assert respuesta.status_code == 201
+
+
+def _salida(client, id_insumo, id_tanque, cantidad):
+    respuesta = client.post('/api/v1/insumos_salida/', json={
+        'id_insumo': id_insumo, 'id_tanque': id_tanque, 'cantidad_usada': cantidad, 'operario': 'op'
+    })
+    assert respuesta.status_code in (200, 201)
+    return TanqueInsumo.query.order_by(TanqueInsumo.id_tanque_insumo.desc()).first().costo_unitario
+
+
+def _estado(id_insumo):
+    db.session.expire_all()
+    return db.session.get(CostoInsumo, id_insumo)
+
+
+def test_promedio_ponderado(client, catalogo, monkeypatch):
+    monkeypatch.setenv('COSTEO_METODO', costos.PROMEDIO)
+    proveedores, insumos = catalogo
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-1'}).get_json()['id_tanque']
+
+    # apertura: 100 u al último precio de proveedor (10); compra 100 u a 20
+    _compra(client, proveedores[0], insumos[0], 100, 20, '2024-01-10')
+    assert _estado(insumos[0]).costo_unitario == Decimal('15')
+
+    assert _salida(client, insumos[0], id_tanque, 50) == Decimal('15')
+    estado = _estado(insumos[0])
+    assert (estado.cantidad, estado.valor, estado.costo_unitario) == (150, Decimal('2250'), Decimal('15'))
+
+
+def test_fifo_consume_las_capas_en_orden(client, catalogo, insumo_vacio, monkeypatch):
+    monkeypatch.setenv('COSTEO_METODO', costos.FIFO)
+    proveedores, _ = catalogo
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-1'}).get_json()['id_tanque']
+
+    _compra(client, proveedores[0], insumo_vacio, 10, 10, '2024-01-10')
+    _compra(client, proveedores[1], insumo_vacio, 10, 20, '2024-01-20')
+
+    assert _salida(client, insumo_vacio, id_tanque, 15) == Decimal('13.33')  # 10 a 10 + 5 a 20
+    capas = [(float(c.restante), float(c.costo_unitario)) for c in CapaCosto.query.filter_by(id_insumo=insumo_vacio)
+             .order_by(CapaCosto.fecha)]
+    assert capas == [(0, 10), (5, 20)]
+    assert _salida(client, insumo_vacio, id_tanque, 5) == Decimal('20')
+    assert float(_estado(insumo_vacio).valor) == 0
+
+
+@pytest.mark.parametrize('metodo', costos.METODOS)
+def test_reconstruir_coincide_con_el_incremental(client, catalogo, insumo_vacio, monkeypatch, metodo):
+    # insumo sin existencia previa al libro: todo su costo sale de los movimientos
+    monkeypatch.setenv('COSTEO_METODO', metodo)
+    proveedores, _ = catalogo
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-1'}).get_json()['id_tanque']
+    _compra(client, proveedores[0], insumo_vacio, 10, 10, '2024-01-10')
+    _salida(client, insumo_vacio, id_tanque, 4)
+    _compra(client, proveedores[1], insumo_vacio, 10, 16, '2024-01-20')
+    _salida(client, insumo_vacio, id_tanque, 12)
+
+    def foto():
+        estado = _estado(insumo_vacio)
+        # las capas agotadas no importan (la reconstrucción no las vuelve a crear)
+        capas = sorted((float(c.restante), float(c.costo_unitario))
+                       for c in CapaCosto.query.filter(CapaCosto.id_insumo == insumo_vacio, CapaCosto.restante > 0))
+        return float(estado.cantidad), float(estado.valor), float(estado.costo_unitario), capas
+
+    incremental = foto()
+    costos.reconstruir(metodo)
+    assert foto() == incremental
+
+
+def test_crear_tanque_usa_el_costeo_y_no_el_costo_enviado(client, catalogo, insumo_vacio, monkeypatch):
+    monkeypatch.setenv('COSTEO_METODO', costos.PROMEDIO)
+    proveedores, _ = catalogo
+    _compra(client, proveedores[0], insumo_vacio, 10, 10, '2024-01-10')
+
+    respuesta = client.post('/api/v1/tanques/', json={'modelo': 'T-1', 'insumos': [
+        {'id_insumo': insumo_vacio, 'cantidad_usada': 4, 'costo_unitario': 99}
+    ]})
+    assert respuesta.status_code == 201
+    assert respuesta.get_json()['costo_total'] == 40
+    linea = TanqueInsumo.query.filter_by(id_insumo=insumo_vacio).one()
+    assert linea.costo_unitario == Decimal('10')
+
+    # borrar la línea devuelve exactamente lo que salió: el estado no queda desvalorizado
+    assert client.delete(f'/api/v1/insumos_salida/{linea.id_tanque_insumo}').status_code == 200
+    estado = _estado(insumo_vacio)
+    assert (estado.cantidad, estado.valor) == (10, Decimal('100'))
@@ -0,0 +1,63 @@
+# tests/test_eventos.py
+import logging
+
+from services import eventos
+
+
+def test_stream_responde_503_con_el_tope_de_clientes(client, monkeypatch):
+    monkeypatch.setattr(eventos, 'MAX_CLIENTES', 1)
+    abierto = client.get('/api/eventos/stream', buffered=False)
+    assert abierto.status_code == 200
+    next(abierto.response)  # arranca el generador: el cliente queda suscripto
+
+    rechazado = client.get('/api/eventos/stream')
+    assert rechazado.status_code == 503
+    assert rechazado.headers['Retry-After']
+
+    abierto.close()  # al cerrar se libera el lugar
+    assert len(eventos.broker.clientes) == 0
+
+
+class _ConexionCaida:
+    """Conexión cruda que falla al hacer LISTEN y registra si se cerró."""
+
+    def __init__(self):
+        self.cerrada = False
+        self.dbapi_connection = self
+
+    def detach(self):
+        pass
+
+    def cursor(self):
+        raise OSError('servidor reiniciado')
+
+    def close(self):
+        self.cerrada = True
+
+
+class _Corte(Exception):
+    pass
+
+
+def test_cada_reintento_de_listen_cierra_su_conexion(monkeypatch, caplog):
+    conexiones = []
+
+    class Motor:
+        def raw_connection(self):
+            conexiones.append(_ConexionCaida())
+            return conexiones[-1]
+
+    esperas = []
+
+    def dormir(segundos):
+        esperas.append(segundos)
+        if len(esperas) == 2:
+            raise _Corte()
+    monkeypatch.setattr(eventos.time, 'sleep', dormir)
+
+    try:
+        eventos._escuchar(Motor(), logging.getLogger('tests.eventos'))
+    except _Corte:
+        pass
+    assert [c.cerrada for c in conexiones] == [True, True]
+    assert 'servidor reiniciado' in caplog.text
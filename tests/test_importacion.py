@@ -0,0 +1,97 @@
+# tests/test_importacion.py
+import csv
+import io
+import re
+from types import SimpleNamespace
+
+from models import db, Compra, Insumo, ProveedorInsumo
+
+
+def _importar(client, texto, dry_run=False):
+    datos = {'archivo': (io.BytesIO(texto.encode('utf-8')), 'compras.csv')}
+    url = '/api/v1/compras/importar' + ('?dry_run=1' if dry_run else '')
+    return client.post(url, data=datos, content_type='multipart/form-data')
+
+
+CSV = (
+    "fecha;proveedor;insumo;cantidad;precio_unitario\n"
+    "2024-03-01;Proveedor 0;chapa 2mm;10;12,50\n"
+    "2024-03-02;Proveedor 0;Tornilleria M8;5;3\n"
+    "2024-03-02;No existe;Chapa 2mm;1;1\n"
+    "2024-03-03;Proveedor 1;Chapa 2mm;-1;1\n"
+)
+
+
+def test_dry_run_valida_sin_escribir(client, catalogo):
+    _, insumos = catalogo
+    respuesta = _importar(client, CSV, dry_run=True)
+    assert respuesta.status_code == 200
+    resumen = respuesta.get_json()
+    assert (resumen['filas'], resumen['importadas'], resumen['con_error']) == (4, 2, 2)
+    assert [e['linea'] for e in resumen['errores']] == [4, 5]
+    assert db.session.query(Compra).count() == 0
+    assert db.session.get(Insumo, insumos[0]).cantidad == 100
+
+
+def test_importa_compras_y_mueve_stock(client, catalogo):
+    _, insumos = catalogo
+    respuesta = _importar(client, CSV)
+    assert respuesta.status_code == 201
+    assert respuesta.get_json()['importadas'] == 2
+    assert db.session.query(Compra).count() == 2
+    assert float(db.session.get(Insumo, insumos[0]).cantidad) == 110
+    assert float(db.session.get(Insumo, insumos[1]).cantidad) == 105
+
+
+def test_una_compra_vieja_no_pisa_el_precio_vigente(client, catalogo):
+    proveedores, insumos = catalogo
+    _importar(client, "fecha,proveedor,insumo,cantidad,precio_unitario\n2024-05-01,Proveedor 0,Chapa 2mm,1,20\n")
+    _importar(client, "fecha,proveedor,insumo,cantidad,precio_unitario\n2024-01-01,Proveedor 0,Chapa 2mm,1,15\n")
+    asociacion = ProveedorInsumo.query.filter_by(id_proveedor=proveedores[0], id_insumo=insumos[0]).one()
+    assert float(asociacion.precio_actual) == 20
+
+
+def test_encabezado_invalido_es_400(client, catalogo):
+    assert _importar(client, "fecha,cantidad\n2024-01-01,1\n").status_code == 400
+
+
+class _CopiaSimulada:
+    """Conexión que hace pasar a SQLite por PostgreSQL/psycopg2: el COPY se
+    escribe con el cursor DB-API, sin pasar por el ORM, como el de verdad."""
+
+    dialect = SimpleNamespace(name='postgresql', driver='psycopg2')
+
+    def __init__(self, conexion):
+        self._conexion = conexion
+        self.connection = self
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def cursor(self):
+        return self
+
+    def copy_expert(self, sentencia, buffer):
+        tabla, columnas = re.match(r'COPY (\w+) \(([^)]*)\)', sentencia).groups()
+        filas = [[{'True': 1, 'False': 0}.get(v, v) for v in fila] for fila in csv.reader(buffer)]
+        marcas = ', '.join('?' * len(filas[0]))
+        cursor = self._conexion.connection.dbapi_connection.cursor()
+        cursor.executemany(f'INSERT INTO {tabla} ({columnas}) VALUES ({marcas})', filas)
+
+
+def test_el_copy_invalida_el_etag_del_historial(client, catalogo, monkeypatch):
+    proveedores, insumos = catalogo
+    _importar(client, "fecha,proveedor,insumo,cantidad,precio_unitario\n2024-05-01,Proveedor 0,Chapa 2mm,1,20\n")
+    pi = ProveedorInsumo.query.filter_by(id_proveedor=proveedores[0], id_insumo=insumos[0]).one().id_proveedor_insumo
+    antes = client.get(f'/api/v1/precios/{pi}')
+    assert antes.get_json()['cambios'] == 1
+
+    # una compra vieja solo agrega historial (no toca precio_actual), y por COPY
+    conexion = db.session.connection
+    monkeypatch.setattr(db.session, 'connection', lambda *a, **k: _CopiaSimulada(conexion(*a, **k)))
+    _importar(client, "fecha,proveedor,insumo,cantidad,precio_unitario\n2024-01-01,Proveedor 0,Chapa 2mm,1,15\n")
+    monkeypatch.undo()
+
+    despues = client.get(f'/api/v1/precios/{pi}', headers={'If-None-Match': antes.headers['ETag']})
+    assert despues.status_code == 200
+    assert despues.get_json()['cambios'] == 2
@@ -0,0 +1,34 @@
+# tests/test_metricas.py
+import pytest
+from flask import g
+from sqlalchemy import exc, text
+
+from models import db
+from services import metricas
+
+
+def test_metrics_cuenta_requests_y_sentencias(client, catalogo):
+    client.get('/api/v1/proveedores/')
+    cuerpo = client.get('/metrics').get_data(as_text=True)
+    assert 'http_requests_total{endpoint="proveedores_bp.listar_proveedores",method="GET",status="200"}' in cuerpo
+    assert 'db_statements_per_request_count{endpoint="proveedores_bp.listar_proveedores",method="GET"}' in cuerpo
+
+
+def test_una_sentencia_fallida_no_deja_inicios_colgados(app):
+    conexion = db.session.connection()
+    with pytest.raises(exc.OperationalError):
+        conexion.execute(text('SELECT * FROM tabla_que_no_existe'))
+    db.session.rollback()
+    conexion = db.session.connection()
+    conexion.execute(text('SELECT 1'))
+    assert '_inicio_sql' not in conexion.info
+
+
+def test_cuenta_las_sentencias_de_la_request(app):
+    with app.test_request_context('/'):
+        metricas._inicio()
+        db.session.execute(text('SELECT 1'))
+        db.session.execute(text('SELECT 2'))
+        sentencias, segundos = g._metricas_sql
+    assert sentencias == 2
+    assert segundos > 0
@@ -0,0 +1,54 @@
+# tests/test_migraciones.py
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from migraciones import Migrador, estado, v003_indices_consultas_frecuentes, v004_busqueda_trigramas
+from models import db
+
+
+class _MigradorSinPermisos:
+    postgres = True
+
+    def __init__(self):
+        self.mensajes = []
+        self.log = self.mensajes.append
+
+    def ejecutar(self, sql, **parametros):
+        raise RuntimeError('permission denied to create extension "pg_trgm"')
+
+    def crear_indice(self, *args, **kwargs):
+        raise AssertionError('sin extensiones no se crean los índices')
+
+
+def test_todas_las_migraciones_aplicadas(app):
+    assert all(aplicada is not None for _, _, aplicada in estado())
+
+
+def test_trigramas_sin_permisos_avisa_por_el_log(app):
+    m = _MigradorSinPermisos()
+    v004_busqueda_trigramas.aplicar(m)
+    assert len(m.mensajes) == 1
+    assert 'índice en memoria' in m.mensajes[0]
+
+
+def test_indices_deja_una_alerta_abierta_por_insumo(app, catalogo):
+    _, insumos = catalogo
+    mensajes = []
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conexion:
+        # una base vieja: sin el índice único y con alertas abiertas repetidas
+        conexion.execute(text("DROP INDEX ux_alertas_stock_abierta"))
+        for id_insumo, estado_alerta in [(insumos[0], 'Pendiente'), (insumos[0], 'Reconocida'),
+                                         (insumos[0], 'Resuelta'), (insumos[1], 'Pendiente')]:
+            conexion.execute(text(
+                "INSERT INTO alertas_stock (id_insumo, fecha, cantidad_actual, stock_minimo, estado) "
+                "VALUES (:i, :f, 5, 10, :e)"
+            ), {'i': id_insumo, 'f': datetime.utcnow(), 'e': estado_alerta})
+
+        v003_indices_consultas_frecuentes.aplicar(Migrador(conexion, log=mensajes.append))
+
+        filas = conexion.execute(text("SELECT id_insumo, estado FROM alertas_stock ORDER BY id_alerta")).all()
+        assert [tuple(f) for f in filas] == [(insumos[0], 'Reconocida'), (insumos[0], 'Resuelta'), (insumos[1], 'Pendiente')]
+        indices = {i['name']: i for i in inspect(conexion).get_indexes('alertas_stock')}
+        assert indices['ux_alertas_stock_abierta']['unique']
+    assert mensajes == ['🟡 1 alertas abiertas duplicadas borradas']
@@ -0,0 +1,67 @@
+# tests/test_paginacion.py
+from models import db, Proveedor
+from services import paginacion
+
+
+def _proveedores(n):
+    db.session.add_all(Proveedor(nombre=f'P{k:03d}', razon_social='SA', cuit=str(k)) for k in range(n))
+    db.session.commit()
+
+
+def test_recorre_todas_las_paginas_sin_repetir(client):
+    _proveedores(23)
+    vistos, cursor = [], None
+    while True:
+        url = '/api/v1/proveedores/?limit=10' + (f'&after={cursor}' if cursor else '')
+        cuerpo = client.get(url).get_json()
+        vistos += [p['id_proveedor'] for p in cuerpo['items']]
+        cursor = cuerpo['next_cursor']
+        if cursor is None:
+            break
+    assert len(vistos) == 23
+    assert vistos == sorted(vistos)
+
+
+def test_el_cursor_no_se_corre_con_altas_nuevas(client):
+    _proveedores(5)
+    primera = client.get('/api/v1/proveedores/?limit=3').get_json()
+    _proveedores(2)
+    segunda = client.get(f"/api/v1/proveedores/?limit=3&after={primera['next_cursor']}").get_json()
+    assert segunda['items'][0]['id_proveedor'] == primera['items'][-1]['id_proveedor'] + 1
+
+
+def test_limit_se_recorta_al_maximo(client, monkeypatch):
+    monkeypatch.setattr(paginacion, 'LIMITE_MAXIMO', 4)
+    _proveedores(6)
+    cuerpo = client.get('/api/v1/proveedores/?limit=1000').get_json()
+    assert len(cuerpo['items']) == 4
+    assert cuerpo['next_cursor']
+
+
+def test_cursor_invalido_es_400(client):
+    assert client.get('/api/v1/proveedores/?after=no-es-un-cursor').status_code == 400
+
+
+def test_sin_limit_devuelve_array_con_tope_y_lo_avisa(client, monkeypatch):
+    monkeypatch.setattr(paginacion, 'LIMITE_LISTA', 5)
+    _proveedores(8)
+    respuesta = client.get('/api/v1/proveedores/')
+    cuerpo = respuesta.get_json()
+    assert isinstance(cuerpo, list)
+    assert [p['nombre'] for p in cuerpo] == [f'P{k:03d}' for k in range(5)]
+    assert respuesta.headers['X-Truncated'] == 'true'
+
+    # el Link lleva a la página siguiente, sin repetir ni saltear filas
+    siguiente = respuesta.headers['Link'].split(';')[0].strip('<>')
+    resto = client.get(siguiente).get_json()
+    assert [p['nombre'] for p in resto['items']] == [f'P{k:03d}' for k in range(5, 8)]
+    # la lista cortada no queda en la caché de respuestas
+    assert 'X-Truncated' in client.get('/api/v1/proveedores/').headers
+
+
+def test_sin_corte_no_hay_aviso(client):
+    _proveedores(3)
+    respuesta = client.get('/api/v1/proveedores/')
+    assert len(respuesta.get_json()) == 3
+    assert 'X-Truncated' not in respuesta.headers
+    assert 'Link' not in respuesta.headers
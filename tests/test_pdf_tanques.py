@@ -0,0 +1,65 @@
+# tests/test_pdf_tanques.py
+import os
+
+from services import pdf_tanques
+
+
+def _tanque_finalizado(client, id_insumo):
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-100', 'cliente': 'Cliente'}).get_json()['id_tanque']
+    client.post('/api/v1/insumos_salida/', json={
+        'id_insumo': id_insumo, 'id_tanque': id_tanque, 'cantidad_usada': 2, 'operario': 'op'
+    })
+    assert client.put(f'/api/v1/tanques/{id_tanque}/finalizar').status_code == 202
+    return id_tanque
+
+
+def _esperar(id_tanque):
+    pdf_tanques.solicitar_pdf(id_tanque)  # encola la generación si falta
+    for tarea in list(pdf_tanques._pendientes.values()):
+        tarea.result(timeout=30)
+    estado, ruta = pdf_tanques.solicitar_pdf(id_tanque)
+    assert estado == 'listo'
+    return ruta
+
+
+def test_la_descarga_en_cache_no_carga_las_lineas(client, catalogo, monkeypatch):
+    _, insumos = catalogo
+    id_tanque = _tanque_finalizado(client, insumos[0])
+    _esperar(id_tanque)
+
+    def no_deberia_llamarse(tanque):
+        raise AssertionError('se cargaron las líneas con el PDF ya generado')
+
+    monkeypatch.setattr(pdf_tanques, '_datos_tanque', no_deberia_llamarse)
+    respuesta = client.get(f'/api/v1/tanques/{id_tanque}/pdf')
+    assert respuesta.status_code == 200
+    assert respuesta.data.startswith(b'%PDF')
+
+
+def test_una_version_nueva_genera_otro_pdf_y_borra_el_viejo(client, catalogo):
+    _, insumos = catalogo
+    id_tanque = _tanque_finalizado(client, insumos[0])
+    vieja = _esperar(id_tanque)
+
+    assert client.put(f'/api/v1/tanques/{id_tanque}/desfinalizar').status_code == 200
+    assert client.put(f'/api/v1/tanques/{id_tanque}/finalizar').status_code == 202
+    nueva = _esperar(id_tanque)
+    assert nueva != vieja
+    assert not os.path.exists(vieja)
+
+
+def test_renombrar_un_insumo_o_proveedor_regenera_el_pdf(client, catalogo):
+    proveedores, insumos = catalogo
+    id_tanque = _tanque_finalizado(client, insumos[0])
+
+    # otro insumo: el PDF sigue valiendo
+    ruta = _esperar(id_tanque)
+    assert client.put(f'/api/v1/insumos/{insumos[1]}', json={'nombre': 'Otro nombre'}).status_code == 200
+    assert os.path.exists(ruta)
+
+    assert client.put(f'/api/v1/insumos/{insumos[0]}', json={'nombre': 'Chapa 2,5mm'}).status_code == 200
+    assert not os.path.exists(ruta)
+    assert _esperar(id_tanque) == ruta  # misma versión del tanque, con el nombre nuevo
+
+    assert client.put(f'/api/v1/proveedores/{proveedores[0]}', json={'nombre': 'Aceros SA'}).status_code == 200
+    assert not os.path.exists(ruta)
@@ -0,0 +1,30 @@
+# tests/test_pool.py
+import pytest
+
+from services import pool
+
+
+@pytest.fixture
+def timeouts(monkeypatch):
+    """SET LOCAL statement_timeout que se habrían ejecutado (SQLite no los admite)."""
+    fijados = []
+    monkeypatch.setattr(pool, '_es_postgres', lambda conexion: True)
+    monkeypatch.setattr(pool, '_fijar', lambda conexion, limite: fijados.append(limite))
+    return fijados
+
+
+def test_el_tope_se_aplica_en_rutas_con_login(client, timeouts):
+    # @login_required carga el usuario (y abre la transacción) antes que el decorador
+    respuesta = client.get('/api/v1/tanques/conciliacion')
+    assert respuesta.status_code == 200
+    assert timeouts == [pool.TIMEOUT_REPORTES_MS]
+
+
+def test_sin_decorador_no_se_fija_nada(client, timeouts):
+    client.get('/api/v1/tanques/')
+    assert timeouts == []
+
+
+def test_estadisticas_del_pool(app):
+    datos = pool.estadisticas_pool()
+    assert {'pid', 'clase', 'checkouts', 'timeouts'} <= datos.keys()
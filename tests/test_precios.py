@@ -0,0 +1,48 @@
+# tests/test_precios.py
+from datetime import datetime
+
+from models import db, HistorialPrecio, ProveedorInsumo
+
+
+def _compra(client, proveedor, insumo, precio, fecha=None):
+    datos = {'id_proveedor': proveedor, 'id_insumo': insumo, 'cantidad': 1, 'precio_unitario': precio}
+    if fecha:
+        datos['fecha'] = fecha
+    assert client.post('/api/v1/compras/', json=datos).status_code == 201
+
+
+def _asociacion(proveedor, insumo):
+    db.session.expire_all()
+    return ProveedorInsumo.query.filter_by(id_proveedor=proveedor, id_insumo=insumo).one()
+
+
+def _historial(asociacion):
+    return [(h.fecha.date().isoformat(), float(h.precio)) for h in
+            HistorialPrecio.query.filter_by(id_proveedor_insumo=asociacion.id_proveedor_insumo)
+            .order_by(HistorialPrecio.fecha)]
+
+
+def test_la_compra_de_hoy_fija_el_precio(client, catalogo):
+    proveedores, insumos = catalogo
+    _compra(client, proveedores[0], insumos[0], 12)
+    asociacion = _asociacion(proveedores[0], insumos[0])
+    assert float(asociacion.precio_actual) == 12
+    assert _historial(asociacion) == [(datetime.utcnow().date().isoformat(), 12)]
+
+
+def test_una_compra_atrasada_va_a_su_fecha_y_no_pisa_el_precio(client, catalogo):
+    proveedores, insumos = catalogo
+    _compra(client, proveedores[0], insumos[0], 12)
+    _compra(client, proveedores[0], insumos[0], 9, fecha='2024-01-05')
+
+    asociacion = _asociacion(proveedores[0], insumos[0])
+    assert float(asociacion.precio_actual) == 12
+    hoy = datetime.utcnow().date().isoformat()
+    assert _historial(asociacion) == [('2024-01-05', 9), (hoy, 12)]
+
+    # al precio que ya regía ese día no agrega otro punto
+    _compra(client, proveedores[0], insumos[0], 9, fecha='2024-02-01')
+    assert _historial(asociacion) == [('2024-01-05', 9), (hoy, 12)]
+
+    enero = client.get(f'/api/v1/precios/{asociacion.id_proveedor_insumo}?desde=2024-01-01&hasta=2024-01-31')
+    assert [p['precio'] for p in enero.get_json()['puntos']] == [9]
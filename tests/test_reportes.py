@@ -0,0 +1,46 @@
+# tests/test_reportes.py
+from models import ReporteRollup
+from services import reportes
+
+
+def _filas():
+    return sorted(
+        (r.periodo, r.fecha, r.dimension, r.clave) + tuple(float(getattr(r, m)) for m in reportes.METRICAS)
+        for r in ReporteRollup.query.all()
+    )
+
+
+def _compra(client, proveedor, insumo, cantidad, precio, fecha):
+    respuesta = client.post('/api/v1/compras/', json={
+        'id_proveedor': proveedor, 'id_insumo': insumo, 'cantidad': cantidad, 'precio_unitario': precio, 'fecha': fecha
+    })
+    assert respuesta.status_code == 201
+    return respuesta.get_json()
+
+
+def test_los_agregados_suman_cada_commit(client, catalogo):
+    proveedores, insumos = catalogo
+    _compra(client, proveedores[0], insumos[0], 2, 10, '2024-01-15')
+    _compra(client, proveedores[1], insumos[0], 3, 10, '2024-01-20')
+    _compra(client, proveedores[0], insumos[1], 1, 5, '2024-02-01')
+
+    totales = reportes.totales()
+    assert float(totales['gasto_compras']) == 55
+    assert float(totales['cantidad_comprada']) == 6
+    enero = [r for r in reportes.series('mes', 'insumo', clave=str(insumos[0]))]
+    assert [float(r.gasto_compras) for r in enero] == [50]
+
+
+def test_el_upsert_incremental_coincide_con_la_reconstruccion(client, catalogo):
+    proveedores, insumos = catalogo
+    compra = _compra(client, proveedores[0], insumos[0], 2, 10, '2024-01-15')
+    _compra(client, proveedores[0], insumos[0], 4, 10, '2024-01-15')
+    client.put(f"/api/v1/compras/{compra['id_compra']}", json={'cantidad': 5})
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-1'}).get_json()['id_tanque']
+    client.post('/api/v1/insumos_salida/', json={
+        'id_insumo': insumos[0], 'id_tanque': id_tanque, 'cantidad_usada': 3, 'operario': 'op'
+    })
+
+    incremental = _filas()
+    reportes.reconstruir_rollups()
+    assert _filas() == incremental
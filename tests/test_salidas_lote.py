@@ -0,0 +1,47 @@
+# tests/test_salidas_lote.py
+from models import db, Insumo, MovimientoStock, TanqueFabricado, TanqueInsumo
+from routes import api_insumos_salida
+
+
+def _lote(client, *lineas):
+    return client.post('/api/v1/insumos_salida/lote', json={'salidas': [
+        {'id_insumo': i, 'id_tanque': t, 'cantidad_usada': c, 'operario': 'op'} for i, t, c in lineas
+    ]})
+
+
+def _sin_cambios(insumos, id_tanque):
+    db.session.expire_all()
+    assert [db.session.get(Insumo, i).cantidad for i in insumos] == [100, 100, 100]
+    assert MovimientoStock.query.count() == 0
+    assert TanqueInsumo.query.count() == 0
+    assert not db.session.get(TanqueFabricado, id_tanque).costo_total
+
+
+def test_una_linea_mala_no_registra_ninguna(client, catalogo):
+    proveedores, insumos = catalogo
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-1'}).get_json()['id_tanque']
+
+    respuesta = _lote(client, (insumos[0], id_tanque, 5), (insumos[1], id_tanque, 500), (insumos[2], id_tanque, 1))
+    assert respuesta.status_code == 400
+    assert [e['linea'] for e in respuesta.get_json()['errores']] == [2]
+    _sin_cambios(insumos, id_tanque)
+
+
+def test_sin_stock_a_mitad_del_lote_deshace_lo_descontado(client, catalogo, monkeypatch):
+    proveedores, insumos = catalogo
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-1'}).get_json()['id_tanque']
+
+    # otro operario se lleva el segundo insumo después de la validación,
+    # cuando el primero ya se descontó dentro de la transacción
+    original = api_insumos_salida.mover_stock_lote
+
+    def mover(id_insumo, movimientos, tipo, validar_stock=False):
+        if id_insumo == insumos[1]:
+            db.session.execute(db.update(Insumo).where(Insumo.id_insumo == id_insumo).values(cantidad=0))
+        return original(id_insumo, movimientos, tipo, validar_stock)
+    monkeypatch.setattr(api_insumos_salida, 'mover_stock_lote', mover)
+
+    respuesta = _lote(client, (insumos[0], id_tanque, 5), (insumos[1], id_tanque, 3), (insumos[2], id_tanque, 1))
+    assert respuesta.status_code == 400
+    assert [e['linea'] for e in respuesta.get_json()['errores']] == [2]
+    _sin_cambios(insumos, id_tanque)
@@ -0,0 +1,63 @@
+# tests/test_stock.py
+from decimal import Decimal
+
+import pytest
+
+from models import db, Insumo, MovimientoStock
+from services.stock import StockInsuficiente, mover_stock, reconstruir_saldos
+
+
+def _libro(id_insumo):
+    return MovimientoStock.query.filter_by(id_insumo=id_insumo).order_by(MovimientoStock.id_movimiento).all()
+
+
+def test_no_deja_el_saldo_negativo(client, catalogo):
+    proveedores, insumos = catalogo
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-1'}).get_json()['id_tanque']
+
+    respuesta = client.post('/api/v1/insumos_salida/', json={
+        'id_insumo': insumos[0], 'id_tanque': id_tanque, 'cantidad_usada': 101, 'operario': 'op'
+    })
+    assert respuesta.status_code == 400
+    assert db.session.get(Insumo, insumos[0]).cantidad == 100
+    assert _libro(insumos[0]) == []
+
+    # justo hasta cero sí se puede
+    assert mover_stock(insumos[1], -100, 'salida', validar_stock=True) == 0
+    with pytest.raises(StockInsuficiente):
+        mover_stock(insumos[1], Decimal('-0.01'), 'salida', validar_stock=True)
+
+
+def test_el_libro_acompana_al_saldo(client, catalogo):
+    proveedores, insumos = catalogo
+    id_tanque = client.post('/api/v1/tanques/', json={'modelo': 'T-1'}).get_json()['id_tanque']
+    client.post('/api/v1/insumos_salida/', json={
+        'id_insumo': insumos[0], 'id_tanque': id_tanque, 'cantidad_usada': 30, 'operario': 'op'
+    })
+    client.post('/api/v1/compras/', json={
+        'id_proveedor': proveedores[0], 'id_insumo': insumos[0], 'cantidad': 12.5, 'precio_unitario': 10
+    })
+    db.session.expire_all()
+
+    libro = _libro(insumos[0])
+    assert [(m.tipo, m.cantidad) for m in libro] == [('salida', -30), ('compra', Decimal('12.5'))]
+    assert [m.saldo for m in libro] == [70, Decimal('82.5')]
+    assert db.session.get(Insumo, insumos[0]).cantidad == libro[-1].saldo
+
+
+def test_reconstruir_corrige_saldos_desviados(app, catalogo):
+    proveedores, insumos = catalogo
+    reconstruir_saldos()  # aperturas con el stock vigente (100)
+    mover_stock(insumos[0], -40, 'salida')
+    db.session.commit()
+
+    # alguien toca el saldo por fuera del libro
+    db.session.execute(db.update(Insumo).where(Insumo.id_insumo == insumos[0]).values(cantidad=7))
+    db.session.commit()
+
+    aperturas, corregidos = reconstruir_saldos()
+    db.session.expire_all()
+    assert (aperturas, corregidos) == (0, 1)
+    assert db.session.get(Insumo, insumos[0]).cantidad == 60
+    assert [db.session.get(Insumo, i).cantidad for i in insumos[1:]] == [100, 100]
+    assert reconstruir_saldos() == (0, 0)
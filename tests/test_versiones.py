@@ -0,0 +1,22 @@
+# tests/test_versiones.py
+def test_etag_responde_304_hasta_que_cambia_la_tabla(client, catalogo):
+    _, insumos = catalogo
+    primera = client.get('/api/v1/insumos/')
+    etag = primera.headers['ETag']
+
+    repetida = client.get('/api/v1/insumos/', headers={'If-None-Match': etag})
+    assert repetida.status_code == 304
+    assert repetida.data == b''
+
+    client.put(f'/api/v1/insumos/{insumos[0]}', json={'nombre': 'Chapa 3mm'})
+    cambiada = client.get('/api/v1/insumos/', headers={'If-None-Match': etag})
+    assert cambiada.status_code == 200
+    assert cambiada.headers['ETag'] != etag
+    assert 'Chapa 3mm' in [i['nombre'] for i in cambiada.get_json()]
+
+
+def test_el_etag_depende_de_la_url(client, catalogo):
+    completa = client.get('/api/v1/insumos/').headers['ETag']
+    pagina = client.get('/api/v1/insumos/?limit=1')
+    assert pagina.headers['ETag'] != completa
+    assert client.get('/api/v1/insumos/?limit=1', headers={'If-None-Match': completa}).status_code == 200